@@ -1,8 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import ValidationError
 
 from app.api.deps import require_api_key
 from app.core.config import settings
-from app.core.memvid_client import search
+from app.core.knowledge_bases import kb_names, knowledge_bases
+from app.core.metrics import REGISTRY
+from app.core.memvid_client import search_cache_stats
+from app.models.search import SearchFilters
+from app.rag.answer_cache import get_answer_cache
+from app.rag.ollama_client import get_backend_pool
+from app.rag.retrieval import search_filtered
+from app.rag.warmup import warmup_state
 
 router = APIRouter(prefix="/api", tags=["debug"])
 
@@ -12,6 +22,13 @@ async def health():
     return {"status": "ok"}
 
 
+@router.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    state = warmup_state()
+    return JSONResponse(status_code=200 if state.ready else 503, content=state.to_dict())
+
+
 @router.get("/config")
 async def config(_=Depends(require_api_key)):
     return {
@@ -19,6 +36,10 @@ async def config(_=Depends(require_api_key)):
         "pdf_dir": settings.pdf_dir,
         "memvid_path": settings.memvid_path,
         "top_k": settings.top_k,
+        "knowledge_bases": {
+            kb.name: {"model": kb.model_id, "store": kb.store, "md_dir": kb.md_dir, "pdf_dir": kb.pdf_dir}
+            for kb in knowledge_bases().values()
+        },
     }
 
 
@@ -26,4 +47,31 @@ async def config(_=Depends(require_api_key)):
 async def debug_search(payload: dict, _=Depends(require_api_key)):
     query = payload.get("query", "")
     k = int(payload.get("k", settings.top_k))
-    return {"hits": search(query, k=k)}
+    kb = payload.get("kb")
+    if kb is not None and kb not in kb_names():
+        raise HTTPException(status_code=404, detail=f"Unknown knowledge base {kb}")
+    try:
+        filters = SearchFilters.model_validate(payload.get("filters") or {}).to_filter()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors(include_url=False)))
+    return {"hits": await search_filtered(query, k=k, kb=kb, filters=filters)}
+
+
+@router.get("/cache")
+async def cache_stats(_=Depends(require_api_key)):
+    answers = get_answer_cache()
+    return {
+        "retrieval": search_cache_stats(),
+        "answers": answers.stats() if answers is not None else None,
+    }
+
+
+@router.get("/backends")
+async def backends(_=Depends(require_api_key)):
+    return {"backends": get_backend_pool().status()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(_=Depends(require_api_key)):
+    """Prometheus text exposition format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,40 +1,94 @@
+import asyncio
+from typing import List, Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 import logging
 from app.api.deps import require_api_key
-from app.ingest.md_ingest import ingest_md_dir, ingest_md_file
-from app.ingest.pdf_ingest import ingest_pdf_dir, ingest_pdf_file
-from app.core.memvid_client import seal_memvid, get_memvid
+from app.core.knowledge_bases import kb_names
+from app.core.memvid_client import StoreBusy
+from app.ingest.jobs import IngestDisabledError, IngestJob, JobConflictError, jobs
+from app.models.ingest import IngestJobRequest
 
 router = APIRouter(prefix="/api", tags=["ingest"])
 logger = logging.getLogger("app.api")
 
 
+def _submit(sources: List[str], knowledge_bases: Optional[List[str]] = None) -> IngestJob:
+    for name in knowledge_bases or []:
+        if name not in kb_names():
+            raise HTTPException(status_code=404, detail=f"Unknown knowledge base {name}")
+    try:
+        return jobs.submit(sources, knowledge_bases)
+    except IngestDisabledError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except (JobConflictError, StoreBusy) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def _get(job_id: str) -> IngestJob:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job {job_id}")
+    return job
+
+
+async def _run(sources: List[str]) -> dict:
+    """Synchronous flavour: submit a job and hold the request until it finishes."""
+    job = _submit(sources)
+    # Shielded: a client that disconnects must not cancel the queued job.
+    await asyncio.shield(asyncio.wrap_future(job.future))
+    if job.status != "succeeded":
+        raise HTTPException(status_code=500, detail=job.error or f"Ingest job {job.status}")
+    return job.result
+
+
+def _per_source(result: dict, source: str) -> dict:
+    """One source's stats; keyed by knowledge base when there are several."""
+    if len(kb_names()) == 1:
+        return result[source]
+    return {name: r[source] for name, r in result.items()}
+
+
 @router.post("/ingest/md")
 async def ingest_md(_=Depends(require_api_key)):
     logger.info("API call: /api/ingest/md")
-    return ingest_md_dir()
+    return _per_source(await _run(["md"]), "md")
 
 
 @router.post("/ingest/pdf")
 async def ingest_pdf(_=Depends(require_api_key)):
-    return ingest_pdf_dir()
+    logger.info("API call: /api/ingest/pdf")
+    return _per_source(await _run(["pdf"]), "pdf")
 
 
 @router.post("/ingest/all")
 async def ingest_all(_=Depends(require_api_key)):
-    try:
-        logger.info("API call: /api/ingest/all")
-        mv = get_memvid()
-        md = ingest_md_dir(mv_client=mv)
-        pdf = ingest_pdf_dir(mv_client=mv)
-        # Important: flush/close once at the end
-        seal_memvid()
-        return {"md": md, "pdf": pdf}
-    except Exception as e:
-        # Ensure we don't leave the store in a bad state on failure
-        try:
-            seal_memvid()
-        except Exception:
-            logger.exception("Failed sealing memvid after ingest failure")
-        logger.exception("Ingest ALL failed")
-        raise HTTPException(status_code=500, detail=f"{type(e).__name__}: {str(e)}")
+    logger.info("API call: /api/ingest/all")
+    return await _run(["md", "pdf"])
+
+
+@router.post("/ingest/jobs", status_code=202)
+async def create_ingest_job(payload: IngestJobRequest | None = None, _=Depends(require_api_key)):
+    payload = payload or IngestJobRequest()
+    logger.info(
+        "API call: /api/ingest/jobs sources=%s knowledge_bases=%s",
+        payload.sources,
+        payload.knowledge_bases,
+    )
+    return _submit(payload.sources, payload.knowledge_bases).to_dict()
+
+
+@router.get("/ingest/jobs")
+async def list_ingest_jobs(_=Depends(require_api_key)):
+    return {"jobs": [j.to_dict() for j in jobs.list()]}
+
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str, _=Depends(require_api_key)):
+    return _get(job_id).to_dict()
+
+
+@router.post("/ingest/jobs/{job_id}/cancel", status_code=202)
+async def cancel_ingest_job(job_id: str, _=Depends(require_api_key)):
+    _get(job_id)
+    return jobs.cancel(job_id).to_dict()
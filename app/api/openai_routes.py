@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import logging
 import time
 import uuid
+from typing import Any, AsyncIterator, Dict
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 
 from app.api.deps import require_api_key
+from app.core.admission import BATCH, INTERACTIVE
 from app.core.config import settings
+from app.core.knowledge_bases import UnknownKnowledgeBase, kbs_for_model, model_ids
+from app.core.metrics import CHAT_SECONDS
 from app.models.openai import (
     ChatCompletionRequest,
     ChatCompletionResponse,
@@ -14,30 +20,127 @@ from app.models.openai import (
     OpenAIModel,
     ChatCompletionChoice,
     ChatCompletionChoiceMessage,
+    ChatCompletionChunk,
+    ChatCompletionChunkChoice,
+    ChatCompletionChunkDelta,
 )
-from app.rag.pipeline import answer
+from app.rag.pipeline import answer, answer_stream
 
 router = APIRouter(tags=["openai"])
+logger = logging.getLogger("app.api")
+
+# hit | miss | bypass (not cacheable, e.g. temperature != 0)
+CACHE_HEADER = "X-RAG-Cache"
+# Approximate prompt tokens taken by the packed sources
+CONTEXT_TOKENS_HEADER = "X-RAG-Context-Tokens"
 
 
 @router.get("/v1/models", response_model=ListModelsResponse)
 async def list_models(_=Depends(require_api_key)):
-    # The model id shown in Open WebUI's model picker.
-    return ListModelsResponse(data=[OpenAIModel(id="local-rag")])
+    # The model ids shown in Open WebUI's model picker: `local-rag` searches
+    # every knowledge base, `local-rag:<name>` a single one.
+    return ListModelsResponse(data=[OpenAIModel(id=m) for m in model_ids()])
+
+
+def _sse(chunk: ChatCompletionChunk) -> str:
+    return f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
+
+
+async def _stream_events(
+    completion_id: str, created: int, model: str, rag: Dict[str, Any], started: float
+) -> AsyncIterator[str]:
+    def chunk(delta: ChatCompletionChunkDelta, finish_reason: str | None = None, **extra):
+        return _sse(
+            ChatCompletionChunk(
+                id=completion_id,
+                created=created,
+                model=model,
+                choices=[ChatCompletionChunkChoice(delta=delta, finish_reason=finish_reason)],
+                **extra,
+            )
+        )
+
+    yield chunk(ChatCompletionChunkDelta(role="assistant", content=""))
+    finish_reason = "stop"
+    try:
+        async for token in rag["stream"]:
+            yield chunk(ChatCompletionChunkDelta(content=token))
+    except Exception:
+        # Headers are already sent: log and close the stream cleanly.
+        logger.exception("Streaming from Ollama failed")
+        finish_reason = "error"
+    yield chunk(
+        ChatCompletionChunkDelta(),
+        finish_reason=finish_reason,
+        citations=rag["citations"],
+        context=rag["context"],
+    )
+    yield "data: [DONE]\n\n"
+    CHAT_SECONDS.observe(time.perf_counter() - started, stream="true")
 
 
 @router.post("/v1/chat/completions", response_model=ChatCompletionResponse)
-async def chat_completions(req: ChatCompletionRequest, _=Depends(require_api_key)):
-    # Use the last user message as the query.
+async def chat_completions(
+    req: ChatCompletionRequest,
+    response: Response,
+    x_rag_priority: str | None = Header(default=None),
+    _=Depends(require_api_key),
+):
+    # Use the last user message as the query; earlier ones identify the
+    # conversation, whose previous retrievals are reused.
     user_msgs = [m.content for m in req.messages if m.role == "user"]
     query = user_msgs[-1] if user_msgs else ""
+    history = user_msgs[:-1]
+    filters = req.filters.to_filter() if req.filters is not None else None
+
+    try:
+        knowledge_bases = kbs_for_model(req.model)
+    except UnknownKnowledgeBase:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown model {req.model!r}; available: {', '.join(model_ids())}",
+        )
+    # Scripts and benchmarks can send `X-RAG-Priority: batch` to yield to chats.
+    priority = BATCH if (x_rag_priority or "").lower() == BATCH else INTERACTIVE
 
-    rag = await answer(query)
+    started = time.perf_counter()
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if req.stream:
+        rag = await answer_stream(
+            query, temperature=req.temperature, max_tokens=req.max_tokens,
+            priority=priority,
+            knowledge_bases=knowledge_bases,
+            history=history,
+            filters=filters,
+        )
+        return StreamingResponse(
+            _stream_events(completion_id, created, req.model, rag, started),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+                CACHE_HEADER: rag["cache"],
+                CONTEXT_TOKENS_HEADER: str(rag["context"]["tokens"]),
+            },
+        )
+
+    rag = await answer(
+        query, temperature=req.temperature, max_tokens=req.max_tokens,
+        priority=priority,
+        knowledge_bases=knowledge_bases,
+        history=history,
+        filters=filters,
+    )
     content = rag["answer"]
+    response.headers[CACHE_HEADER] = rag["cache"]
+    response.headers[CONTEXT_TOKENS_HEADER] = str(rag["context"]["tokens"])
+    CHAT_SECONDS.observe(time.perf_counter() - started, stream="false")
 
     return ChatCompletionResponse(
-        id=f"chatcmpl-{uuid.uuid4().hex}",
-        created=int(time.time()),
+        id=completion_id,
+        created=created,
         model=req.model,
         choices=[
             ChatCompletionChoice(
@@ -47,4 +150,5 @@ async def chat_completions(req: ChatCompletionRequest, _=Depends(require_api_key
             )
         ],
         usage={},
+        context=rag["context"],
     )
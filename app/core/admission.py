@@ -0,0 +1,161 @@
+"""Admission control in front of the LLM backend.
+
+At most `llm_max_concurrency` generations run at once. Further requests wait
+in a priority queue (interactive chats before batch/debug callers, FIFO
+within a priority) for up to `llm_max_queue_wait_seconds`. When the queue is
+full a request is rejected immediately (429); when it waited too long it is
+rejected with 503. Both carry a Retry-After estimated from recent
+generation times, so clients back off instead of piling onto a saturated
+GPU until every request times out together.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from typing import List, Optional, Tuple
+
+from .config import settings
+from .metrics import callback, counter, histogram
+
+logger = logging.getLogger("app.core.admission")
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+QUEUE_WAIT_SECONDS = histogram(
+    "rag_llm_queue_wait_seconds", "Time spent waiting for an LLM slot.", ["priority"]
+)
+REJECTED = counter("rag_llm_rejected_total", "Requests refused by admission control.", ["reason"])
+
+
+class AdmissionRejected(RuntimeError):
+    """The LLM is saturated; retry after `retry_after` seconds."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(f"LLM backend saturated ({reason}), retry after {retry_after}s")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A granted generation slot; `release()` is idempotent."""
+
+    def __init__(self, gate: "AdmissionGate") -> None:
+        self._gate = gate
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._gate._release(time.monotonic() - self._started)
+
+    async def __aenter__(self) -> "Slot":
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        self.release()
+
+
+class AdmissionGate:
+    def __init__(self, limit: int, max_queue: int, max_wait: float) -> None:
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After.
+        self._hold_seconds = 5.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._hold_seconds * (self.queued + 1) / self.limit))
+
+    def _free(self) -> bool:
+        return self.active < self.limit and not self.queued
+
+    def check(self) -> None:
+        """Raise the 429 `acquire()` would raise now, without taking a slot."""
+        if not self._free() and self.queued >= self.max_queue:
+            REJECTED.inc(reason="queue_full")
+            raise AdmissionRejected(429, "queue_full", self.retry_after())
+
+    async def acquire(self, priority: str = INTERACTIVE) -> Slot:
+        if self._free():
+            self.active += 1
+            QUEUE_WAIT_SECONDS.observe(0.0, priority=priority)
+            return Slot(self)
+        self.check()
+
+        t0 = time.monotonic()
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.get(priority, 0), next(self._seq), fut))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                fut.cancel()
+                REJECTED.inc(reason="queue_timeout")
+                raise AdmissionRejected(503, "queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot granted meanwhile.
+            if fut.done() and not fut.cancelled():
+                self._release(None)
+            else:
+                fut.cancel()
+            raise
+        QUEUE_WAIT_SECONDS.observe(time.monotonic() - t0, priority=priority)
+        return Slot(self)
+
+    def _release(self, held: Optional[float]) -> None:
+        if held is not None:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held
+        # Hand the slot straight to the best waiter, if any.
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+
+_GATE: Optional[AdmissionGate] = None
+
+
+def get_gate() -> AdmissionGate:
+    global _GATE
+    if _GATE is None:
+        _GATE = AdmissionGate(
+            settings.llm_max_concurrency,
+            settings.llm_max_queue,
+            settings.llm_max_queue_wait_seconds,
+        )
+    return _GATE
+
+
+async def acquire_llm_slot(priority: str = INTERACTIVE) -> Slot:
+    """Wait for a generation slot, or raise `AdmissionRejected`."""
+    return await get_gate().acquire(priority)
+
+
+def check_llm_admission() -> None:
+    """Raise `AdmissionRejected` if a request arriving now would be refused outright."""
+    get_gate().check()
+
+
+callback(
+    "rag_llm_queue_depth", "Requests waiting for an LLM slot.", lambda: {(): float(get_gate().queued)}
+)
+callback(
+    "rag_llm_active", "Generations currently holding an LLM slot.", lambda: {(): float(get_gate().active)}
+)
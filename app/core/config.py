@@ -11,8 +11,35 @@ class Settings(BaseSettings):
     memvid_index: str = os.getenv("MEMVID_INDEX", "/app/memvid/kb.mv2")
     # Ollama
     ollama_base_url: str = "http://localhost:11434"
+    # Several Ollama hosts, comma separated (overrides ollama_base_url), and
+    # how often each is health-checked via /api/tags (0 = never)
+    ollama_base_urls: str = ""
+    ollama_health_interval_seconds: float = 10.0
+    # How long Ollama keeps models loaded after a request ("30m", "-1" = forever;
+    # empty = Ollama's own default of 5 minutes)
+    ollama_keep_alive: str = ""
     ollama_chat_model: str = "qwen2.5:7b-instruct"
     ollama_embed_model: str = "nomic-embed-text"
+    # Chat model context window (sent as num_ctx) and the answer length
+    # reserved in it when a request sets no max_tokens
+    llm_context_tokens: int = 4096
+    llm_default_max_tokens: int = 512
+    # Shared HTTP client (one pool per process, see app.rag.ollama_client)
+    ollama_connect_timeout: float = 5.0
+    ollama_read_timeout: float = 120.0
+    ollama_max_connections: int = 32
+    ollama_max_keepalive_connections: int = 16
+    ollama_keepalive_expiry: float = 60.0
+    ollama_connect_retries: int = 2
+    # Embeddings (app.rag.embeddings)
+    embed_batch_size: int = 64
+    embed_concurrency: int = 4
+    embed_cache_size: int = 4096
+    embed_cache_persist: bool = True
+    # Vectors kept in the persisted cache, oldest written dropped first (0 = no limit)
+    embed_cache_disk_entries: int = 100000
+    # Embed chunks while ingesting (fills the embedding cache)
+    embed_on_ingest: bool = False
 
     # Memvid
     memvid_kind: str = "basic"
@@ -21,6 +48,16 @@ class Settings(BaseSettings):
 #        "MEMVID_PATH", os.getenv("MEMVID_INDEX", "/app/memvid/kb.mv2")#
 #    )
 
+    # Query-only instance (e.g. `uvicorn --workers N`): never writes stores,
+    # ingest endpoints answer 403; run ingestion in one other process.
+    store_read_only: bool = False
+    # How often readers check whether another process activated a new store
+    store_poll_seconds: float = 1.0
+
+    # Separate knowledge bases, comma separated (see app.core.knowledge_bases):
+    # each gets <memvid_path>/<name>.mv2 and <md_dir>/<name>, <pdf_dir>/<name>
+    knowledge_bases: str = ""
+
     # Knowledge-base folders
     md_dir: str = "./data/md"
     pdf_dir: str = "./data/pdf"
@@ -40,7 +77,61 @@ class Settings(BaseSettings):
 
     # Retrieval
     top_k: int = 6
+    # Every packed source gets at least this much text before any is extended
     snippet_chars: int = 350
+    # Safety margin kept free in the context window (token counts are estimates)
+    context_reserve_tokens: int = 128
+    # Hits fetched per returned source (overlapping windows of one page or
+    # section are merged), and the MMR relevance/diversity trade-off
+    retrieval_overfetch: int = 3
+    mmr_lambda: float = 0.7
+    # Retrieval cache (normalized query + k -> hits), cleared on every ingest
+    retrieval_cache_size: int = 1024
+    retrieval_cache_ttl_seconds: float = 600.0
+    # Filtered searches (app.core.metadata_index): most lexical candidates
+    # fetched to find `k` matching chunks when Memvid cannot apply the filter
+    filter_max_candidates: int = 500
+    # Dense sidecar index (app.core.vector_index), fused with Memvid hits via RRF.
+    # Chunks are embedded during ingest, so enable it before (re)ingesting.
+    vector_index_enabled: bool = False
+    vector_index_int8: bool = False
+    # Candidates taken from each retriever before fusion, and the RRF constant
+    hybrid_candidates: int = 20
+    rrf_k: int = 60
+    # Admission control for generations (app.core.admission): concurrent
+    # Ollama generations, queued requests, and the longest a request may queue
+    llm_max_concurrency: int = 4
+    llm_max_queue: int = 32
+    llm_max_queue_wait_seconds: float = 30.0
+    # Retrieved candidates per conversation (app.rag.conversation): follow-up
+    # turns fuse them with hits for the new message; 0 disables reuse
+    conversation_cache_size: int = 2048
+    conversation_cache_ttl_seconds: float = 3600.0
+    # Identical concurrent chat requests share one retrieval + generation
+    coalesce_requests: bool = True
+    # Answer cache for temperature-0 completions (optional)
+    answer_cache_enabled: bool = False
+    answer_cache_size: int = 512
+    answer_cache_ttl_seconds: float = 86400.0
+    answer_cache_persist: bool = False
+
+    # Startup warm-up (app.rag.warmup): /api/ready is 503 until it finishes
+    warmup_enabled: bool = True
+    warmup_timeout_seconds: float = 120.0
+    warmup_query: str = "warm-up"
+
+    # Executors (blocking Memvid work runs off the event loop)
+    retrieval_workers: int = 8
+    retrieval_max_concurrency: int = 8
+    ingest_workers: int = 1
+    # Parallel chunking: worker processes (0 = one per CPU, 1 = inline) and
+    # how many files may be chunked ahead of the single Memvid writer.
+    ingest_processes: int = 0
+    ingest_max_pending_files: int = 0
+    # Chunks per Memvid put_many() batch
+    ingest_batch_size: int = 64
+    # Finished ingest jobs kept for polling
+    ingest_job_history: int = 20
 
     # Simple auth (optional)
     api_key: str | None = None
@@ -0,0 +1,78 @@
+"""Thread pools for blocking work, so the event loop never waits on Memvid.
+
+Retrieval gets a bounded pool plus a semaphore that caps how many searches
+are in flight; ingestion gets its own executor so a long directory walk can
+never starve chat retrieval of threads.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from .config import settings
+
+logger = logging.getLogger("app.core.executors")
+
+T = TypeVar("T")
+
+_RETRIEVAL_POOL: Optional[ThreadPoolExecutor] = None
+_INGEST_POOL: Optional[ThreadPoolExecutor] = None
+_RETRIEVAL_SEM: Optional[asyncio.Semaphore] = None
+
+
+def _retrieval_pool() -> ThreadPoolExecutor:
+    global _RETRIEVAL_POOL
+    if _RETRIEVAL_POOL is None:
+        _RETRIEVAL_POOL = ThreadPoolExecutor(
+            max_workers=settings.retrieval_workers, thread_name_prefix="retrieval"
+        )
+    return _RETRIEVAL_POOL
+
+
+def _ingest_pool() -> ThreadPoolExecutor:
+    global _INGEST_POOL
+    if _INGEST_POOL is None:
+        _INGEST_POOL = ThreadPoolExecutor(
+            max_workers=settings.ingest_workers, thread_name_prefix="ingest"
+        )
+    return _INGEST_POOL
+
+
+def _retrieval_semaphore() -> asyncio.Semaphore:
+    global _RETRIEVAL_SEM
+    if _RETRIEVAL_SEM is None:
+        _RETRIEVAL_SEM = asyncio.Semaphore(settings.retrieval_max_concurrency)
+    return _RETRIEVAL_SEM
+
+
+async def run_retrieval(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking retrieval call in the retrieval pool."""
+    loop = asyncio.get_running_loop()
+    async with _retrieval_semaphore():
+        return await loop.run_in_executor(
+            _retrieval_pool(), functools.partial(fn, *args, **kwargs)
+        )
+
+
+def submit_ingest(fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Start a blocking ingestion call in the dedicated ingest executor."""
+    return _ingest_pool().submit(fn, *args, **kwargs)
+
+
+async def run_ingest(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking ingestion call in the ingest executor and wait for it."""
+    return await asyncio.wrap_future(submit_ingest(fn, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    global _RETRIEVAL_POOL, _INGEST_POOL, _RETRIEVAL_SEM
+    for name, pool in (("retrieval", _RETRIEVAL_POOL), ("ingest", _INGEST_POOL)):
+        if pool is not None:
+            logger.info("Shutting down %s executor", name)
+            pool.shutdown(wait=False, cancel_futures=True)
+    _RETRIEVAL_POOL = None
+    _INGEST_POOL = None
+    _RETRIEVAL_SEM = None
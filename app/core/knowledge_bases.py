@@ -0,0 +1,100 @@
+"""Knowledge bases: one Memvid store (and source folders) per corpus.
+
+`KNOWLEDGE_BASES=dnd5e,pathfinder` gives each name its own store
+`<memvid_path>/<name>.mv2` and its own folders `<md_dir>/<name>` and
+`<pdf_dir>/<name>`. Each is exposed as the model `local-rag:<name>`, while
+`local-rag` searches all of them. Without the setting there is a single
+knowledge base, "default", using the historical store path and the source
+folders themselves.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Mapping
+
+from .config import settings
+
+DEFAULT_KB = "default"
+# Historical location of the single store.
+DEFAULT_STORE = "/tmp/knowledge.mp2"
+
+MODEL_PREFIX = "local-rag"
+
+
+class UnknownKnowledgeBase(KeyError):
+    """No knowledge base (or model) with that name."""
+
+
+@dataclass(frozen=True)
+class KnowledgeBase:
+    name: str
+    store: str
+    md_dir: str
+    pdf_dir: str
+
+    @property
+    def model_id(self) -> str:
+        return MODEL_PREFIX if self.name == DEFAULT_KB else f"{MODEL_PREFIX}:{self.name}"
+
+
+def knowledge_bases() -> Mapping[str, KnowledgeBase]:
+    """Configured knowledge bases by name, in configuration order."""
+    # Looked up on every search: parsed once per distinct configuration.
+    return _parse(settings.knowledge_bases, settings.memvid_path, settings.md_dir, settings.pdf_dir)
+
+
+@lru_cache(maxsize=8)
+def _parse(names_setting: str, memvid_path: str, md_dir: str, pdf_dir: str) -> Mapping[str, KnowledgeBase]:
+    names = [n.strip() for n in names_setting.split(",") if n.strip()]
+    if not names:
+        kbs = {DEFAULT_KB: KnowledgeBase(DEFAULT_KB, DEFAULT_STORE, md_dir, pdf_dir)}
+    else:
+        kbs = {
+            n: KnowledgeBase(
+                name=n,
+                store=os.path.join(memvid_path, f"{n}.mv2"),
+                md_dir=os.path.join(md_dir, n),
+                pdf_dir=os.path.join(pdf_dir, n),
+            )
+            for n in names
+        }
+    # Shared by every caller: read-only.
+    return MappingProxyType(kbs)
+
+
+def get_kb(name: str | None = None) -> KnowledgeBase:
+    """A knowledge base by name; None means the first configured one."""
+    kbs = knowledge_bases()
+    if name is None:
+        return next(iter(kbs.values()))
+    try:
+        return kbs[name]
+    except KeyError:
+        raise UnknownKnowledgeBase(name) from None
+
+
+def kb_names() -> List[str]:
+    return list(knowledge_bases())
+
+
+def model_ids() -> List[str]:
+    """Model ids for /v1/models: the combined model first, then one per store."""
+    kbs = knowledge_bases()
+    if DEFAULT_KB in kbs:
+        return [MODEL_PREFIX]
+    return [MODEL_PREFIX] + [kb.model_id for kb in kbs.values()]
+
+
+def kbs_for_model(model: str) -> List[str]:
+    """Knowledge bases searched for a chat model id."""
+    if model == MODEL_PREFIX:
+        return kb_names()
+    prefix = MODEL_PREFIX + ":"
+    if model.startswith(prefix):
+        name = model[len(prefix):]
+        get_kb(name)
+        return [name]
+    raise UnknownKnowledgeBase(model)
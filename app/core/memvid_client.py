@@ -1,26 +1,68 @@
+import fcntl
+import json
 import os
-from typing import Any, Dict, Optional
+import shutil
+import threading
+import time
+import zlib
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 import logging
 import traceback
 from pathlib import Path
+from urllib.parse import quote
 
-from memvid_sdk import create, use, CapacityExceededError, LockedError, EmbeddingFailedError
+from memvid_sdk import (
+    create,
+    use,
+    CapacityExceededError,
+    LockedError,
+    EmbeddingFailedError,
+    FrameNotFoundError,
+    LexIndexDisabledError,
+    MemvidError,
+)
 
+from .cache import TTLCache
 from .config import settings
+from .executors import run_retrieval
+from .knowledge_bases import get_kb
+from .metrics import INGEST_BATCH_SECONDS, INGEST_CHUNKS, RETRIEVAL_SECONDS, cache_metrics
+from app.utils.text import lexical_query, normalize_query
 
 logger = logging.getLogger("app.core.memvid_client")
 
 
-_MEM: Optional[Any] = None
-_MEM_PATH: Optional[str] = None
+# Stores are immutable generation files (`kb.g3.mv2`); a pointer file next
+# to the logical store path names the active one. Queries read through a
+# shared read-only handle per knowledge base; ingestion copies the active
+# generation, writes the copy, and swaps the pointer when done. Handles are
+# reference counted: a retired generation is closed and deleted once its
+# last in-flight search has finished.
+_READERS: Dict[str, "StoreHandle"] = {}
+# Guards handle swaps and reference counts (held only briefly, never while
+# searching or writing).
+_MEM_LOCK = threading.RLock()
+# Other processes (uvicorn workers, a separate ingest process) may activate
+# generations: the pointer is re-read at most every `store_poll_seconds`.
+_POINTER_SEEN: Dict[str, Tuple[float, int]] = {}
 
+# Bumped after every ingest of a knowledge base; part of the retrieval cache
+# key so that stale hits can never be served once its store has changed.
+_GENERATIONS: Dict[str, int] = {}
+_SEARCH_CACHE: TTLCache[list] = TTLCache(
+    max_entries=settings.retrieval_cache_size,
+    ttl_seconds=settings.retrieval_cache_ttl_seconds,
+)
 
-def _resolve_memvid_path() -> str:
+
+def _resolve_memvid_path(kb: Optional[str] = None) -> str:
     # Always resolve to an absolute path to avoid “relative cwd surprises”
     #raw = getattr(settings, "memvid_path", None) or getattr(
     #    settings, "memvid_index", "knowledge.mv2"
     #)
-    raw = "/tmp/knowledge.mp2"
+    raw = get_kb(kb).store
     p = Path(raw).expanduser()
     if not p.is_absolute():
         # Make relative paths relative to current working directory
@@ -28,19 +70,249 @@ def _resolve_memvid_path() -> str:
     return str(p.resolve())
 
 
-def get_memvid():
+def store_path(kb: Optional[str] = None) -> str:
+    """File of the active generation (the logical path before the first ingest)."""
+    return active_store(kb)[1] or _resolve_memvid_path(kb)
+
+
+def sidecar_path(suffix: str, kb: Optional[str] = None) -> str:
+    """Path of a file stored next to the .mv2 store, e.g. `knowledge.mv2.answers.sqlite`."""
+    return _resolve_memvid_path(kb) + suffix
+
+
+class StoreNotFound(RuntimeError):
+    """The knowledge base has not been ingested yet."""
+
+
+@dataclass
+class StoreHandle:
+    kb: str
+    generation: int
+    path: str
+    mem: Any
+    refs: int = 0
+    retired: bool = False
+    # Only the process that activated the successor deletes the file.
+    delete_file: bool = False
+
+
+@dataclass
+class PendingGeneration:
+    """A generation being written by an ingest; invisible to queries until activated."""
+
+    kb: str
+    generation: int
+    path: str
+    mem: Any
+    previous: Optional[str]
+
+
+def _pointer_path(kb: str) -> str:
+    return sidecar_path(".current", kb)
+
+
+def _generation_file(kb: str, generation: int) -> str:
+    root, ext = os.path.splitext(_resolve_memvid_path(kb))
+    return f"{root}.g{generation}{ext or '.mv2'}"
+
+
+def active_store(kb: Optional[str] = None) -> Tuple[int, Optional[str]]:
+    """(generation, file) currently served for a knowledge base.
+
+    Stores written before generation files existed are served as
+    generation 0 from the logical path itself.
     """
-    Return a cached Memvid instance (singleton).
-    This avoids reopening/creating the underlying store for every chunk,
-    which can cause MV013 I/O errors.
+    name = get_kb(kb).name
+    try:
+        with open(_pointer_path(name), "r", encoding="utf-8") as f:
+            pointer = json.load(f)
+        path = os.path.join(os.path.dirname(_resolve_memvid_path(name)), pointer["file"])
+        return int(pointer["generation"]), path
+    except FileNotFoundError:
+        legacy = _resolve_memvid_path(name)
+        return 0, legacy if os.path.exists(legacy) else None
+
+
+def store_exists(kb: Optional[str] = None) -> bool:
+    path = active_store(kb)[1]
+    return path is not None and os.path.exists(path)
+
+
+@contextmanager
+def read_store(kb: Optional[str] = None) -> Iterator[Any]:
+    """Borrow the shared read-only Memvid handle of the active generation.
+
+    Raises `StoreNotFound` when nothing has been ingested yet.
     """
-    global _MEM, _MEM_PATH
+    handle = _acquire_reader(get_kb(kb).name)
+    try:
+        yield handle.mem
+    finally:
+        _release_reader(handle)
+
+
+def _follow_pointer(name: str) -> None:
+    """Pick up a generation activated by another process."""
+    now = time.monotonic()
+    seen = _POINTER_SEEN.get(name)
+    if seen is not None and now - seen[0] < settings.store_poll_seconds:
+        return
+    generation = active_store(name)[0]
+    with _MEM_LOCK:
+        previous = _POINTER_SEEN.get(name)
+        _POINTER_SEEN[name] = (now, generation)
+        if previous is None or previous[1] == generation:
+            return
+        logger.info("Store %s moved to generation %d in another process", name, generation)
+        old = _READERS.pop(name, None)
+        bump_generation(name)
+        if old is not None:
+            old.retired = True
+            if old.refs == 0:
+                _retire(old.path, old, delete=False)
+
+
+def _acquire_reader(name: str) -> StoreHandle:
+    _follow_pointer(name)
+    with _MEM_LOCK:
+        handle = _READERS.get(name)
+        if handle is None:
+            generation, path = active_store(name)
+            if path is None or not os.path.exists(path):
+                raise StoreNotFound(name)
+            logger.info("Opening read handle on %s (generation %d)", path, generation)
+            mem = use("basic", path, mode="open", read_only=True)
+            handle = _READERS[name] = StoreHandle(name, generation, path, mem)
+        handle.refs += 1
+        return handle
+
+
+def _release_reader(handle: StoreHandle) -> None:
+    with _MEM_LOCK:
+        handle.refs -= 1
+        if handle.retired and handle.refs == 0:
+            _retire(handle.path, handle, delete=handle.delete_file)
 
-    path = _resolve_memvid_path()
-    if _MEM is not None and _MEM_PATH == path:
-        return _MEM
 
-    logger.info("Memvid get_memvid(): cwd=%s", os.getcwd())
+def _retire(path: str, handle: Optional[StoreHandle], delete: bool = True) -> None:
+    """Close a superseded generation and delete its file.
+
+    Other processes may still have it open; on POSIX their handles stay
+    valid until closed.
+    """
+    if handle is not None:
+        try:
+            handle.mem.close()
+        except Exception:
+            logger.exception("Failed closing retired handle %s", path)
+    if not delete:
+        return
+    root, _ = os.path.splitext(path)
+    for p in (path, root + ".manifest.wal"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+    logger.info("Retired store generation %s", path)
+
+
+class StoreBusy(RuntimeError):
+    """Another process is writing this knowledge base."""
+
+
+@contextmanager
+def store_write_lock(kb: Optional[str] = None) -> Iterator[None]:
+    """Exclusive, cross-process right to write a knowledge base.
+
+    An advisory `flock` on `<store>.ingest.lock`, so several uvicorn
+    workers (or a worker and a standalone ingest process) never write the
+    same store. Raises `StoreBusy` instead of waiting.
+    """
+    if settings.store_read_only:
+        raise StoreBusy("this instance is read-only (STORE_READ_ONLY)")
+    path = sidecar_path(".ingest.lock", kb)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise StoreBusy(f"{get_kb(kb).name} is being ingested by another process") from None
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def store_write_locks(kbs: Sequence[str]) -> Iterator[None]:
+    """`store_write_lock()` on several knowledge bases, all or none.
+
+    Raises `StoreBusy` before anything is written if any of them is taken.
+    """
+    with ExitStack() as stack:
+        for kb in kbs:
+            stack.enter_context(store_write_lock(kb))
+        yield
+
+
+def begin_generation(kb: Optional[str] = None) -> PendingGeneration:
+    """Open a writable copy of the active generation for an ingest run.
+
+    Callers hold `store_write_lock()`.
+    """
+    name = get_kb(kb).name
+    generation, current = active_store(name)
+    path = _generation_file(name, generation + 1)
+    # Leftovers of an ingest that crashed before activating.
+    _retire(path, None)
+    if current is not None and os.path.exists(current):
+        t0 = time.perf_counter()
+        shutil.copyfile(current, path)
+        logger.info("Copied %s -> %s in %.2fs", current, path, time.perf_counter() - t0)
+    return PendingGeneration(name, generation + 1, path, _WriteHandle(path), current)
+
+
+def activate_generation(pending: PendingGeneration) -> None:
+    """Seal the new generation and make it the one queries read.
+
+    The pointer file is replaced atomically; searches already holding the
+    old handle finish on it, and it is closed after the last one.
+    """
+    logger.info("Sealing memvid: %s", pending.path)
+    pending.mem.seal()
+    logger.info("Memvid sealed OK: %s", pending.path)
+    pointer = _pointer_path(pending.kb)
+    tmp = pointer + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"generation": pending.generation, "file": os.path.basename(pending.path)}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+    with _MEM_LOCK:
+        _POINTER_SEEN[pending.kb] = (time.monotonic(), pending.generation)
+        old = _READERS.pop(pending.kb, None)
+        bump_generation(pending.kb)
+        if old is not None:
+            old.retired = True
+            old.delete_file = True
+            if old.refs == 0:
+                _retire(old.path, old)
+        elif pending.previous is not None:
+            _retire(pending.previous, None)
+    logger.info("Activated generation %d of %s", pending.generation, pending.kb)
+
+
+def discard_generation(pending: PendingGeneration) -> None:
+    """Drop a generation that must not be served (e.g. sealing failed)."""
+    try:
+        pending.mem.close()
+    except Exception:
+        logger.debug("Closing discarded generation failed", exc_info=True)
+    _retire(pending.path, None)
+
+
+def _open_memvid(path: str):
+    logger.info("Memvid _open_memvid(): cwd=%s", os.getcwd())
     logger.info("Memvid path resolved: %s", path)
 
     parent = Path(path).parent
@@ -51,12 +323,12 @@ def get_memvid():
 
     if os.path.exists(path):
         logger.info("Opening existing memvid file: %s", path)
-#        _MEM = use(settings.memvid_kind, path)
-        _MEM = use("basic", path, mode="auto")
+#        mem = use(settings.memvid_kind, path)
+        mem = use("basic", path, mode="auto")
     else:
         # IMPORTANT: create(path, kind) per Memvid docs
-        # _MEM = create(path)
-        _MEM = use("basic", path, mode="auto")
+        # mem = create(path)
+        mem = use("basic", path, mode="auto")
         # Verify immediately; if this fails we’ll know create didn’t materialize the file
         exists = Path(path).exists()
         size = Path(path).stat().st_size if exists else None
@@ -69,23 +341,147 @@ def get_memvid():
                 path,
             )
 
-    _MEM_PATH = path
-    logger.info("Memvid instance ready: %s", str(_MEM))
-    return _MEM
+    logger.info("Memvid instance ready: %s", str(mem))
+    return mem
 
 
-def seal_memvid() -> None:
-    """Flush/close the cached Memvid instance safely."""
-    global _MEM, _MEM_PATH
-    if _MEM is None:
-        return
+class _WriteHandle:
+    """Writable Memvid handle that reopens the file before writes that follow removals.
+
+    memvid-sdk corrupts its embedded WAL (MV012 when sealing) if puts grow
+    the WAL after frames were removed through the same handle; a fresh
+    handle writes them safely. Everything else is passed through.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._mem = _open_memvid(path)
+        self._removed = False
+
+    def remove(self, frame_id: Any) -> Any:
+        out = self._mem.remove(frame_id)
+        self._removed = True
+        return out
+
+    def _writable(self) -> Any:
+        if self._removed:
+            self._mem.close()
+            self._mem = use("basic", self.path, mode="auto")
+            self._removed = False
+        return self._mem
+
+    def put(self, *args: Any, **kwargs: Any) -> Any:
+        return self._writable().put(*args, **kwargs)
+
+    def put_many(self, requests: List[Dict[str, Any]]) -> Any:
+        return self._writable().put_many(requests)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._mem, name)
+
+
+class ChunkWriteError(RuntimeError):
+    """A batch of chunks could not be written to the store."""
+
+
+def _short_hash(text: str) -> str:
+    return f"{zlib.crc32(text.encode('utf-8')):08x}"
+
+
+def chunk_scope(
+    source_type: str,
+    source_file: Optional[str] = None,
+    path: Optional[str] = None,
+    page: Optional[int] = None,
+) -> str:
+    """URI prefix shared by the chunks of a source type, file name, file or PDF page."""
+    scope = f"mv2://{source_type}/"
+    if source_file is not None:
+        scope += quote(str(source_file), safe="") + "/"
+        if path is not None:
+            scope += _short_hash(path) + "/"
+            if page is not None:
+                scope += f"p{page}/"
+    return scope
+
+
+def chunk_uri(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Hierarchical frame URI, e.g. `mv2://pdf/PHB.pdf/3f2a9c01/p12/0`.
+
+    Source type, file name, a hash of the file path, then the PDF page or
+    the markdown section's position in the file, then the chunk index: one
+    URI per chunk of a file version. `find(scope=...)`
+    filters on URI prefixes, so searches restricted to a source type, file
+    or page can be pushed into Memvid. Memvid splits long frames and
+    reports hits on the parts as `<uri>#page-N`.
+    """
+    meta = metadata or {}
+    if not meta.get("source_type") or not meta.get("source_file"):
+        return None
+    path = str(meta.get("path") or meta["source_file"])
+    if meta.get("page") is not None:
+        scope = chunk_scope(meta["source_type"], meta["source_file"], path, meta["page"])
+    else:
+        scope = chunk_scope(meta["source_type"], meta["source_file"], path)
+        if meta.get("section_index") is not None:
+            scope += f"s{meta['section_index']}/"
+        else:
+            scope += _short_hash(str(meta.get("section_path") or "")) + "/"
+    return scope + str(meta.get("chunk_index", 0))
+
+
+def _put_request(title: str, label: str, text: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    request = {"title": title, "label": label, "text": text, "metadata": metadata or {}}
+    uri = chunk_uri(metadata)
+    if uri is not None:
+        request["uri"] = uri
+    return request
+
+
+def _new_frames(mv: Any, first_frame: int, count: int) -> List[Dict[str, Any]]:
+    """Timeline entries of the last `count` chunks written, oldest first.
+
+    Frames are numbered in write order, so the chunks written since the
+    frame count was `first_frame` are the newest timeline entries.
+    """
+    entries = [e for e in mv.timeline(limit=count, reverse=True) if int(e["frame_id"]) >= first_frame]
+    if len(entries) < count:
+        # The timeline is ordered by timestamp; scan all of it if the clock went backwards.
+        total = int(mv.stats()["frame_count"])
+        entries = [e for e in mv.timeline(limit=total) if int(e["frame_id"]) >= first_frame]
+    return sorted(entries, key=lambda e: int(e["frame_id"]))
+
+
+def _put_batch(mv: Any, requests: List[Dict[str, Any]]) -> List[List[str]]:
+    """Write a batch with the SDK's bulk put when available.
+
+    Returns, per request, the ids of the frames it occupies: the chunk's own
+    frame, then the parts Memvid split it into. `put_many()` and `put()`
+    return WAL sequence numbers rather than frame ids, so the ids are read
+    back from the timeline.
+    """
+    first_frame = int(mv.stats()["frame_count"])
     try:
-        logger.info("Sealing memvid: %s", _MEM_PATH)
-        _MEM.seal()
-        logger.info("Memvid sealed OK: %s", _MEM_PATH)
-    finally:
-        _MEM = None
-        _MEM_PATH = None
+        if hasattr(mv, "put_many"):
+            mv.put_many(requests)
+        else:
+            for r in requests:
+                mv.put(**r)
+    except (CapacityExceededError, LockedError, EmbeddingFailedError) as e:
+        # Capacity, lock and embedding failures are not transient at this
+        # level: stop the ingest instead of silently dropping chunks.
+        first = requests[0]["title"] if requests else ""
+        raise ChunkWriteError(
+            f"Writing {len(requests)} chunks (first title {first!r}) failed: {type(e).__name__}: {e}"
+        ) from e
+    entries = _new_frames(mv, first_frame, len(requests))
+    if len(entries) != len(requests) or any(
+        r.get("uri") and r["uri"] != e.get("uri") for r, e in zip(requests, entries)
+    ):
+        raise ChunkWriteError(
+            f"Wrote {len(requests)} chunks from frame {first_frame} on but found {len(entries)} new frames"
+        )
+    return [[str(e["frame_id"]), *(str(c) for c in e.get("child_frames") or ())] for e in entries]
 
 
 def put_chunk(
@@ -95,60 +491,214 @@ def put_chunk(
     label: str,
     text: str,
     metadata: Optional[Dict[str, Any]] = None,
-) -> None:
-    logger.info("Putting chunk: title='%s', label='%s', text='%s'", str(title), str(label), text[:30])
-    #    mem = get_memvid()
-    logger.info("Memvid instance: %s", str(mv))
-    # mem.put(title=title, label=label, metadata=metadata or {}, text=text)
-    md = metadata or {}
-    # Compatibility: memvid_sdk.put signature may differ (positional vs keyword).
-    # Try keyword first (clear intent); fall back to positional if SDK rejects keywords.
+) -> Optional[str]:
+    """Store one chunk and return its frame id.
+
+    Prefer `ChunkWriter` for bulk ingestion; this issues one round trip per chunk.
+    """
+    logger.debug("Putting chunk: title='%s', label='%s'", title, label)
+    return _put_batch(mv, [_put_request(title, label, text, metadata)])[0][0]
+
+
+@dataclass
+class _WriteGroup:
+    buffered: int = 0
+    closed: bool = False
+    frames: List[List[str]] = field(default_factory=list)
+
+
+class ChunkWriter:
+    """Buffer chunks and write them to Memvid in batches.
+
+    Chunks are added per group (typically one source file). Once a group is
+    closed and all its chunks are written, `on_group_written(group, frames)`
+    is called, so callers can record ids without waiting for the final flush.
+    `on_batch(requests, frames)` sees every written batch (e.g. to embed it).
+    `frames` holds, per chunk, its frame id followed by the ids of the parts
+    Memvid split it into. Write failures propagate from `add()`/`flush()` as
+    `ChunkWriteError`.
+    """
+
+    def __init__(
+        self,
+        mv: Any,
+        *,
+        batch_size: Optional[int] = None,
+        on_group_written: Optional[Callable[[Any, List[List[str]]], None]] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]], List[List[str]]], None]] = None,
+    ) -> None:
+        self.mv = mv
+        self.batch_size = max(1, batch_size or settings.ingest_batch_size)
+        self.on_group_written = on_group_written
+        self.on_batch = on_batch
+        self._pending: List[Tuple[Any, Dict[str, Any]]] = []
+        self._groups: Dict[Any, _WriteGroup] = {}
+        self.batches = 0
+        self.chunks = 0
+        self.seconds = 0.0
+        self.max_batch_seconds = 0.0
+
+    def add(
+        self,
+        *,
+        title: str,
+        label: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        group: Any = None,
+    ) -> None:
+        self._groups.setdefault(group, _WriteGroup()).buffered += 1
+        self._pending.append((group, _put_request(title, label, text, metadata)))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def close_group(self, group: Any = None) -> None:
+        """Declare that no more chunks will be added to `group`."""
+        g = self._groups.setdefault(group, _WriteGroup())
+        g.closed = True
+        self._maybe_finish(group, g)
+
+    def _maybe_finish(self, group: Any, g: _WriteGroup) -> None:
+        if g.closed and g.buffered == 0:
+            del self._groups[group]
+            if self.on_group_written is not None:
+                self.on_group_written(group, g.frames)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        t0 = time.perf_counter()
+        frames = _put_batch(self.mv, [r for _, r in batch])
+        elapsed = time.perf_counter() - t0
+        self.batches += 1
+        self.chunks += len(batch)
+        self.seconds += elapsed
+        self.max_batch_seconds = max(self.max_batch_seconds, elapsed)
+        INGEST_CHUNKS.inc(len(batch))
+        INGEST_BATCH_SECONDS.observe(elapsed)
+        logger.debug("Wrote batch of %d chunks in %.3fs", len(batch), elapsed)
+
+        # Record the written groups first: the chunks are in the store now,
+        # whatever `on_batch` does with them.
+        touched = {}
+        for (group, _), chunk_frames in zip(batch, frames):
+            g = self._groups[group]
+            g.buffered -= 1
+            g.frames.append(chunk_frames)
+            touched[group] = g
+        for group, g in touched.items():
+            self._maybe_finish(group, g)
+        if self.on_batch is not None:
+            self.on_batch([r for _, r in batch], frames)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "write_seconds": round(self.seconds, 3),
+            "avg_batch_ms": round(1000 * self.seconds / self.batches, 2) if self.batches else 0.0,
+            "max_batch_ms": round(1000 * self.max_batch_seconds, 2),
+        }
+
+
+def _remove_frame(mv: Any, frame_id: str) -> bool:
     try:
-        mv.put(title=title, label=label, text=text, metadata=md)
-        logger.debug("mem.put() succeeded with keyword args")
-        return
-    except TypeError as e:
-        logger.warning(
-            "mem.put() keyword args rejected (%s). Falling back to positional.", str(e)
-        )
-    except CapacityExceededError:
-        print("Storage capacity exceeded")
-    except LockedError:
-        print("File is locked by another process")
-    except EmbeddingFailedError:
-        print("Embedding generation failed")
-    except Exception:
-        logger.exception("mem.put() failed with keyword args")
-        raise
-
-
-# Fallback: common positional order variants
-# try:
-#    mv.put(title, label, text, md)
-#    logger.debug(
-#        "mem.put() succeeded with positional args (title,label,text,metadata)"
-#    )
-#    return
-# except TypeError as e:
-#    logger.warning(
-#        "mem.put() positional (title,label,text,metadata) rejected (%s). Trying (text,metadata).",
-#        str(e),
-#    )
-
-# Last fallback: minimal put(text, metadata)
-#    try:
-#        mem.put(text, md)
-#        logger.debug("mem.put() succeeded with positional args (text,metadata)")
-#        return
-#    except Exception:
-#        logger.error("mem.put() failed in all call variants. Raising.")
-#        raise
-
-
-def search(query: str, k: int) -> list[Dict[str, Any]]:
-    mem = get_memvid()
+        mv.remove(int(frame_id) if frame_id.isdigit() else frame_id)
+        return True
+    except FrameNotFoundError:
+        logger.debug("Frame %s not found", frame_id)
+    except MemvidError as e:
+        # Already removed ("frame is not active").
+        logger.debug("Frame %s not removed: %s", frame_id, e)
+    return False
+
+
+def remove_chunks(mv: Any, frame_ids: list[str]) -> int:
+    """Remove frames by id; returns how many were removed.
+
+    Removing a chunk's frame leaves the parts Memvid split it into
+    searchable: pass their ids too.
+    """
+    removed = [f for f in frame_ids if _remove_frame(mv, f)]
+    # memvid-sdk occasionally acknowledges a removal without applying it.
+    # Removing again fails ("frame is not active") for those that took
+    # effect, so repeat until none is left live.
+    lost = removed
+    for _ in range(3):
+        lost = [f for f in lost if _remove_frame(mv, f)]
+        if not lost:
+            break
+        logger.warning("Memvid dropped the removal of %d frames; removed them again", len(lost))
+    return len(removed)
+
+
+def store_generation(kb: Optional[str] = None) -> int:
+    name = get_kb(kb).name
+    _follow_pointer(name)
+    return _GENERATIONS.get(name, 0)
+
+
+def bump_generation(kb: Optional[str] = None) -> int:
+    """Mark a store as changed: invalidates its cached retrieval results."""
+    name = get_kb(kb).name
+    with _MEM_LOCK:
+        generation = _GENERATIONS[name] = _GENERATIONS.get(name, 0) + 1
+        # Entries of other stores stay valid, but the cache is small and
+        # ingests are rare: dropping everything keeps this simple.
+        _SEARCH_CACHE.clear()
+        logger.info("Memvid store %s generation bumped to %d", name, generation)
+        return generation
+
+
+def search_cache_stats() -> Dict[str, Any]:
+    return {"generations": dict(_GENERATIONS), **_SEARCH_CACHE.stats()}
+
+
+cache_metrics("retrieval", _SEARCH_CACHE.stats)
+
+
+def search(query: str, k: int, kb: Optional[str] = None, scope: Optional[str] = None) -> list[Dict[str, Any]]:
+    """Top-`k` Memvid hits; `scope` restricts them to frames whose URI starts with it."""
+    t0 = time.perf_counter()
+    name = get_kb(kb).name
+    key = (name, store_generation(name), normalize_query(query), k, scope)
+    cached = _SEARCH_CACHE.get(key)
+    if cached is not None:
+        RETRIEVAL_SECONDS.observe(time.perf_counter() - t0, cache="hit")
+        return [dict(h) for h in cached]
+    hits = _search_uncached(query, k, name, scope)
+    _SEARCH_CACHE.set(key, hits)
+    RETRIEVAL_SECONDS.observe(time.perf_counter() - t0, cache="miss")
+    return [dict(h) for h in hits]
+
+
+def _search_uncached(query: str, k: int, kb: str, scope: Optional[str] = None) -> list[Dict[str, Any]]:
+    try:
+        with read_store(kb) as mem:
+            return _find(mem, query, k, kb, scope)
+    except StoreNotFound:
+        logger.warning("Knowledge base %s has no store yet; ingest it first", kb)
+        return []
+
+
+def _find(mem: Any, query: str, k: int, kb: str, scope: Optional[str] = None) -> list[Dict[str, Any]]:
+    terms = lexical_query(query)
+    if not terms:
+        return []
     # mode: 'lex', 'sem', or default hybrid
-    results = mem.find(query, k=k)
+    if scope:
+        try:
+            results = mem.find(terms, k=k, scope=scope)
+        except LexIndexDisabledError:
+            # memvid-sdk 2.0 raises this when no candidate is in scope.
+            return []
+    else:
+        results = mem.find(terms, k=k)
+    # memvid-sdk 2.x returns a FindResult dict with the hits under "hits";
+    # older releases returned the list directly.
+    if isinstance(results, dict):
+        results = results.get("hits") or []
     # memvid-sdk returns dict-like objects; normalize defensively
     hits = []
     for r in results:
@@ -157,4 +707,34 @@ def search(query: str, k: int) -> list[Dict[str, Any]]:
         else:
             # best effort
             hits.append(getattr(r, "__dict__", {"text": str(r)}))
+    for h in hits:
+        if not h.get("metadata") and h.get("uri") and hasattr(mem, "frame"):
+            h["metadata"] = frame_metadata(mem, h["uri"])
+        h["kb"] = kb
     return hits
+
+
+def frame_metadata(mem: Any, uri: str) -> Dict[str, Any]:
+    """Chunk metadata for a hit; `find()` hits do not carry it, frames do.
+
+    The SDK stores each metadata value JSON-encoded.
+    """
+    try:
+        extra = (mem.frame(uri) or {}).get("extra_metadata") or {}
+    except Exception:
+        logger.debug("No frame metadata for %s", uri, exc_info=True)
+        return {}
+    meta: Dict[str, Any] = {}
+    for key, value in extra.items():
+        try:
+            meta[key] = json.loads(value) if isinstance(value, str) else value
+        except ValueError:
+            meta[key] = value
+    return meta
+
+
+async def search_async(
+    query: str, k: int, kb: Optional[str] = None, scope: Optional[str] = None
+) -> list[Dict[str, Any]]:
+    """`search()` dispatched to the bounded retrieval pool."""
+    return await run_retrieval(search, query, k, kb, scope)
@@ -0,0 +1,426 @@
+"""Sidecar metadata index: which chunks match a source / page / section / tag filter.
+
+Layout (next to the store):
+  <store>.meta.sqlite  one row per chunk URI (source type, file name and path,
+                       PDF page, markdown section path, front-matter type),
+                       its front-matter tags, and the generations it is live in
+
+A filter resolves to the set of matching chunk URIs before ranking. The
+dense index masks exactly those rows. Memvid's only filter is
+`find(scope=...)`, a URI prefix applied to its top candidates: when every
+chunk has a hierarchical URI (`memvid_client.chunk_uri`) the narrowest
+prefix shared by the matches is passed, so out-of-scope hits are never
+returned (nor their metadata fetched). Lexical hits are then restricted to
+the matching URIs, fetching extra candidates in proportion to how much of
+the store the filter excludes, up to `filter_max_candidates`.
+
+Chunks are keyed by URI rather than frame id: Memvid splits long chunks
+into several frames, and hits on those parts carry the chunk's URI (plus
+`#page-N`), as do dense index rows. Removed frames are deleted from the
+store by id (see the ingest manifest), so a changed file's old chunks never
+match a filter through a URI its new chunks reuse.
+
+The ingest writer tags rows with the store generation it is writing, so
+queries still reading the previous generation never see its additions or
+removals. Stores ingested before the index existed are indexed from their
+frames on the next ingest; until then filtered searches raise
+`MetadataIndexError`.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+from .cache import TTLCache
+from .config import settings
+from .knowledge_bases import get_kb
+from .memvid_client import (
+    active_store,
+    chunk_scope,
+    frame_metadata,
+    sidecar_path,
+    store_exists,
+    store_generation,
+)
+
+logger = logging.getLogger("app.core.metadata_index")
+
+Values = Union[str, Sequence[str], None]
+
+# Frames written without an explicit URI (before chunk URIs existed).
+LEGACY_URI_PREFIX = "mv2://frames/"
+
+
+class MetadataIndexError(RuntimeError):
+    """A filtered search hit a store whose metadata index has not been built."""
+
+
+def _values(value: Values, lower: bool = True) -> Tuple[str, ...]:
+    if value is None:
+        return ()
+    items = [value] if isinstance(value, str) else list(value)
+    out = [str(v).strip() for v in items if str(v).strip()]
+    return tuple(sorted({v.lower() if lower else v for v in out}))
+
+
+def _tags(value: Any) -> Tuple[str, ...]:
+    """Front-matter tags as a list, a comma separated string or `#tags`."""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        return ()
+    return _values([str(t).strip().lstrip("#") for t in value])
+
+
+def hit_uri(hit: Dict[str, Any]) -> str:
+    """URI of the chunk a hit belongs to (without Memvid's `#page-N` part)."""
+    return str(hit.get("uri") or "").split("#", 1)[0]
+
+
+@dataclass(frozen=True)
+class ChunkFilter:
+    """Chunk attributes a search is restricted to.
+
+    Fields combine with AND; several values of one field with OR, except
+    `tags`, which must all be present. `section` matches a markdown section
+    path and everything below it (`"Spells"` matches `"Spells > Fireball"`).
+    Page bounds are inclusive and only match PDF chunks.
+    """
+
+    source_types: Tuple[str, ...] = ()
+    source_files: Tuple[str, ...] = ()
+    types: Tuple[str, ...] = ()
+    tags: Tuple[str, ...] = ()
+    section: Optional[str] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+
+    @classmethod
+    def create(
+        cls,
+        *,
+        source_type: Values = None,
+        source_file: Values = None,
+        type: Values = None,
+        tags: Values = None,
+        section: Optional[str] = None,
+        page_from: Optional[int] = None,
+        page_to: Optional[int] = None,
+    ) -> Optional["ChunkFilter"]:
+        """Normalized filter; None when it would not restrict anything."""
+        flt = cls(
+            source_types=_values(source_type),
+            source_files=_values(source_file, lower=False),
+            types=_values(type),
+            tags=_tags(tags) if tags is not None else (),
+            section=(section or "").strip(" >") or None,
+            page_from=page_from,
+            page_to=page_to,
+        )
+        return None if flt == cls() else flt
+
+
+@dataclass(frozen=True)
+class FilterPlan:
+    """A filter resolved against one store."""
+
+    uris: FrozenSet[str]
+    # URI prefix passed to Memvid (None: search the whole store)
+    scope: Optional[str] = None
+    # Live chunks in the store, of which `uris` are the matching ones
+    candidates: int = 0
+
+    def fetch_k(self, k: int) -> int:
+        """Lexical hits to fetch so that about `k` of them match."""
+        if not self.uris or self.candidates <= len(self.uris):
+            return k
+        wanted = math.ceil(k * self.candidates / len(self.uris))
+        return max(k, min(wanted, settings.filter_max_candidates))
+
+
+def _like_prefix(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + " > %"
+
+
+class MetadataIndex:
+    def __init__(self, path: str, *, read_only: bool = False) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        if read_only:
+            self._db = sqlite3.connect(
+                f"file:{quote(path)}?mode=ro", uri=True, check_same_thread=False, timeout=30.0
+            )
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+            self._create()
+        # Generation written by this (writer) handle, see `begin()`.
+        self._writing: Optional[int] = None
+        # Generation a reader handle serves, see `get_metadata_index()`.
+        self.generation = 0
+        self._plans: TTLCache[FilterPlan] = TTLCache(
+            max_entries=256, ttl_seconds=settings.retrieval_cache_ttl_seconds
+        )
+
+    def _create(self) -> None:
+        # Queries read while the ingest process writes.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id INTEGER PRIMARY KEY, uri TEXT NOT NULL, path TEXT, source_type TEXT,"
+            " source_file TEXT COLLATE NOCASE, page INTEGER, section_path TEXT, type TEXT,"
+            " added_in INTEGER NOT NULL, removed_in INTEGER);"
+            "CREATE TABLE IF NOT EXISTS tags (chunk INTEGER NOT NULL, tag TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS chunks_uri ON chunks (uri);"
+            "CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path);"
+            "CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source_type, source_file, page);"
+            "CREATE INDEX IF NOT EXISTS chunks_file ON chunks (source_file);"
+            "CREATE INDEX IF NOT EXISTS chunks_type ON chunks (type);"
+            "CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag, chunk);"
+        )
+        self._db.commit()
+
+    @property
+    def complete(self) -> bool:
+        """Whether every chunk of the store has been indexed."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'complete'").fetchone()
+        return row is not None and row[0] == "1"
+
+    def mark_complete(self) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('complete', '1')")
+            self._db.commit()
+
+    # ---- writer side (single ingest thread) ----
+
+    def begin(self, generation: int, mem: Any) -> None:
+        """Prepare for an ingest writing `generation`, whose store handle is `mem`.
+
+        Rows only live in generations that never got activated are dropped,
+        as are rows removed before the active one. A store without an index
+        is indexed from its frames first.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM chunks WHERE added_in >= ?", (generation,))
+            self._db.execute("UPDATE chunks SET removed_in = NULL WHERE removed_in >= ?", (generation,))
+            self._db.execute("DELETE FROM chunks WHERE removed_in < ?", (generation,))
+            self._db.execute("DELETE FROM tags WHERE chunk NOT IN (SELECT id FROM chunks)")
+            self._db.commit()
+        if not self.complete:
+            self._backfill(mem, generation - 1)
+        self._writing = generation
+
+    def _backfill(self, mem: Any, generation: int) -> None:
+        frame_count = int(mem.stats()["frame_count"])
+        entries = mem.timeline(limit=frame_count) if frame_count else []
+        with self._lock:
+            self._db.execute("DELETE FROM chunks")
+            self._db.execute("DELETE FROM tags")
+        requests: List[Dict[str, Any]] = []
+        for e in entries:
+            metadata = frame_metadata(mem, e["uri"])
+            requests.append({"uri": e["uri"], "metadata": metadata})
+            # Parts of a split frame have URIs of their own unless the
+            # chunk had an explicit URI.
+            if e["uri"].startswith(LEGACY_URI_PREFIX):
+                for child in e.get("child_frames") or ():
+                    requests.append({"uri": f"{LEGACY_URI_PREFIX}{child}", "metadata": metadata})
+            if len(requests) >= 500:
+                self._insert(requests, generation)
+                requests = []
+        self._insert(requests, generation)
+        self.mark_complete()
+        logger.info("Metadata index backfilled from %d frames: %s", len(entries), self.path)
+
+    def add(self, requests: Sequence[Dict[str, Any]]) -> None:
+        """Index written chunks (Memvid put requests, see `memvid_client.chunk_uri`)."""
+        if self._writing is None:
+            raise MetadataIndexError("begin() must be called before writing the metadata index")
+        self._insert(requests, self._writing)
+
+    def _insert(self, requests: Sequence[Dict[str, Any]], generation: int) -> None:
+        with self._lock:
+            for r in requests:
+                uri = r.get("uri")
+                if not uri:
+                    continue
+                meta = r.get("metadata") or {}
+                frontmatter = meta.get("frontmatter") if isinstance(meta.get("frontmatter"), dict) else {}
+                doc_type = frontmatter.get("type") or frontmatter.get("doc_type")
+                page = meta.get("page")
+                cur = self._db.execute(
+                    "INSERT INTO chunks (uri, path, source_type, source_file, page, section_path,"
+                    " type, added_in) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        uri,
+                        meta.get("path"),
+                        str(meta.get("source_type") or "").lower() or None,
+                        meta.get("source_file"),
+                        int(page) if page not in (None, "") else None,
+                        meta.get("section_path") or None,
+                        str(doc_type).strip().lower() if doc_type else None,
+                        generation,
+                    ),
+                )
+                tags = _tags(frontmatter.get("tags"))
+                if tags:
+                    self._db.executemany(
+                        "INSERT INTO tags (chunk, tag) VALUES (?, ?)", [(cur.lastrowid, t) for t in tags]
+                    )
+            self._db.commit()
+
+    def remove_file(self, path: str) -> None:
+        """Drop the chunks of a source file that changed or disappeared."""
+        if self._writing is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "UPDATE chunks SET removed_in = ? WHERE removed_in IS NULL AND path = ?",
+                (self._writing, path),
+            )
+            self._db.commit()
+
+    # ---- reader side ----
+
+    def _where(self, flt: ChunkFilter) -> Tuple[str, List[Any]]:
+        clauses = ["added_in <= ?", "(removed_in IS NULL OR removed_in > ?)"]
+        args: List[Any] = [self.generation, self.generation]
+        for column, values in (
+            ("source_type", flt.source_types),
+            ("source_file", flt.source_files),
+            ("type", flt.types),
+        ):
+            if values:
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                args.extend(values)
+        for tag in flt.tags:
+            clauses.append("id IN (SELECT chunk FROM tags WHERE tag = ?)")
+            args.append(tag)
+        if flt.section:
+            clauses.append("(section_path = ? COLLATE NOCASE OR section_path LIKE ? ESCAPE '\\')")
+            args.extend([flt.section, _like_prefix(flt.section)])
+        if flt.page_from is not None:
+            clauses.append("page >= ?")
+            args.append(flt.page_from)
+        if flt.page_to is not None:
+            clauses.append("page <= ?")
+            args.append(flt.page_to)
+        return " AND ".join(clauses), args
+
+    def _scope(self, where: str, args: List[Any]) -> Optional[str]:
+        """Narrowest URI prefix shared by every match, if all chunks have hierarchical URIs."""
+        live, live_args = self._where(ChunkFilter())
+        legacy = self._db.execute(
+            f"SELECT 1 FROM chunks WHERE {live} AND substr(uri, 1, ?) = ? LIMIT 1",
+            [*live_args, len(LEGACY_URI_PREFIX), LEGACY_URI_PREFIX],
+        ).fetchone()
+        if legacy is not None:
+            return None
+        # File names match filters case-insensitively, but URIs keep their case.
+        types, source_type, files, source_file, paths, path, pages, page = self._db.execute(
+            "SELECT COUNT(DISTINCT source_type), MIN(source_type), COUNT(DISTINCT source_file COLLATE BINARY),"
+            " MIN(source_file COLLATE BINARY), COUNT(DISTINCT path), MIN(path), COUNT(DISTINCT page), MIN(page)"
+            f" FROM chunks WHERE {where}",
+            args,
+        ).fetchone()
+        if types != 1:
+            return None
+        if files != 1:
+            return chunk_scope(source_type)
+        if paths != 1:
+            return chunk_scope(source_type, source_file)
+        one_page = page if source_type == "pdf" and pages == 1 else None
+        return chunk_scope(source_type, source_file, path, one_page)
+
+    def plan(self, flt: ChunkFilter) -> FilterPlan:
+        cached = self._plans.get(flt)
+        if cached is not None:
+            return cached
+        where, args = self._where(flt)
+        live, live_args = self._where(ChunkFilter())
+        with self._lock:
+            uris = frozenset(r[0] for r in self._db.execute(f"SELECT uri FROM chunks WHERE {where}", args))
+            scope = self._scope(where, args) if uris else None
+            candidates = self._db.execute(f"SELECT COUNT(*) FROM chunks WHERE {live}", live_args).fetchone()[0]
+        plan = FilterPlan(uris, scope, candidates)
+        self._plans.set(flt, plan)
+        return plan
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def reset_metadata_index(kb: Optional[str] = None) -> None:
+    """Delete the sidecar (used when the store itself starts from scratch)."""
+    name = get_kb(kb).name
+    with _INDEX_LOCK:
+        entry = _INDEXES.pop(name, None)
+        if entry is not None:
+            entry[1].close()
+        base = sidecar_path(".meta.sqlite", name)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(base + suffix):
+                os.remove(base + suffix)
+
+
+# Reader handle per knowledge base, with the store generation it was opened at.
+_INDEXES: Dict[str, Tuple[int, MetadataIndex]] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def open_metadata_index_writer(kb: Optional[str] = None) -> MetadataIndex:
+    """Index handle for an ingest run; call `begin()` once the generation is open.
+
+    Call before `begin_generation()`: when the store does not exist yet, any
+    index left over from a previous store is discarded.
+    """
+    if store_exists(kb):
+        return MetadataIndex(sidecar_path(".meta.sqlite", kb))
+    reset_metadata_index(kb)
+    index = MetadataIndex(sidecar_path(".meta.sqlite", kb))
+    # Nothing to backfill in a new store.
+    index.mark_complete()
+    return index
+
+
+def get_metadata_index(kb: Optional[str] = None) -> Optional[MetadataIndex]:
+    """Index for a store, reopened after each ingest; None before the first one."""
+    name = get_kb(kb).name
+    generation = store_generation(name)
+    entry = _INDEXES.get(name)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    path = sidecar_path(".meta.sqlite", name)
+    if not os.path.exists(path):
+        return None
+    with _INDEX_LOCK:
+        entry = _INDEXES.get(name)
+        if entry is None or entry[0] != generation:
+            try:
+                index = MetadataIndex(path, read_only=True)
+            except sqlite3.Error:
+                logger.warning("Metadata index %s is not readable yet", path, exc_info=True)
+                return None
+            index.generation = active_store(name)[0]
+            entry = _INDEXES[name] = (generation, index)
+        return entry[1]
+
+
+def filter_plan(flt: ChunkFilter, kb: Optional[str] = None) -> FilterPlan:
+    """Resolve a filter against a knowledge base's active generation."""
+    name = get_kb(kb).name
+    if not store_exists(name):
+        return FilterPlan(frozenset())
+    index = get_metadata_index(name)
+    if index is None or not index.complete:
+        raise MetadataIndexError(
+            f"Knowledge base {name} has no metadata index yet; run an ingest to build it"
+        )
+    return index.plan(flt)
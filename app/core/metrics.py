@@ -0,0 +1,242 @@
+"""Minimal Prometheus-style metrics, rendered in the text exposition format.
+
+Deliberately dependency-free: a handful of counters, gauges and histograms
+updated under a per-metric lock. Values that already live elsewhere (cache
+statistics, for instance) are exported with `CallbackMetric`, which reads
+them only when /api/metrics is scraped.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+from abc import ABC, abstractmethod
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """Header and sample lines in the text exposition format."""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0, 0.0])
+                self._values[key] = entry
+            entry[0][idx] += 1
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(c), list(s))) for k, (c, s) in self._values.items()]
+        lines = self.header()
+        for key, (counts, (total, count)) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _fmt_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {_fmt_value(count)}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """A counter or gauge whose samples are produced by `fn` at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+        type: str = "gauge",
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        self.type = type
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in self.fn().items()
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+
+def callback(
+    name: str,
+    help: str,
+    fn: Callable[[], Dict[LabelValues, float]],
+    labelnames: Sequence[str] = (),
+    type: str = "gauge",
+) -> CallbackMetric:
+    return REGISTRY.register(CallbackMetric(name, help, fn, labelnames, type))  # type: ignore[return-value]
+
+
+# ---- metrics shared across modules ----
+
+RETRIEVAL_SECONDS = histogram(
+    "rag_retrieval_seconds", "Memvid search latency, including cache lookups.", ["cache"]
+)
+CONTEXT_CHARS = histogram(
+    "rag_context_chars", "Size of the context sent to the LLM, in characters.", buckets=SIZE_BUCKETS
+)
+CONTEXT_TOKENS = histogram(
+    "rag_context_tokens", "Approximate tokens of packed sources in the prompt.", buckets=SIZE_BUCKETS
+)
+LLM_SECONDS = histogram("rag_llm_seconds", "Ollama chat latency until the last token.", ["mode"])
+LLM_TTFT_SECONDS = histogram(
+    "rag_llm_ttft_seconds", "Time from sending a streaming Ollama request to its first token."
+)
+OLLAMA_ERRORS = counter("rag_ollama_errors_total", "Failed Ollama calls.", ["endpoint", "error"])
+COALESCED_REQUESTS = counter(
+    "rag_coalesced_requests_total", "Chat requests served by an identical in-flight request.", ["stream"]
+)
+CHAT_SECONDS = histogram(
+    "rag_chat_seconds", "End-to-end /v1/chat/completions latency (until the last byte).", ["stream"]
+)
+INGEST_CHUNKS = counter("rag_ingest_chunks_total", "Chunks written to Memvid.")
+INGEST_BATCH_SECONDS = histogram("rag_ingest_batch_seconds", "Memvid write latency per batch.")
+INGEST_CHUNKS_PER_SECOND = gauge(
+    "rag_ingest_chunks_per_second", "Write throughput of the last finished ingest job."
+)
+
+
+def cache_metrics(name: str, stats: Callable[[], Dict[str, float]]) -> None:
+    """Export hits/misses/entries of a cache exposing a `stats()` dict."""
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("entries", "gauge")):
+        callback(
+            f"rag_{name}_cache_{field}" + ("_total" if kind == "counter" else ""),
+            f"{name.capitalize()} cache {field}.",
+            lambda field=field: {(): float(stats().get(field) or 0)},
+            type=kind,
+        )
@@ -0,0 +1,463 @@
+"""Sidecar dense index: a memory-mapped float32 matrix next to the .mv2 store.
+
+Layout (all next to the store):
+  <store>.vec.f32     row-major float32 matrix, one L2-normalized vector per chunk
+  <store>.vec.i8      optional int8 copy (per-row scale in <store>.vec.scale)
+  <store>.vec.sqlite  row -> frame id, chunk payload (title/label/text/metadata,
+                      chunk URI, source path), the generations the row is live
+                      in, and the index header (dim, embed model)
+
+The matrix is only ever appended to by the single ingest writer, which tags
+rows with the store generation it is writing, like the metadata index. A
+reader maps the rows added up to the generation it serves (a prefix of the
+matrix) and masks those removed by then, so queries on the previous
+generation never see an ingest's additions or removals. Readers open the
+files read-only. Search is exact: block-wise matrix-vector products with
+NumPy and an argpartition top-k, so memory stays bounded by the block size
+whatever the corpus size, and worker processes share the pages via the OS
+cache.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from .config import settings
+from .knowledge_bases import get_kb
+from .memvid_client import active_store, sidecar_path, store_exists, store_generation
+
+logger = logging.getLogger("app.core.vector_index")
+
+BLOCK_ROWS = 65536
+
+
+class VectorIndexError(RuntimeError):
+    pass
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (m / norms).astype(np.float32, copy=False)
+
+
+class VectorIndex:
+    def __init__(self, base: str, *, read_only: bool = False, generation: Optional[int] = None) -> None:
+        self.base = base
+        self.f32_path = base + ".vec.f32"
+        self.i8_path = base + ".vec.i8"
+        self.scale_path = base + ".vec.scale"
+        self.db_path = base + ".vec.sqlite"
+        self._lock = threading.Lock()
+        if read_only:
+            self._db = sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " row INTEGER PRIMARY KEY, frame_id TEXT NOT NULL, title TEXT, label TEXT,"
+                " text TEXT, metadata TEXT, deleted INTEGER NOT NULL DEFAULT 0);"
+                "CREATE INDEX IF NOT EXISTS chunks_frame ON chunks (frame_id);"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(chunks)")}
+            if "uri" not in columns:
+                # Indexes written before chunk URIs existed.
+                self._db.execute("ALTER TABLE chunks ADD COLUMN uri TEXT")
+            if "added_in" not in columns:
+                # Indexes written before generations: rows are live in all of
+                # them, tombstoned ones in none.
+                self._db.execute("ALTER TABLE chunks ADD COLUMN path TEXT")
+                self._db.execute("ALTER TABLE chunks ADD COLUMN added_in INTEGER NOT NULL DEFAULT 0")
+                self._db.execute("ALTER TABLE chunks ADD COLUMN removed_in INTEGER")
+                self._db.execute("UPDATE chunks SET path = json_extract(metadata, '$.path')")
+                self._db.execute("UPDATE chunks SET removed_in = 0 WHERE deleted = 1")
+            self._db.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks (path)")
+            self._db.commit()
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(chunks)")}
+        # Readers may open an index no ingest has migrated yet.
+        self._uri_column = "uri" if "uri" in columns else "NULL"
+        self._scoped = "added_in" in columns
+        # Generation a reader serves (None: every row); see `begin()` for writers.
+        self.generation = generation
+        self._writing: Optional[int] = None
+        # Searches holding this reader, see `read_vector_index()`.
+        self.refs = 0
+        self.retired = False
+        self.dim: Optional[int] = self._meta_int("dim")
+        self.model: Optional[str] = self._meta("model")
+        self._load_rows()
+        self._f32: Optional[np.ndarray] = None
+        self._i8: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+        self._rows_by_uri: Optional[Dict[str, List[int]]] = None
+        self._map()
+
+    # ---- header ----
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _meta_int(self, key: str) -> Optional[int]:
+        v = self._meta(key)
+        return int(v) if v is not None else None
+
+    def _live(self) -> Tuple[str, List[Any]]:
+        """SQL condition for rows live in the served generation."""
+        if not self._scoped:
+            return "deleted = 0", []
+        if self.generation is None:
+            return "removed_in IS NULL", []
+        return "added_in <= ? AND (removed_in IS NULL OR removed_in > ?)", [self.generation] * 2
+
+    def _load_rows(self) -> None:
+        if self.generation is None or not self._scoped:
+            self.rows = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        else:
+            # Rows are appended in generation order: the visible ones are a prefix.
+            self.rows = self._db.execute(
+                "SELECT COUNT(*) FROM chunks WHERE added_in <= ?", (self.generation,)
+            ).fetchone()[0]
+        live, args = self._live()
+        cur = self._db.execute(f"SELECT row FROM chunks WHERE row < ? AND {live}", [self.rows, *args])
+        self._deleted = np.ones(self.rows, dtype=bool)
+        self._deleted[np.fromiter((row for (row,) in cur), dtype=np.int64)] = False
+
+    def _map(self) -> None:
+        if not self.rows or not self.dim:
+            return
+        self._f32 = np.memmap(self.f32_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        # The int8 copy is rebuilt before a generation is activated; a longer
+        # one also covers rows this reader does not serve.
+        if os.path.exists(self.i8_path) and (self._meta_int("i8_rows") or 0) >= self.rows:
+            self._i8 = np.memmap(self.i8_path, dtype=np.int8, mode="r", shape=(self.rows, self.dim))
+            self._scale = np.memmap(self.scale_path, dtype=np.float32, mode="r", shape=(self.rows,))
+
+    # ---- writer side (single ingest thread) ----
+
+    def begin(self, generation: int) -> None:
+        """Prepare for an ingest writing `generation`.
+
+        Rows of generations that never got activated are dropped (and cut
+        from the matrix); their removals are undone.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM chunks WHERE added_in >= ?", (generation,))
+            self._db.execute("UPDATE chunks SET removed_in = NULL WHERE removed_in >= ?", (generation,))
+            self._load_rows()
+            i8_rows = self._meta_int("i8_rows")
+            if i8_rows is not None and i8_rows > self.rows:
+                # Those int8 rows are about to be rewritten with new vectors.
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('i8_rows', ?)", (str(self.rows),))
+            self._db.commit()
+            self._f32 = self._i8 = self._scale = None
+            if self.dim and os.path.exists(self.f32_path):
+                with open(self.f32_path, "r+b") as f:
+                    f.truncate(self.rows * self.dim * 4)
+            self._map()
+            self._writing = generation
+
+    def append(self, frame_ids: Sequence[str], vectors: Sequence[Any], payloads: Sequence[Dict[str, Any]]) -> None:
+        if not frame_ids:
+            return
+        if self._writing is None:
+            raise VectorIndexError("begin() must be called before appending to the vector index")
+        m = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(m.shape[1])
+                self.model = settings.ollama_embed_model
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("dim", str(self.dim)), ("model", self.model)],
+                )
+            elif m.shape[1] != self.dim or self.model != settings.ollama_embed_model:
+                raise VectorIndexError(
+                    f"Vector index holds {self.dim}-d vectors from {self.model!r}; got "
+                    f"{m.shape[1]}-d from {settings.ollama_embed_model!r}. Delete {self.base}.vec.* to rebuild."
+                )
+            with open(self.f32_path, "ab") as f:
+                # Drop rows left behind by an append that never got committed.
+                f.truncate(self.rows * self.dim * 4)
+                f.seek(0, os.SEEK_END)
+                f.write(m.tobytes())
+            start = self.rows
+            self._db.executemany(
+                "INSERT INTO chunks (row, frame_id, title, label, text, metadata, uri, path, added_in)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        start + i,
+                        str(fid),
+                        p.get("title"),
+                        p.get("label"),
+                        p.get("text"),
+                        json.dumps(p.get("metadata") or {}, default=str),
+                        p.get("uri"),
+                        (p.get("metadata") or {}).get("path"),
+                        self._writing,
+                    )
+                    for i, (fid, p) in enumerate(zip(frame_ids, payloads))
+                ],
+            )
+            self._db.commit()
+            self.rows += len(frame_ids)
+            self._deleted = np.concatenate([self._deleted, np.zeros(len(frame_ids), dtype=bool)])
+
+    def remove_file(self, path: str) -> None:
+        """Drop the rows of a source file that changed or disappeared from the generation being written."""
+        if self._writing is None:
+            return
+        with self._lock:
+            cur = self._db.execute("SELECT row FROM chunks WHERE removed_in IS NULL AND path = ?", (path,))
+            rows = [r for (r,) in cur]
+            self._db.execute(
+                "UPDATE chunks SET removed_in = ? WHERE removed_in IS NULL AND path = ?", (self._writing, path)
+            )
+            self._db.commit()
+            self._deleted[rows] = True
+
+    def quantize(self) -> None:
+        """(Re)build the int8 copy: per-row symmetric scaling, ~4x less I/O per search."""
+        if not self.rows or not self.dim:
+            return
+        m = np.memmap(self.f32_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        tmp_i8, tmp_scale = self.i8_path + ".tmp", self.scale_path + ".tmp"
+        with open(tmp_i8, "wb") as fq, open(tmp_scale, "wb") as fs:
+            for start in range(0, self.rows, BLOCK_ROWS):
+                block = np.asarray(m[start : start + BLOCK_ROWS])
+                scale = np.abs(block).max(axis=1) / 127.0
+                scale[scale == 0] = 1.0
+                fq.write(np.round(block / scale[:, None]).astype(np.int8).tobytes())
+                fs.write(scale.astype(np.float32).tobytes())
+        os.replace(tmp_i8, self.i8_path)
+        os.replace(tmp_scale, self.scale_path)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('i8_rows', ?)", (str(self.rows),))
+            self._db.commit()
+        logger.info("Vector index quantized to int8: %d rows", self.rows)
+
+    # ---- reader side ----
+
+    def search(
+        self, query: Sequence[float], k: int, *, allowed_rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Exact top-k by cosine similarity; returns (row, score) best first.
+
+        `allowed_rows` (a boolean mask over rows) restricts the candidates.
+        """
+        if self._f32 is None or k <= 0:
+            return []
+        q = _normalize(np.asarray(query, dtype=np.float32)[None, :])[0]
+        use_i8 = settings.vector_index_int8 and self._i8 is not None
+        rows = self._f32.shape[0]
+        cand_rows: List[np.ndarray] = []
+        cand_scores: List[np.ndarray] = []
+        for start in range(0, rows, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, rows)
+            if use_i8:
+                scores = (self._i8[start:end] @ q) * self._scale[start:end]
+            else:
+                scores = self._f32[start:end] @ q
+            mask = self._deleted[start:end]
+            if allowed_rows is not None:
+                mask = mask | ~allowed_rows[start:end]
+            scores = np.where(mask, -np.inf, scores)
+            if end - start > k:
+                top = np.argpartition(scores, -k)[-k:]
+            else:
+                top = np.arange(end - start)
+            cand_rows.append(top + start)
+            cand_scores.append(scores[top])
+        all_rows = np.concatenate(cand_rows)
+        all_scores = np.concatenate(cand_scores)
+        order = np.argsort(-all_scores)[:k]
+        return [
+            (int(all_rows[i]), float(all_scores[i])) for i in order if np.isfinite(all_scores[i])
+        ]
+
+    def uri_mask(self, uris: Iterable[str]) -> np.ndarray:
+        """Boolean mask over rows of the chunks in `uris`, for `search(allowed_rows=...)`.
+
+        Rows appended before chunk URIs were recorded never match.
+        """
+        if self._rows_by_uri is None:
+            rows_by_uri: Dict[str, List[int]] = {}
+            with self._lock:
+                cur = self._db.execute(
+                    f"SELECT row, {self._uri_column} FROM chunks WHERE row < ? AND {self._uri_column} IS NOT NULL",
+                    (self.rows,),
+                )
+                for row, uri in cur:
+                    rows_by_uri.setdefault(uri, []).append(row)
+            self._rows_by_uri = rows_by_uri
+        mask = np.zeros(self.rows, dtype=bool)
+        for uri in uris:
+            mask[self._rows_by_uri.get(uri, [])] = True
+        return mask
+
+    def payloads(self, rows: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        if not rows:
+            return {}
+        marks = ",".join("?" * len(rows))
+        with self._lock:
+            cur = self._db.execute(
+                f"SELECT row, frame_id, {self._uri_column}, title, label, text, metadata"
+                f" FROM chunks WHERE row IN ({marks})",
+                list(rows),
+            )
+            return {
+                r: {
+                    "frame_id": int(fid) if fid.isdigit() else fid,
+                    "uri": uri,
+                    "title": title,
+                    "label": label,
+                    "text": text,
+                    "metadata": json.loads(md or "{}"),
+                }
+                for r, fid, uri, title, label, text, md in cur
+            }
+
+    def metadata_for_frames(self, frame_ids: Sequence[Any]) -> Dict[str, Dict[str, Any]]:
+        ids = [str(f) for f in frame_ids]
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            live, args = self._live()
+            cur = self._db.execute(
+                f"SELECT frame_id, metadata FROM chunks WHERE {live} AND frame_id IN ({marks})", [*args, *ids]
+            )
+            return {fid: json.loads(md or "{}") for fid, md in cur}
+
+    def close(self) -> None:
+        self._f32 = self._i8 = self._scale = None
+        self._db.close()
+
+
+def reset_vector_index(kb: Optional[str] = None) -> None:
+    """Delete the sidecar files (used when the store itself starts from scratch)."""
+    name = get_kb(kb).name
+    with _INDEX_LOCK:
+        entry = _INDEXES.pop(name, None)
+        if entry is not None:
+            _retire(entry[1])
+        base = sidecar_path("", name)
+        for suffix in (".vec.f32", ".vec.i8", ".vec.scale", ".vec.sqlite"):
+            if os.path.exists(base + suffix):
+                os.remove(base + suffix)
+
+
+# Reader handle per knowledge base, with the store generation it was opened at.
+_INDEXES: Dict[str, Tuple[int, VectorIndex]] = {}
+# Guards handle swaps and reference counts.
+_INDEX_LOCK = threading.Lock()
+
+
+def _retire(index: VectorIndex) -> None:
+    """Close a superseded reader once no search holds it (call with `_INDEX_LOCK`)."""
+    index.retired = True
+    if index.refs == 0:
+        index.close()
+
+
+def open_vector_index_writer(kb: Optional[str] = None) -> Optional[VectorIndex]:
+    """Index handle for an ingest run; None when the dense index is disabled.
+
+    Call before `begin_generation()`: when the store does not exist yet, any
+    index left over from a previous store is discarded.
+    """
+    if not settings.vector_index_enabled:
+        return None
+    if not store_exists(kb):
+        reset_vector_index(kb)
+    return VectorIndex(sidecar_path("", kb))
+
+
+def _reader(name: str) -> Optional[VectorIndex]:
+    """Current reader of a store, reopened after each ingest (call with `_INDEX_LOCK`)."""
+    generation = store_generation(name)
+    entry = _INDEXES.get(name)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    base = sidecar_path("", name)
+    if not os.path.exists(base + ".vec.sqlite"):
+        return None
+    try:
+        index = VectorIndex(base, read_only=True, generation=active_store(name)[0])
+    except sqlite3.Error:
+        logger.warning("Vector index %s.vec.sqlite is not readable yet", base, exc_info=True)
+        return None
+    if entry is not None:
+        _retire(entry[1])
+    _INDEXES[name] = (generation, index)
+    return index
+
+
+def has_vector_index(kb: Optional[str] = None) -> bool:
+    """Whether queries on a store should go hybrid; cheap enough for the event loop.
+
+    Only checks the settings and that an ingest has created the index: the
+    reader itself is (re)opened by `dense_search()` in the retrieval pool.
+    """
+    return settings.vector_index_enabled and os.path.exists(sidecar_path(".vec.sqlite", get_kb(kb).name))
+
+
+def get_vector_index(kb: Optional[str] = None) -> Optional[VectorIndex]:
+    """Index for a store; None when disabled or before the first ingest with it."""
+    if not settings.vector_index_enabled:
+        return None
+    name = get_kb(kb).name
+    with _INDEX_LOCK:
+        return _reader(name)
+
+
+@contextmanager
+def read_vector_index(kb: Optional[str] = None) -> Iterator[Optional[VectorIndex]]:
+    """Borrow a store's index reader; a superseded one is closed after its last search."""
+    if not settings.vector_index_enabled:
+        yield None
+        return
+    name = get_kb(kb).name
+    with _INDEX_LOCK:
+        index = _reader(name)
+        if index is not None:
+            index.refs += 1
+    try:
+        yield index
+    finally:
+        if index is not None:
+            with _INDEX_LOCK:
+                index.refs -= 1
+                if index.retired and index.refs == 0:
+                    index.close()
+
+
+def dense_search(
+    query_vector: Sequence[float],
+    k: int,
+    kb: Optional[str] = None,
+    uris: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Top-k chunks by embedding similarity, shaped like Memvid hits.
+
+    Blocking: opens the reader for the store's active generation when an
+    ingest has activated a new one. `uris` restricts the search to those chunks (a metadata filter).
+    """
+    name = get_kb(kb).name
+    with read_vector_index(name) as index:
+        if index is None:
+            return []
+        allowed = index.uri_mask(uris) if uris is not None else None
+        ranked = index.search(query_vector, k, allowed_rows=allowed)
+        payloads = index.payloads([row for row, _ in ranked])
+    return [{**payloads[row], "score": score, "kb": name} for row, score in ranked if row in payloads]
@@ -0,0 +1,39 @@
+"""Standalone ingest process: `python -m app.ingest [md] [pdf] [--kb NAME]`.
+
+The designated writer when the API runs as read-only query workers
+(`STORE_READ_ONLY=true`); the workers pick up each new store generation
+within `STORE_POLL_SECONDS`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+from typing import List, Optional
+
+from app.ingest.jobs import ingest_sources
+
+
+SOURCES = ("md", "pdf")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.ingest", description="Ingest the configured folders into the stores.")
+    # Validated after parsing: argparse checks a list default against `choices` as one value.
+    parser.add_argument("sources", nargs="*", metavar="{md,pdf}", help="source types (default: both)")
+    parser.add_argument("--kb", action="append", dest="knowledge_bases", help="knowledge base (repeatable; default all)")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.sources if s not in SOURCES]
+    if unknown:
+        parser.error(f"invalid source(s): {', '.join(unknown)} (choose from md, pdf)")
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    result = ingest_sources(args.sources or list(SOURCES), knowledge_bases=args.knowledge_bases)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from app.core.memvid_client import ChunkWriter
+
+
+@dataclass
+class ChunkRecord:
+    """One chunk ready to be stored; plain data so it can cross process boundaries."""
+
+    title: str
+    label: str
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def add_chunks(writer: ChunkWriter, records: List[ChunkRecord], *, group: Any = None) -> None:
+    """Queue all chunks of one group (source file) on `writer` and close the group."""
+    for r in records:
+        writer.add(title=r.title, label=r.label, text=r.text, metadata=r.metadata, group=group)
+    writer.close_group(group)
+
+
+def write_chunks(mv_client: Any, records: List[ChunkRecord]) -> List[str]:
+    """Store chunks in batches and return the frame ids Memvid assigned to them."""
+    out: List[str] = []
+    writer = ChunkWriter(mv_client, on_group_written=lambda _, frames: out.extend(f[0] for f in frames))
+    add_chunks(writer, records)
+    writer.flush()
+    return out
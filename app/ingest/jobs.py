@@ -0,0 +1,277 @@
+"""Ingestion as background jobs: submit, poll progress, cancel.
+
+Only one job may write to the store at a time; submitting while another job
+is queued or running raises `JobConflictError`. Across processes each
+store is guarded by `store_write_lock()`: a job takes the locks of all its
+knowledge bases when submitted (raising `StoreBusy` if another process
+holds one) and keeps them until it finishes. Read-only instances refuse
+jobs with `IngestDisabledError`. Finished jobs are kept in
+memory (most recent `ingest_job_history` of them) so their result can be
+polled after completion.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.executors import submit_ingest
+from app.core.knowledge_bases import KnowledgeBase, get_kb, kb_names
+from app.core.metrics import INGEST_CHUNKS_PER_SECOND
+from app.core.memvid_client import (
+    activate_generation,
+    begin_generation,
+    discard_generation,
+    store_write_locks,
+)
+from app.core.metadata_index import open_metadata_index_writer
+from app.core.vector_index import open_vector_index_writer
+from app.ingest.manifest import count_files, load_manifest
+from app.ingest.md_ingest import ingest_md_dir
+from app.ingest.pdf_ingest import ingest_pdf_dir
+from app.ingest.progress import IngestCancelled, IngestProgress
+
+logger = logging.getLogger("app.ingest")
+
+SOURCES = ("md", "pdf")
+
+
+class JobConflictError(RuntimeError):
+    """Another ingest job already holds the writer slot."""
+
+
+class IngestDisabledError(RuntimeError):
+    """This instance only serves queries (`store_read_only`)."""
+
+
+@dataclass
+class IngestJob:
+    id: str
+    sources: List[str]
+    knowledge_bases: Optional[List[str]] = None  # None = all
+    status: str = "queued"  # queued | running | succeeded | failed | cancelled
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    progress: IngestProgress = field(default_factory=IngestProgress, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+    # Store write locks held from submission until the job finishes.
+    locks: Optional[ExitStack] = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "sources": self.sources,
+            "knowledge_bases": self.knowledge_bases,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.progress.cancelled,
+            "progress": self.progress.snapshot(),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def ingest_sources(
+    sources: List[str],
+    progress: Optional[IngestProgress] = None,
+    knowledge_bases: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Blocking ingest of the configured folders; runs in the ingest executor.
+
+    Each knowledge base (all of them by default) is ingested into its own
+    store. With a single knowledge base the result is its per-source stats,
+    otherwise they are keyed by knowledge base name.
+    """
+    names = knowledge_bases or kb_names()
+    # Several processes may serve the same stores; only one writes each.
+    with store_write_locks(names):
+        return _ingest_locked(sources, progress, names)
+
+
+def _ingest_locked(
+    sources: List[str], progress: Optional[IngestProgress], knowledge_bases: List[str]
+) -> Dict[str, Any]:
+    kbs = [get_kb(name) for name in knowledge_bases]
+    if progress is not None:
+        total = 0
+        for kb in kbs:
+            if "md" in sources:
+                total += count_files(kb.md_dir, ".md")
+            if "pdf" in sources:
+                total += count_files(kb.pdf_dir, ".pdf")
+        progress.start(total)
+    out = {kb.name: _write_kb(kb, sources, progress) for kb in kbs}
+    if len(kb_names()) == 1:
+        return out[kbs[0].name]
+    return out
+
+
+def _write_kb(kb: KnowledgeBase, sources: List[str], progress: Optional[IngestProgress]) -> Dict[str, Any]:
+    logger.info("Ingesting knowledge base %s into %s", kb.name, kb.store)
+    # Load before begin_generation(): a missing store invalidates the
+    # manifest and the sidecar indexes.
+    manifest = load_manifest(kb.name)
+    index = open_vector_index_writer(kb.name)
+    meta = open_metadata_index_writer(kb.name)
+    # Writes go to a copy of the active generation; queries keep reading the
+    # current one until the copy is activated.
+    pending = begin_generation(kb.name)
+    activated = False
+    try:
+        mv = pending.mem
+        # Indexes stores ingested before the metadata index existed.
+        meta.begin(pending.generation, mv)
+        if index is not None:
+            index.begin(pending.generation)
+        out: Dict[str, Any] = {}
+        if "md" in sources:
+            out["md"] = ingest_md_dir(
+                mv_client=mv,
+                md_dir=kb.md_dir,
+                manifest=manifest,
+                progress=progress,
+                vector_index=index,
+                metadata_index=meta,
+            )
+        if "pdf" in sources:
+            out["pdf"] = ingest_pdf_dir(
+                mv_client=mv,
+                pdf_dir=kb.pdf_dir,
+                manifest=manifest,
+                progress=progress,
+                vector_index=index,
+                metadata_index=meta,
+            )
+        if index is not None and settings.vector_index_int8:
+            # Before activating: readers of the new generation use the int8 copy at once.
+            index.quantize()
+        activate_generation(pending)
+        activated = True
+        return out
+    except IngestCancelled:
+        # Files ingested before a cancel are complete and recorded: serve
+        # what was written so far, matching the manifest saved below.
+        if not activated:
+            try:
+                activate_generation(pending)
+                activated = True
+            except Exception:
+                logger.exception("Failed activating store after ingest was cancelled")
+                discard_generation(pending)
+        raise
+    except Exception:
+        # A failed write or batch can leave frames of files the manifest
+        # never recorded; queries keep the active generation instead.
+        if not activated:
+            logger.error("Ingest of %s failed; discarding generation %d", kb.name, pending.generation)
+            discard_generation(pending)
+        raise
+    finally:
+        # The manifest must describe the store queries read, so it is only
+        # saved once the new generation is live.
+        if activated:
+            manifest.save()
+        if index is not None:
+            index.close()
+        meta.close()
+
+
+class JobManager:
+    def __init__(self, history: int) -> None:
+        self.history = history
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._active: Optional[IngestJob] = None
+        self._lock = threading.Lock()
+
+    def submit(self, sources: List[str], knowledge_bases: Optional[List[str]] = None) -> IngestJob:
+        if settings.store_read_only:
+            raise IngestDisabledError("Ingestion is disabled on this read-only instance (STORE_READ_ONLY)")
+        with self._lock:
+            if self._active is not None and not self._active.done:
+                raise JobConflictError(f"Ingest job {self._active.id} is {self._active.status}")
+            job = IngestJob(
+                id=uuid.uuid4().hex,
+                sources=list(sources),
+                knowledge_bases=list(knowledge_bases) if knowledge_bases else None,
+            )
+            # Fail now, not halfway through the knowledge bases, if another
+            # process is writing one of them.
+            with ExitStack() as stack:
+                stack.enter_context(store_write_locks(job.knowledge_bases or kb_names()))
+                job.locks = stack.pop_all()
+            self._active = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if not oldest.done:
+                    break
+                self._jobs.popitem(last=False)
+        try:
+            job.future = submit_ingest(self._run, job)
+        except BaseException as e:
+            job.locks.close()
+            job.error, job.status = f"{type(e).__name__}: {e}", "failed"
+            raise
+        job.future.add_done_callback(lambda f, job=job: self._dropped(job) if f.cancelled() else None)
+        logger.info(
+            "Ingest job %s submitted: sources=%s knowledge_bases=%s",
+            job.id,
+            job.sources,
+            job.knowledge_bases or "all",
+        )
+        return job
+
+    def _run(self, job: IngestJob) -> IngestJob:
+        job.status = "running"
+        try:
+            job.progress.check_cancelled()
+            job.result = _ingest_locked(job.sources, job.progress, job.knowledge_bases or kb_names())
+            job.status = "succeeded"
+            INGEST_CHUNKS_PER_SECOND.set(job.progress.snapshot()["chunks_per_second"])
+        except IngestCancelled:
+            logger.info("Ingest job %s cancelled", job.id)
+            job.status = "cancelled"
+        except Exception as e:
+            logger.exception("Ingest job %s failed", job.id)
+            job.error = f"{type(e).__name__}: {str(e)}"
+            job.status = "failed"
+        finally:
+            job.locks.close()
+            job.finished_at = time.time()
+        return job
+
+    def _dropped(self, job: IngestJob) -> None:
+        """The job's future was cancelled before `_run` started (e.g. executor shutdown)."""
+        job.locks.close()
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        logger.info("Ingest job %s cancelled before it started", job.id)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.done:
+            job.progress.cancel()
+        return job
+
+
+jobs = JobManager(history=settings.ingest_job_history)
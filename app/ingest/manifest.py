@@ -0,0 +1,344 @@
+"""Ingest manifest: which files are in the store, and which chunks came from them.
+
+Persisted as JSON next to the .mv2 store. Re-ingesting a folder only touches
+files whose content changed: unchanged files are skipped, changed files have
+their previous chunks removed before being re-chunked, and files that
+disappeared from disk have their chunks removed.
+
+Version 1 manifests recorded the sequence numbers `put_many()` returns
+instead of frame ids. Their entries are matched to the store's frames by
+source path on the next ingest of their folder (see `sync_dir`).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.memvid_client import frame_metadata, remove_chunks, sidecar_path, store_exists
+from app.core.config import settings
+from app.core.memvid_client import ChunkWriter
+from app.core.metadata_index import MetadataIndex
+from app.core.vector_index import VectorIndex
+from app.ingest.chunks import ChunkRecord, add_chunks
+from app.ingest.parallel import iter_chunked
+from app.ingest.progress import IngestCancelled, IngestProgress
+
+logger = logging.getLogger("app.ingest")
+
+MANIFEST_VERSION = 2
+
+
+@dataclass
+class FileEntry:
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    # One frame id per chunk
+    chunk_ids: List[str] = field(default_factory=list)
+    # Frames Memvid split the chunks into; None for version 1 entries, whose
+    # chunk ids are not frame ids
+    part_ids: Optional[List[str]] = None
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    def __init__(self, path: str, files: Optional[Dict[str, FileEntry]] = None) -> None:
+        self.path = path
+        self.files: Dict[str, FileEntry] = files or {}
+        self._store_frames: Optional[Dict[str, List[List[str]]]] = None
+
+    @classmethod
+    def load(cls, path: str) -> "Manifest":
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except Exception:
+            logger.exception("Unreadable ingest manifest %s; starting from scratch", path)
+            return cls(path)
+        if raw.get("version") not in (1, MANIFEST_VERSION):
+            logger.warning("Ingest manifest %s has an unknown version; ignoring it", path)
+            return cls(path)
+        files = {p: FileEntry(**e) for p, e in (raw.get("files") or {}).items()}
+        return cls(path, files)
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "files": {p: asdict(e) for p, e in self.files.items()},
+                },
+                f,
+            )
+        os.replace(tmp, self.path)
+
+    def get(self, path: str) -> Optional[FileEntry]:
+        return self.files.get(path)
+
+    def record(self, entry: FileEntry) -> None:
+        self.files[entry.path] = entry
+
+    def forget(self, path: str) -> Optional[FileEntry]:
+        return self.files.pop(path, None)
+
+    def paths_under(self, root: str, suffix: str) -> List[str]:
+        root = os.path.abspath(root) + os.sep
+        return [
+            p for p in self.files if p.startswith(root) and p.lower().endswith(suffix)
+        ]
+
+    def store_frames(self, mv_client: Any) -> Dict[str, List[List[str]]]:
+        """Frame ids in the store per source path (see `ChunkWriter`), read once."""
+        if self._store_frames is None:
+            self._store_frames = store_frames_by_path(mv_client)
+        return self._store_frames
+
+
+def load_manifest(kb: Optional[str] = None) -> Manifest:
+    """Load the manifest belonging to a knowledge base's store.
+
+    If the store file is gone the manifest is stale by definition, so start
+    from an empty one rather than skipping every file.
+    """
+    path = sidecar_path(".ingest-manifest.json", kb)
+    if not store_exists(kb):
+        return Manifest(path)
+    return Manifest.load(path)
+
+
+def store_frames_by_path(mv_client: Any) -> Dict[str, List[List[str]]]:
+    """Live chunks of a store grouped by source path: frame id, then its parts."""
+    total = int(mv_client.stats()["frame_count"])
+    out: Dict[str, List[List[str]]] = {}
+    for e in mv_client.timeline(limit=total) if total else []:
+        path = frame_metadata(mv_client, e["uri"]).get("path")
+        if path:
+            parts = [str(c) for c in e.get("child_frames") or ()]
+            out.setdefault(str(path), []).append([str(e["frame_id"]), *parts])
+    logger.info("Read frame ids of %d source files from the store", len(out))
+    return out
+
+
+def _adopt_store_frames(
+    manifest: Manifest, root: str, suffix: str, mv_client: Any, forget: Callable[[FileEntry], None]
+) -> None:
+    """Give the version 1 entries under `root` the ids of their frames in the store.
+
+    Changed files used to leave their superseded chunks behind (and removed
+    other files' chunks instead): when the store does not hold exactly as
+    many chunks for a file as the manifest recorded, every copy is removed
+    and the file is ingested again. Chunks of files missing from the
+    manifest are removed too.
+    """
+    frames = manifest.store_frames(mv_client)
+    for path in manifest.paths_under(root, suffix):
+        entry = manifest.files[path]
+        if entry.part_ids is not None:
+            continue
+        found = frames.pop(path, [])
+        expected = len(entry.chunk_ids)
+        entry.chunk_ids = [f[0] for f in found]
+        entry.part_ids = [p for f in found for p in f[1:]]
+        if len(found) != expected:
+            logger.warning(
+                "Store holds %d chunks of %s, manifest recorded %d; re-ingesting it", len(found), path, expected
+            )
+            forget(entry)
+            manifest.forget(path)
+    prefix = os.path.abspath(root) + os.sep
+    for path in [p for p in frames if p.startswith(prefix) and p.lower().endswith(suffix)]:
+        found = frames.pop(path)
+        if path not in manifest.files:
+            logger.warning("Removing %d chunks of %s, which the manifest does not list", len(found), path)
+            forget(
+                FileEntry(
+                    path=path,
+                    size=0,
+                    mtime=0.0,
+                    sha256="",
+                    chunk_ids=[f[0] for f in found],
+                    part_ids=[p for f in found for p in f[1:]],
+                )
+            )
+
+
+def sync_dir(
+    *,
+    mv_client: Any,
+    root: str,
+    suffix: str,
+    manifest: Optional[Manifest],
+    chunk_file: Callable[[str], List[ChunkRecord]],
+    workers: Optional[int] = None,
+    progress: Optional[IngestProgress] = None,
+    vector_index: Optional[VectorIndex] = None,
+    metadata_index: Optional[MetadataIndex] = None,
+) -> Dict[str, Any]:
+    """Walk `root` and ingest files ending with `suffix`.
+
+    Files that need (re)ingesting are chunked in parallel by `chunk_file`
+    while this thread writes the results. Without a manifest every file is
+    ingested, as before. `progress` receives per-file updates and is checked
+    for cancellation between files. With a `vector_index`, written chunks are
+    embedded and appended to it, and removed chunks are dropped from it too;
+    a `metadata_index` records the filterable attributes of every chunk.
+    Batches Ollama fails to embed are retried once after the last write;
+    files still missing embeddings are re-ingested by the next run.
+    """
+    stats: Dict[str, Any] = {"files": 0, "chunks": 0, "skipped": 0, "removed": 0}
+
+    def forget_chunks(entry: FileEntry) -> None:
+        removed = remove_chunks(mv_client, entry.chunk_ids)
+        remove_chunks(mv_client, entry.part_ids or [])
+        if vector_index is not None:
+            vector_index.remove_file(entry.path)
+        if metadata_index is not None:
+            metadata_index.remove_file(entry.path)
+        stats["removed"] += removed
+        if progress is not None:
+            progress.chunks_superseded(removed)
+
+    if manifest is not None and any(manifest.files[p].part_ids is None for p in manifest.paths_under(root, suffix)):
+        _adopt_store_frames(manifest, root, suffix, mv_client, forget_chunks)
+
+    seen: set[str] = set()
+    todo: Dict[str, Tuple[os.stat_result, Optional[str]]] = {}
+    for dirpath, _, files in os.walk(root):
+        for f in sorted(files):
+            if not f.lower().endswith(suffix):
+                continue
+            path = os.path.abspath(os.path.join(dirpath, f))
+            seen.add(path)
+            stats["files"] += 1
+            if manifest is None:
+                todo[path] = (os.stat(path), None)
+                continue
+
+            st = os.stat(path)
+            previous = manifest.get(path)
+            unchanged = previous is not None and previous.size == st.st_size and previous.mtime == st.st_mtime
+            digest = None if unchanged else file_sha256(path)
+            if previous is not None and previous.sha256 == digest:
+                # Touched but not modified: remember the new mtime, keep the chunks.
+                previous.size, previous.mtime = st.st_size, st.st_mtime
+                unchanged = True
+            if unchanged:
+                stats["skipped"] += 1
+                if progress is not None:
+                    progress.file_skipped()
+                continue
+            if previous is not None:
+                logger.info("File changed, superseding %d chunks: %s", len(previous.chunk_ids), path)
+                forget_chunks(previous)
+                manifest.forget(path)
+            todo[path] = (st, digest)
+
+    if manifest is not None:
+        for path in manifest.paths_under(root, suffix):
+            if path in seen:
+                continue
+            entry = manifest.forget(path)
+            if entry is not None:
+                logger.info("File deleted, removing %d chunks: %s", len(entry.chunk_ids), path)
+                forget_chunks(entry)
+
+    def on_written(path: str, frames: List[List[str]]) -> None:
+        stats["chunks"] += len(frames)
+        st, digest = todo[path]
+        if manifest is not None and digest is not None:
+            manifest.record(
+                FileEntry(
+                    path=path,
+                    size=st.st_size,
+                    mtime=st.st_mtime,
+                    sha256=digest,
+                    chunk_ids=[f[0] for f in frames],
+                    part_ids=[p for f in frames for p in f[1:]],
+                )
+            )
+        if progress is not None:
+            progress.file_done(path, len(frames))
+
+    # This thread is the single writer; chunking runs ahead in worker processes.
+    embed = settings.embed_on_ingest or vector_index is not None
+    if embed:
+        # Imported lazily: embeddings pull in the HTTP client stack.
+        from app.rag.embeddings import embed_texts_blocking
+
+    # Batches written while Ollama could not embed them, retried at the end.
+    unembedded: List[Tuple[List[Dict[str, Any]], List[List[str]]]] = []
+
+    def embed_batch(requests: List[Dict[str, Any]], frames: List[List[str]]) -> bool:
+        try:
+            vectors = embed_texts_blocking([r["text"] for r in requests])
+        except Exception as e:
+            logger.warning("Embedding %d written chunks failed: %s: %s", len(requests), type(e).__name__, e)
+            return False
+        if vector_index is not None:
+            vector_index.append([f[0] for f in frames], vectors, requests)
+        return True
+
+    def on_batch(requests: List[Dict[str, Any]], frames: List[List[str]]) -> None:
+        if metadata_index is not None:
+            metadata_index.add(requests)
+        if embed and not embed_batch(requests, frames):
+            unembedded.append((requests, frames))
+
+    def retry_embeddings() -> None:
+        failed = [(requests, frames) for requests, frames in unembedded if not embed_batch(requests, frames)]
+        unembedded.clear()
+        if not failed:
+            return
+        paths = {str((r.get("metadata") or {}).get("path")) for requests, _ in failed for r in requests}
+        stats["embed_failed"] = sum(len(requests) for requests, _ in failed)
+        logger.error("%d chunks of %d files were stored without embeddings", stats["embed_failed"], len(paths))
+        if manifest is not None and vector_index is not None:
+            # Make the next ingest see these files as changed and redo them.
+            for path in paths:
+                entry = manifest.get(path)
+                if entry is not None:
+                    entry.mtime, entry.sha256 = -1.0, ""
+
+    writer = ChunkWriter(
+        mv_client,
+        on_group_written=on_written,
+        on_batch=on_batch if embed or metadata_index is not None else None,
+    )
+    try:
+        try:
+            for path, records in iter_chunked(todo, chunk_file, workers=workers):
+                if progress is not None:
+                    progress.check_cancelled()
+                    progress.file_started(path)
+                add_chunks(writer, records, group=path)
+        except IngestCancelled:
+            # Files already chunked are complete: write them so they are recorded.
+            writer.flush()
+            raise
+        writer.flush()
+    finally:
+        if unembedded:
+            retry_embeddings()
+    stats["write"] = writer.stats()
+    return stats
+
+
+def count_files(root: str, suffix: str) -> int:
+    return sum(
+        1 for _, _, files in os.walk(root) for f in files if f.lower().endswith(suffix)
+    )
@@ -1,16 +1,21 @@
 import os
 import re
 from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import logging
 import yaml
 
 from app.core.config import settings
-from app.core.memvid_client import put_chunk, get_memvid
-from app.utils.text import approx_token_count, split_by_token_target
+from app.core.metadata_index import MetadataIndex
+from app.core.vector_index import VectorIndex
+from app.ingest.chunks import ChunkRecord, write_chunks
+from app.ingest.manifest import Manifest, sync_dir
+from app.ingest.progress import IngestProgress
+from app.utils.text import iter_token_windows
 from pathlib import Path
 
 FRONTMATTER_RE = re.compile(r"^---\s*\n(.*?)\n---\s*\n", re.DOTALL)
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$")
 logger = logging.getLogger("app.ingest")
 
 
@@ -36,24 +41,22 @@ def parse_md(path: str) -> MdDoc:
     return MdDoc(path=path, frontmatter=frontmatter, body=body)
 
 
-def header_chunks(body: str) -> List[Tuple[str, str]]:
-    """Split markdown by headings, returning (section_path, text)."""
-    lines = body.splitlines()
-    chunks: List[Tuple[str, List[str]]] = []
+def iter_header_sections(body: str) -> Iterator[Tuple[str, str]]:
+    """Split markdown by headings, yielding (section_path, text) as they are found."""
     path: List[str] = []
     buf: List[str] = []
 
-    def flush():
-        nonlocal buf
+    def section() -> Optional[Tuple[str, str]]:
         text = "\n".join(buf).strip()
-        if text:
-            chunks.append((" > ".join(path) if path else "", text.splitlines()))
-        buf = []
+        return (" > ".join(path) if path else "", text) if text else None
 
-    for line in lines:
-        h = re.match(r"^(#{1,6})\s+(.*)$", line.strip())
+    for line in body.splitlines():
+        h = HEADING_RE.match(line.strip())
         if h:
-            flush()
+            done = section()
+            if done:
+                yield done
+            buf = []
             level = len(h.group(1))
             title = h.group(2).strip()
             # adjust path stack
@@ -67,12 +70,14 @@ def header_chunks(body: str) -> List[Tuple[str, str]]:
                 path[level - 1] = title
             continue
         buf.append(line)
-    flush()
+    done = section()
+    if done:
+        yield done
+
 
-    out: List[Tuple[str, str]] = []
-    for p, ls in chunks:
-        out.append((p, "\n".join(ls).strip()))
-    return out
+def header_chunks(body: str) -> List[Tuple[str, str]]:
+    """Split markdown by headings, returning (section_path, text)."""
+    return list(iter_header_sections(body))
 
 
 def build_embed_prefix(frontmatter: Dict[str, Any], filename: str) -> str:
@@ -101,7 +106,8 @@ def build_embed_prefix(frontmatter: Dict[str, Any], filename: str) -> str:
     return "[" + " | ".join(parts) + "]\n\n"
 
 
-def ingest_md_file(mv_client: Any,path: str) -> int:
+def chunk_md_file(path: str) -> List[ChunkRecord]:
+    """Parse and chunk one markdown file. Pure CPU work, safe to run in a worker process."""
     doc = parse_md(path)
     filename = os.path.basename(path)
     prefix = build_embed_prefix(doc.frontmatter, filename)
@@ -118,9 +124,9 @@ def ingest_md_file(mv_client: Any,path: str) -> int:
     raw_sections = header_chunks(doc.body)
     logger.info("MD file '%s' has %d sections", filename, len(raw_sections))
 
-    emitted = 0
-    
-    for section_path, section_text in raw_sections:
+    records: List[ChunkRecord] = []
+
+    for section_index, (section_path, section_text) in enumerate(raw_sections):
         if not section_text.strip():
             continue
         merged_text = (
@@ -130,21 +136,21 @@ def ingest_md_file(mv_client: Any,path: str) -> int:
         )
         # logger.info("Merged Text '%s'", merged_text)
         # token split (approx)
-        for idx, chunk_text in enumerate(
-            split_by_token_target(
+        for idx, (chunk_text, tokens) in enumerate(
+            iter_token_windows(
                 merged_text,
                 target=settings.md_chunk_target_tokens,
                 max_tokens=settings.md_chunk_max_tokens,
                 overlap=settings.md_chunk_overlap_tokens,
             )
         ):
-            if approx_token_count(chunk_text) < settings.md_chunk_min_tokens:
-                logger.info(
+            if tokens < settings.md_chunk_min_tokens:
+                logger.debug(
                     "Skipping small MD chunk: file=%s section='%s' chunk_index=%d tokens=%d",
                     filename,
                     section_path,
                     idx,
-                    approx_token_count(chunk_text),
+                    tokens,
                 )
                 continue
             metadata = {
@@ -152,42 +158,52 @@ def ingest_md_file(mv_client: Any,path: str) -> int:
                 "source_file": filename,
                 "path": path,
                 "section_path": section_path,
+                # Headings can repeat within a file; this keeps chunk URIs unique.
+                "section_index": section_index,
                 "chunk_index": idx,
                 "frontmatter": doc.frontmatter,
             }
-            logger.info(
+            logger.debug(
                 "Emitting MD chunk: file=%s section='%s' chunk_index=%d tokens=%d",
                 filename,
                 section_path,
                 idx,
-                approx_token_count(chunk_text),
+                tokens,
             )
             title = (
                 doc.frontmatter.get("title") or doc.frontmatter.get("name") or filename
             )
             label = doc.frontmatter.get("type") or "md"
-            logger.info(
-                "Putting chunk to Memvid: title='%s' label='%s'", str(title), str(label)
+            records.append(
+                ChunkRecord(title=str(title), label=str(label), text=chunk_text, metadata=metadata)
             )
-            put_chunk(
-                mv=mv_client,
-                title=str(title),
-                label=str(label),
-                text=chunk_text,
-                metadata=metadata,
-            )
-            emitted += 1
-    return emitted
+    return records
+
+
+def ingest_md_file(mv_client: Any, path: str) -> List[str]:
+    """Chunk one markdown file into the store; returns the ids of the chunks written."""
+    return write_chunks(mv_client, chunk_md_file(path))
 
 
-def ingest_md_dir(mv_client: Any, md_dir: str | None = None) -> Dict[str, int]:
+def ingest_md_dir(
+    mv_client: Any,
+    md_dir: str | None = None,
+    manifest: Optional[Manifest] = None,
+    workers: Optional[int] = None,
+    progress: Optional[IngestProgress] = None,
+    vector_index: Optional[VectorIndex] = None,
+    metadata_index: Optional[MetadataIndex] = None,
+) -> Dict[str, Any]:
     md_dir = md_dir or settings.md_dir
-    stats = {"files": 0, "chunks": 0}
     logger.info("Ingesting MD directory: %s", md_dir)
-    for root, _, files in os.walk(md_dir):
-        for f in files:
-            if not f.lower().endswith(".md"):
-                continue
-            stats["files"] += 1
-            stats["chunks"] += ingest_md_file(mv_client=mv_client, path=os.path.join(root, f))
-    return stats
+    return sync_dir(
+        mv_client=mv_client,
+        root=md_dir,
+        suffix=".md",
+        manifest=manifest,
+        chunk_file=chunk_md_file,
+        workers=workers,
+        progress=progress,
+        vector_index=vector_index,
+        metadata_index=metadata_index,
+    )
@@ -0,0 +1,78 @@
+"""Parse and chunk files in a process pool, hand the results to one writer.
+
+Chunking (pypdf text extraction, markdown parsing, token windows) is CPU
+bound and independent per file, so it scales across processes. Writing is
+not: the .mv2 file must only ever see one writer. `iter_chunked` keeps at
+most `max_pending` files in flight and yields each file's chunks back to
+the calling thread, which is the only one that touches the Memvid handle.
+While the caller is writing, the pool keeps chunking the next files.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.ingest")
+
+R = TypeVar("R")
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """Worker processes to use: explicit value, else settings, 0 meaning one per CPU."""
+    n = settings.ingest_processes if workers is None else workers
+    if n <= 0:
+        n = os.cpu_count() or 1
+    return n
+
+
+def iter_chunked(
+    paths: Iterable[str],
+    chunk_file: Callable[[str], R],
+    *,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> Iterator[Tuple[str, R]]:
+    """Yield `(path, chunk_file(path))` as results become available.
+
+    With a single worker everything runs inline, in order. `chunk_file` must
+    be a module-level function so it can be pickled for worker processes.
+    Any exception raised while chunking a file is re-raised here.
+    """
+    paths = list(paths)
+    n = min(resolve_workers(workers), len(paths))
+    if n <= 1:
+        for path in paths:
+            yield path, chunk_file(path)
+        return
+
+    max_pending = max_pending or settings.ingest_max_pending_files or 2 * n
+    logger.info("Chunking %d files with %d worker processes", len(paths), n)
+    # spawn, not fork: the parent runs event-loop and executor threads.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n, mp_context=ctx) as pool:
+        todo = iter(paths)
+        pending: Dict[Future, str] = {}
+
+        def fill() -> None:
+            while len(pending) < max_pending:
+                path = next(todo, None)
+                if path is None:
+                    return
+                pending[pool.submit(chunk_file, path)] = path
+
+        fill()
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    path = pending.pop(fut)
+                    yield path, fut.result()
+                fill()
+        finally:
+            for fut in pending:
+                fut.cancel()
@@ -1,12 +1,18 @@
 import os
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 from pypdf import PdfReader
 
 from app.core.config import settings
-from app.core.memvid_client import put_chunk
-from app.utils.text import approx_token_count, split_by_token_target
+from app.core.metadata_index import MetadataIndex
+from app.core.vector_index import VectorIndex
+from app.ingest.chunks import ChunkRecord, write_chunks
+from app.ingest.manifest import Manifest, sync_dir
+from app.ingest.progress import IngestProgress
+from app.utils.text import iter_token_windows
+
+HSPACE_RE = re.compile(r"[ \t]+")
 
 
 def extract_pdf_pages(path: str) -> List[str]:
@@ -15,16 +21,17 @@ def extract_pdf_pages(path: str) -> List[str]:
     for p in reader.pages:
         text = p.extract_text() or ""
         # normalize whitespace
-        text = re.sub(r"[ \t]+", " ", text)
+        text = HSPACE_RE.sub(" ", text)
         pages.append(text)
     return pages
 
 
-def ingest_pdf_file(mv_client: Any,path: str) -> int:
+def chunk_pdf_file(path: str) -> List[ChunkRecord]:
+    """Extract and chunk one PDF. Pure CPU work, safe to run in a worker process."""
     filename = os.path.basename(path)
     pages = extract_pdf_pages(path)
 
-    emitted = 0
+    records: List[ChunkRecord] = []
     for page_idx, page_text in enumerate(pages, start=1):
         if not page_text.strip():
             continue
@@ -32,15 +39,15 @@ def ingest_pdf_file(mv_client: Any,path: str) -> int:
         page_text = page_text.replace("\r", "")
         prefix = f"[Doc: {os.path.splitext(filename)[0]} | source: pdf | page: {page_idx}]\n\n"
         merged = prefix + page_text
-        for idx, chunk_text in enumerate(
-            split_by_token_target(
+        for idx, (chunk_text, tokens) in enumerate(
+            iter_token_windows(
                 merged,
                 target=settings.pdf_chunk_target_tokens,
                 max_tokens=settings.pdf_chunk_max_tokens,
                 overlap=settings.pdf_chunk_overlap_tokens,
             )
         ):
-            if approx_token_count(chunk_text) < settings.pdf_chunk_min_tokens:
+            if tokens < settings.pdf_chunk_min_tokens:
                 continue
             metadata = {
                 "source_type": "pdf",
@@ -51,18 +58,33 @@ def ingest_pdf_file(mv_client: Any,path: str) -> int:
             }
             title = os.path.splitext(filename)[0]
             label = "pdf"
-            put_chunk(mv=mv_client, title=title, label=label, text=chunk_text, metadata=metadata)
-            emitted += 1
-    return emitted
+            records.append(ChunkRecord(title=title, label=label, text=chunk_text, metadata=metadata))
+    return records
+
 
+def ingest_pdf_file(mv_client: Any, path: str) -> List[str]:
+    """Chunk one PDF into the store; returns the ids of the chunks written."""
+    return write_chunks(mv_client, chunk_pdf_file(path))
 
-def ingest_pdf_dir(mv_client: Any,pdf_dir: str | None = None) -> Dict[str, int]:
+
+def ingest_pdf_dir(
+    mv_client: Any,
+    pdf_dir: str | None = None,
+    manifest: Optional[Manifest] = None,
+    workers: Optional[int] = None,
+    progress: Optional[IngestProgress] = None,
+    vector_index: Optional[VectorIndex] = None,
+    metadata_index: Optional[MetadataIndex] = None,
+) -> Dict[str, Any]:
     pdf_dir = pdf_dir or settings.pdf_dir
-    stats = {"files": 0, "chunks": 0}
-    for root, _, files in os.walk(pdf_dir):
-        for f in files:
-            if not f.lower().endswith(".pdf"):
-                continue
-            stats["files"] += 1
-            stats["chunks"] += ingest_pdf_file(mv_client=mv_client, path=os.path.join(root, f))
-    return stats
+    return sync_dir(
+        mv_client=mv_client,
+        root=pdf_dir,
+        suffix=".pdf",
+        manifest=manifest,
+        chunk_file=chunk_pdf_file,
+        workers=workers,
+        progress=progress,
+        vector_index=vector_index,
+        metadata_index=metadata_index,
+    )
@@ -0,0 +1,76 @@
+"""Thread-safe progress counters and cancellation flag for one ingest run."""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class IngestCancelled(Exception):
+    """Raised inside the ingest thread once cancellation was requested."""
+
+
+class IngestProgress:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.started_at: Optional[float] = None
+        self.files_total = 0
+        self.files_done = 0
+        self.files_skipped = 0
+        self.chunks_written = 0
+        self.chunks_removed = 0
+        self.current_file: Optional[str] = None
+
+    def start(self, files_total: int) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self.files_total = files_total
+
+    def file_started(self, path: str) -> None:
+        with self._lock:
+            self.current_file = path
+
+    def file_done(self, path: str, chunks: int) -> None:
+        with self._lock:
+            self.files_done += 1
+            self.chunks_written += chunks
+            if self.current_file == path:
+                self.current_file = None
+
+    def file_skipped(self) -> None:
+        with self._lock:
+            self.files_done += 1
+            self.files_skipped += 1
+
+    def chunks_superseded(self, n: int) -> None:
+        with self._lock:
+            self.chunks_removed += n
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise IngestCancelled()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.time() - self.started_at if self.started_at else 0.0
+            remaining = max(self.files_total - self.files_done, 0)
+            files_per_s = self.files_done / elapsed if elapsed > 0 else 0.0
+            return {
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "files_skipped": self.files_skipped,
+                "chunks_written": self.chunks_written,
+                "chunks_removed": self.chunks_removed,
+                "current_file": self.current_file,
+                "elapsed_seconds": round(elapsed, 2),
+                "chunks_per_second": round(self.chunks_written / elapsed, 2) if elapsed > 0 else 0.0,
+                "eta_seconds": round(remaining / files_per_s, 1) if files_per_s > 0 else None,
+            }
@@ -1,9 +1,17 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 import logging
 import os
 from app.api.debug_routes import router as debug_router
 from app.api.ingest_routes import router as ingest_router
 from app.api.openai_routes import router as openai_router
+from app.core.admission import AdmissionRejected
+from app.core.executors import shutdown_executors
+from app.core.metadata_index import MetadataIndexError
+from app.rag.ollama_client import close_ollama_client, open_ollama_client
+from app.rag.warmup import start_warmup
 from fastapi.middleware.cors import CORSMiddleware
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -19,10 +27,41 @@ def setup_logging() -> None:
 setup_logging()
 logger = logging.getLogger("app")
 
+
+def _startup_logs():
+    logger.info("Starting OpenWebUI RAG Backend")
+    logger.info("LOG_LEVEL=%s", LOG_LEVEL)
+    # Log important env vars
+    logger.info("MEMVID_DIR=%s", os.getenv("MEMVID_DIR"))
+    logger.info("MEMVID_INDEX=%s", os.getenv("MEMVID_INDEX"))
+    logger.info("DATA_MD_DIR=%s", os.getenv("DATA_MD_DIR"))
+    logger.info("DATA_PDF_DIR=%s", os.getenv("DATA_PDF_DIR"))
+    logger.info("OLLAMA_BASE_URL=%s", os.getenv("OLLAMA_BASE_URL"))
+    logger.info("OLLAMA_CHAT_MODEL=%s", os.getenv("OLLAMA_CHAT_MODEL"))
+    logger.info("OLLAMA_EMBED_MODEL=%s", os.getenv("OLLAMA_EMBED_MODEL"))
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    _startup_logs()
+    await open_ollama_client()
+    # Runs in the background: the app serves /api/health (and /api/ready,
+    # 503 until done) while stores and models are being loaded.
+    warmup = start_warmup()
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+        await close_ollama_client()
+        shutdown_executors()
+
+
 app = FastAPI(
     title="OpenWebUI RAG Gateway",
     version="0.1.0",
     description="OpenAI-compatible API for Open WebUI, backed by Memvid + Ollama.",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -33,20 +72,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(_request: Request, exc: AdmissionRejected):
+    # OpenAI-style error body so clients apply their usual rate-limit retry.
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": {"message": str(exc), "type": "rate_limit_exceeded", "code": exc.reason}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(MetadataIndexError)
+async def metadata_index_missing(_request: Request, exc: MetadataIndexError):
+    return JSONResponse(
+        status_code=409,
+        content={"error": {"message": str(exc), "type": "invalid_request_error", "code": "metadata_index_missing"}},
+    )
+
+
 app.include_router(debug_router)
 app.include_router(ingest_router)
 app.include_router(openai_router)
-
-
-@app.on_event("startup")
-def _startup_logs():
-    logger.info("Starting OpenWebUI RAG Backend")
-    logger.info("LOG_LEVEL=%s", LOG_LEVEL)
-    # Log important env vars
-    logger.info("MEMVID_DIR=%s", os.getenv("MEMVID_DIR"))
-    logger.info("MEMVID_INDEX=%s", os.getenv("MEMVID_INDEX"))
-    logger.info("DATA_MD_DIR=%s", os.getenv("DATA_MD_DIR"))
-    logger.info("DATA_PDF_DIR=%s", os.getenv("DATA_PDF_DIR"))
-    logger.info("OLLAMA_BASE_URL=%s", os.getenv("OLLAMA_BASE_URL"))
-    logger.info("OLLAMA_CHAT_MODEL=%s", os.getenv("OLLAMA_CHAT_MODEL"))
-    logger.info("OLLAMA_EMBED_MODEL=%s", os.getenv("OLLAMA_EMBED_MODEL"))
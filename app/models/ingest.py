@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class IngestJobRequest(BaseModel):
+    sources: List[Literal["md", "pdf"]] = Field(default_factory=lambda: ["md", "pdf"])
+    # Knowledge bases to ingest; all of them when omitted
+    knowledge_bases: Optional[List[str]] = None
@@ -4,6 +4,8 @@ from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
+from app.models.search import SearchFilters
+
 
 class OpenAIModel(BaseModel):
     id: str
@@ -27,6 +29,8 @@ class ChatCompletionRequest(BaseModel):
     stream: bool = False
     temperature: Optional[float] = None
     max_tokens: Optional[int] = None
+    # Non-standard: restrict retrieval, e.g. {"source_file": "PHB.pdf", "page_from": 100}
+    filters: Optional[SearchFilters] = None
 
 
 class ChatCompletionChoiceMessage(BaseModel):
@@ -47,3 +51,28 @@ class ChatCompletionResponse(BaseModel):
     model: str
     choices: List[ChatCompletionChoice]
     usage: Dict[str, Any] = Field(default_factory=dict)
+    # Non-standard: size of the packed sources (see app.rag.packing).
+    context: Optional[Dict[str, Any]] = None
+
+
+class ChatCompletionChunkDelta(BaseModel):
+    role: Optional[str] = None
+    content: Optional[str] = None
+
+
+class ChatCompletionChunkChoice(BaseModel):
+    index: int = 0
+    delta: ChatCompletionChunkDelta
+    finish_reason: Optional[str] = None
+
+
+class ChatCompletionChunk(BaseModel):
+    id: str
+    object: str = "chat.completion.chunk"
+    created: int
+    model: str
+    choices: List[ChatCompletionChunkChoice]
+    # Non-standard: sources used for the answer and the packed context size,
+    # sent on the final chunk only.
+    citations: Optional[List[str]] = None
+    context: Optional[Dict[str, Any]] = None
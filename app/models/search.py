@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import List, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.core.metadata_index import ChunkFilter
+
+
+class SearchFilters(BaseModel):
+    """Restrict retrieval to chunks with these attributes (see `ChunkFilter`).
+
+    Fields combine with AND, list values with OR (`tags`: all of them).
+    """
+
+    model_config = ConfigDict(extra="forbid")
+
+    source_type: Union[Literal["md", "pdf"], List[Literal["md", "pdf"]], None] = None
+    # File name as ingested, e.g. "PHB.pdf" (case-insensitive)
+    source_file: Union[str, List[str], None] = None
+    # Markdown front matter `type` / `tags`
+    type: Union[str, List[str], None] = None
+    tags: Union[str, List[str], None] = None
+    # Markdown section path prefix, e.g. "Monsters > Dragons"
+    section: Optional[str] = None
+    # Inclusive PDF page range
+    page_from: Optional[int] = Field(default=None, ge=1)
+    page_to: Optional[int] = Field(default=None, ge=1)
+
+    def to_filter(self) -> Optional[ChunkFilter]:
+        return ChunkFilter.create(**self.model_dump())
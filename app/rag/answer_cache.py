@@ -0,0 +1,144 @@
+"""Cache of full completions for deterministic (temperature 0) requests.
+
+Entries live in an in-process LRU+TTL cache; with `answer_cache_persist`
+they are also written to a SQLite file next to the .mv2 store so they
+survive restarts. The key covers everything that determines the output,
+including a hash of the retrieved context, so re-ingesting a document
+naturally stops old answers from matching.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import cache_metrics
+from app.core.memvid_client import sidecar_path
+from app.utils.text import normalize_query
+
+logger = logging.getLogger("app.rag.answer_cache")
+
+
+def answer_cache_key(
+    *,
+    model: str,
+    system: str,
+    query: str,
+    context: str,
+    temperature: float,
+    max_tokens: Optional[int],
+) -> str:
+    payload = {
+        "model": model,
+        "system": system,
+        "query": normalize_query(query),
+        "context": hashlib.sha256(context.encode("utf-8")).hexdigest(),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    raw = json.dumps(payload, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, *, max_entries: int, ttl_seconds: float, path: Optional[str] = None) -> None:
+        self._mem: TTLCache[str] = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self.disk_hits = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._prune()
+            logger.info("Answer cache persisted at %s", path)
+
+    def get(self, key: str) -> Optional[str]:
+        content = self._mem.get(key)
+        if content is not None or self._db is None:
+            return content
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT content, created_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        content, created_at = row
+        if self.ttl_seconds > 0 and created_at + self.ttl_seconds < time.time():
+            return None
+        self.disk_hits += 1
+        self._mem.set(key, content)
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        self._mem.set(key, content)
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, content, created_at) VALUES (?, ?, ?)",
+                (key, content, time.time()),
+            )
+            self._db.commit()
+            self._writes += 1
+            prune = self._writes % 64 == 0
+        if prune:
+            self._prune()
+
+    def _prune(self) -> None:
+        assert self._db is not None
+        with self._db_lock:
+            if self.ttl_seconds > 0:
+                self._db.execute(
+                    "DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                )
+            self._db.execute(
+                "DELETE FROM answers WHERE key NOT IN "
+                "(SELECT key FROM answers ORDER BY created_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._mem.stats(), "disk_hits": self.disk_hits, "persist_path": self.path}
+
+
+_CACHE: Optional[AnswerCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the process-wide answer cache, or None when it is disabled."""
+    global _CACHE
+    if not settings.answer_cache_enabled:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = AnswerCache(
+                    max_entries=settings.answer_cache_size,
+                    ttl_seconds=settings.answer_cache_ttl_seconds,
+                    path=sidecar_path(".answers.sqlite") if settings.answer_cache_persist else None,
+                )
+    return _CACHE
+
+
+def _answer_cache_stats() -> Dict[str, Any]:
+    cache = get_answer_cache()
+    return cache.stats() if cache is not None else {}
+
+
+cache_metrics("answer", _answer_cache_stats)
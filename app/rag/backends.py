@@ -0,0 +1,199 @@
+"""A pool of Ollama backends with least-outstanding-requests routing.
+
+Each backend keeps its own pooled HTTP client. Requests go to the healthy
+backend with the fewest requests in flight, preferring backends known to
+have the requested model (from their `/api/tags`). A connection failure
+before any response byte ejects the backend and the request fails over to
+the next one; once a response has started nothing is retried. Ejected
+backends are readmitted by the periodic health check.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import counter
+
+logger = logging.getLogger("app.rag.backends")
+
+# Errors raised before the backend has seen the request: safe to fail over.
+FAILOVER_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+FAILOVERS = counter("rag_ollama_failovers_total", "Requests moved to another Ollama backend.", ["backend"])
+
+
+class NoBackendAvailable(RuntimeError):
+    """Every Ollama backend refused the connection."""
+
+
+def backend_urls() -> List[str]:
+    """`OLLAMA_BASE_URLS` (comma separated), or the single `OLLAMA_BASE_URL`."""
+    urls = [u.strip().rstrip("/") for u in settings.ollama_base_urls.split(",") if u.strip()]
+    return urls or [settings.ollama_base_url.rstrip("/")]
+
+
+def model_name(model: str) -> str:
+    """Ollama's canonical name: an untagged model means `:latest`."""
+    return model if ":" in model else f"{model}:latest"
+
+
+@dataclass
+class Backend:
+    url: str
+    client: httpx.AsyncClient
+    outstanding: int = 0
+    healthy: bool = True
+    # None until the first health check: assume it serves anything.
+    models: Optional[Set[str]] = None
+    failures: int = 0
+    last_error: Optional[str] = None
+    checked_at: Optional[float] = None
+    requests: int = 0
+
+    def serves(self, model: Optional[str]) -> bool:
+        return model is None or self.models is None or model_name(model) in self.models
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "models": sorted(self.models) if self.models is not None else None,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+        }
+
+
+class BackendPool:
+    def __init__(self, urls: List[str], client_factory: Callable[[str], httpx.AsyncClient]) -> None:
+        self.backends = [Backend(url=u, client=client_factory(u)) for u in urls]
+        self._rotation = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+
+    # ---- routing ----
+
+    def candidates(self, model: Optional[str] = None) -> List[Backend]:
+        """Backends to try, best first.
+
+        Healthy backends with the model come first, least outstanding
+        requests first (ties rotate). Healthy backends without the model
+        follow (Ollama may pull it), then ejected ones as a last resort.
+        """
+        n = len(self.backends)
+        start = next(self._rotation) % n
+        rotated = self.backends[start:] + self.backends[:start]
+
+        def rank(b: Backend) -> tuple:
+            return (not b.healthy, not b.serves(model), b.outstanding)
+
+        return sorted(rotated, key=rank)
+
+    def eject(self, backend: Backend, error: Exception) -> None:
+        """Take `backend` out of rotation until a health check readmits it."""
+        if backend.healthy:
+            logger.warning("Ejecting Ollama backend %s: %s", backend.url, error)
+        backend.healthy = False
+        backend.failures += 1
+        backend.last_error = f"{type(error).__name__}: {error}"
+
+    async def request(
+        self, method: str, path: str, *, model: Optional[str] = None, **kwargs: Any
+    ) -> httpx.Response:
+        """Send a request, failing over on connection errors."""
+        last: Optional[Exception] = None
+        for backend in self.candidates(model):
+            backend.outstanding += 1
+            backend.requests += 1
+            try:
+                return await backend.client.request(method, path, **kwargs)
+            except FAILOVER_ERRORS as e:
+                self.eject(backend, e)
+                FAILOVERS.inc(backend=backend.url)
+                last = e
+            finally:
+                backend.outstanding -= 1
+        raise NoBackendAvailable(f"No Ollama backend reachable: {last}") from last
+
+    async def post(self, path: str, *, model: Optional[str] = None, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", path, model=model, **kwargs)
+
+    @asynccontextmanager
+    async def stream(
+        self, method: str, path: str, *, model: Optional[str] = None, **kwargs: Any
+    ) -> AsyncIterator[httpx.Response]:
+        """Streaming request; fails over only until response headers arrive."""
+        last: Optional[Exception] = None
+        for backend in self.candidates(model):
+            backend.outstanding += 1
+            backend.requests += 1
+            try:
+                request = backend.client.build_request(method, path, **kwargs)
+                response = await backend.client.send(request, stream=True)
+            except FAILOVER_ERRORS as e:
+                backend.outstanding -= 1
+                self.eject(backend, e)
+                FAILOVERS.inc(backend=backend.url)
+                last = e
+                continue
+            except BaseException:
+                backend.outstanding -= 1
+                raise
+            try:
+                yield response
+            finally:
+                await response.aclose()
+                backend.outstanding -= 1
+            return
+        raise NoBackendAvailable(f"No Ollama backend reachable: {last}") from last
+
+    # ---- health ----
+
+    async def check(self, backend: Backend) -> None:
+        try:
+            r = await backend.client.get("/api/tags", timeout=settings.ollama_connect_timeout)
+            r.raise_for_status()
+            names = {m.get("name") or m.get("model") for m in r.json().get("models") or []}
+        except Exception as e:
+            self.eject(backend, e)
+        else:
+            if not backend.healthy:
+                logger.info("Readmitting Ollama backend %s", backend.url)
+            backend.healthy = True
+            backend.failures = 0
+            backend.models = {n for n in names if n}
+        backend.checked_at = time.time()
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(b) for b in self.backends))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ollama_health_interval_seconds)
+            try:
+                await self.check_all()
+            except Exception:
+                logger.exception("Ollama health check failed")
+
+    def start_health_checks(self) -> None:
+        if self._health_task is None and settings.ollama_health_interval_seconds > 0:
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for b in self.backends:
+            await b.client.aclose()
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [b.to_dict() for b in self.backends]
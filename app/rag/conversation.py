@@ -0,0 +1,85 @@
+"""Retrieval reuse across the turns of a conversation.
+
+Open WebUI resends the whole history with every turn. The candidates
+retrieved for a turn are kept under a hash of the conversation's user
+messages so far; the next turn looks up its prefix (every user message but
+the newest), retrieves only for the new message, and fuses both rankings
+with reciprocal-rank fusion. A follow-up such as "and at level 5?" thus
+keeps the sources of the question it follows up on, and a regenerated
+answer (same messages again) reuses its candidates without retrieving.
+
+Keys include each store's generation, so an ingest invalidates them, and
+the request's metadata filter, so turns under different filters never mix.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.knowledge_bases import kb_names
+from app.core.memvid_client import store_generation
+from app.core.metadata_index import ChunkFilter
+from app.core.metrics import cache_metrics, counter
+from app.rag.retrieval import fuse_rrf, retrieve
+from app.utils.text import normalize_query
+
+logger = logging.getLogger("app.rag.conversation")
+
+CONVERSATION_TURNS = counter(
+    "rag_conversation_turns_total",
+    "Chat turns by retrieval reuse: first, followup (fused with earlier turns) or replay.",
+    ["retrieval"],
+)
+
+_TURNS: TTLCache[List[Dict[str, Any]]] = TTLCache(
+    max_entries=settings.conversation_cache_size,
+    ttl_seconds=settings.conversation_cache_ttl_seconds,
+)
+cache_metrics("conversation", _TURNS.stats)
+
+
+def conversation_key(
+    user_messages: Sequence[str],
+    knowledge_bases: Optional[List[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> str:
+    h = hashlib.sha256()
+    for name in sorted(knowledge_bases or kb_names()):
+        h.update(f"{name}@{store_generation(name)}\0".encode("utf-8"))
+    if filters is not None:
+        h.update(repr(filters).encode("utf-8") + b"\0")
+    for message in user_messages:
+        h.update(normalize_query(message).encode("utf-8") + b"\0")
+    return h.hexdigest()
+
+
+async def retrieve_turn(
+    query: str,
+    history: Sequence[str],
+    k: int,
+    knowledge_bases: Optional[List[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> List[Dict[str, Any]]:
+    """Top-`k` candidates for the newest user message of a conversation.
+
+    `history` holds the earlier user messages, oldest first.
+    """
+    key = conversation_key([*history, query], knowledge_bases, filters)
+    cached = _TURNS.get(key)
+    if cached is not None:
+        CONVERSATION_TURNS.inc(retrieval="replay")
+        return [dict(h) for h in cached]
+
+    hits = await retrieve(query, k=k, knowledge_bases=knowledge_bases, filters=filters)
+    earlier = _TURNS.get(conversation_key(history, knowledge_bases, filters)) if history else None
+    if earlier:
+        # Older turns fade out: each turn keeps only the top `k` of the fusion.
+        hits = fuse_rrf([hits, earlier], k, settings.rrf_k)
+        CONVERSATION_TURNS.inc(retrieval="followup")
+    else:
+        CONVERSATION_TURNS.inc(retrieval="first")
+    _TURNS.set(key, [dict(h) for h in hits])
+    return hits
@@ -0,0 +1,265 @@
+"""Ollama embeddings: batched, concurrent, and cached by content hash.
+
+Vectors are cached under sha256(model, text) in memory and, optionally, in
+a SQLite file next to the .mv2 store, so re-ingesting unchanged chunks or
+repeating a query never calls Ollama again.
+
+Two entry points share the same cache: `embed_texts()` for the event loop
+(uses the Ollama backend pool) and `embed_texts_blocking()` for ingestion
+threads (own synchronous clients, thread-level concurrency, same backend
+order and failover).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.memvid_client import sidecar_path
+from app.core.metrics import OLLAMA_ERRORS, cache_metrics, histogram
+from app.rag.backends import FAILOVER_ERRORS, FAILOVERS, NoBackendAvailable
+from app.rag.ollama_client import get_backend_pool, keep_alive
+
+logger = logging.getLogger("app.rag.embeddings")
+
+# float32, 4 bytes per dimension; converts to NumPy without a copy.
+Vector = array
+
+EMBED_BATCH_SECONDS = histogram(
+    "rag_embed_batch_seconds", "Ollama /api/embed latency per batch.", ["caller"]
+)
+
+
+def content_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, *, max_entries: int, path: Optional[str] = None, max_disk_entries: int = 0) -> None:
+        self._mem: TTLCache[Vector] = TTLCache(max_entries=max_entries, ttl_seconds=0)
+        self.path = path
+        # 0 = unbounded
+        self.max_disk_entries = max_disk_entries
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self.disk_hits = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            self._prune()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Vector]:
+        found: Dict[str, Vector] = {}
+        missing: List[str] = []
+        for k in keys:
+            v = self._mem.get(k)
+            if v is not None:
+                found[k] = v
+            else:
+                missing.append(k)
+        if missing and self._db is not None:
+            with self._db_lock:
+                for i in range(0, len(missing), 500):
+                    part = missing[i : i + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchall()
+                    for k, blob in rows:
+                        v = array("f", blob)
+                        found[k] = v
+                        self._mem.set(k, v)
+                        self.disk_hits += 1
+        return found
+
+    def set_many(self, items: Dict[str, Vector]) -> None:
+        for k, v in items.items():
+            self._mem.set(k, v)
+        if self._db is None or not items:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(k, v.tobytes()) for k, v in items.items()],
+            )
+            self._db.commit()
+            self._writes += 1
+            prune = self._writes % 64 == 0
+        if prune:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Keep the `max_disk_entries` most recently written vectors."""
+        if self._db is None or self.max_disk_entries <= 0:
+            return
+        with self._db_lock:
+            # INSERT OR REPLACE gives rewritten rows a new rowid: rowid order is write order.
+            self._db.execute(
+                "DELETE FROM embeddings WHERE rowid <= "
+                "(SELECT rowid FROM embeddings ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._mem.stats(), "disk_hits": self.disk_hits, "persist_path": self.path}
+
+
+_CACHE: Optional[EmbeddingCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = EmbeddingCache(
+                    max_entries=settings.embed_cache_size,
+                    path=sidecar_path(".embeddings.sqlite") if settings.embed_cache_persist else None,
+                    max_disk_entries=settings.embed_cache_disk_entries,
+                )
+    return _CACHE
+
+
+def _embedding_cache_stats() -> Dict[str, Any]:
+    # Scrapes must not create the cache (and its sqlite file) on instances
+    # that never embed, e.g. read-only query workers.
+    return _CACHE.stats() if _CACHE is not None else {}
+
+
+cache_metrics("embedding", _embedding_cache_stats)
+
+
+def _plan(texts: Sequence[str], model: str) -> Tuple[List[str], Dict[str, Vector], List[str]]:
+    """Keys per text, vectors already cached, and unique texts still to embed."""
+    keys = [content_key(model, t) for t in texts]
+    found = get_embedding_cache().get_many(keys)
+    todo: Dict[str, str] = {}
+    for k, t in zip(keys, texts):
+        if k not in found and k not in todo:
+            todo[k] = t
+    return keys, found, list(todo.values())
+
+
+def _batches(items: List[str]) -> List[List[str]]:
+    size = max(1, settings.embed_batch_size)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _parse(data: Dict[str, Any], expected: int) -> List[Vector]:
+    vectors = data.get("embeddings") or []
+    if len(vectors) != expected:
+        raise RuntimeError(f"Ollama returned {len(vectors)} embeddings for {expected} inputs")
+    return [array("f", v) for v in vectors]
+
+
+def _finish(keys: List[str], found: Dict[str, Vector], todo: List[str], vectors: List[Vector], model: str) -> List[Vector]:
+    fresh = {content_key(model, t): v for t, v in zip(todo, vectors)}
+    get_embedding_cache().set_many(fresh)
+    found.update(fresh)
+    return [found[k] for k in keys]
+
+
+async def embed_texts(
+    texts: Sequence[str], *, model: Optional[str] = None, client: Optional[httpx.AsyncClient] = None
+) -> List[Vector]:
+    """Embed `texts` (order preserved), calling Ollama only for uncached ones."""
+    model = model or settings.ollama_embed_model
+    keys, found, todo = _plan(texts, model)
+    if not todo:
+        return [found[k] for k in keys]
+    sem = asyncio.Semaphore(max(1, settings.embed_concurrency))
+
+    async def post(batch: List[str]) -> httpx.Response:
+        body = keep_alive({"model": model, "input": batch})
+        if client is not None:
+            return await client.post("/api/embed", json=body)
+        return await get_backend_pool().post("/api/embed", model=model, json=body)
+
+    async def one(batch: List[str]) -> List[Vector]:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                r = await post(batch)
+                r.raise_for_status()
+                out = _parse(r.json(), len(batch))
+            except Exception as e:
+                OLLAMA_ERRORS.inc(endpoint="embed", error=type(e).__name__)
+                raise
+            EMBED_BATCH_SECONDS.observe(time.perf_counter() - t0, caller="async")
+            return out
+
+    results = await asyncio.gather(*(one(b) for b in _batches(todo)))
+    return _finish(keys, found, todo, [v for part in results for v in part], model)
+
+
+async def embed_query(query: str, *, model: Optional[str] = None) -> Vector:
+    return (await embed_texts([query], model=model))[0]
+
+
+def embed_texts_blocking(texts: Sequence[str], *, model: Optional[str] = None) -> List[Vector]:
+    """Synchronous `embed_texts()` for ingestion threads (no event loop there)."""
+    model = model or settings.ollama_embed_model
+    keys, found, todo = _plan(texts, model)
+    if not todo:
+        return [found[k] for k in keys]
+
+    timeout = httpx.Timeout(settings.ollama_read_timeout, connect=settings.ollama_connect_timeout)
+    backend_pool = get_backend_pool()
+    backends = backend_pool.candidates(model)
+    clients = [httpx.Client(base_url=b.url, timeout=timeout) for b in backends]
+    # Batches are spread over the healthy backends serving the model (ranked
+    # first); the others are only failed over to.
+    spread = max(1, sum(1 for b in backends if b.healthy and b.serves(model)))
+    try:
+
+        def post(batch: List[str], start: int) -> httpx.Response:
+            last: Optional[Exception] = None
+            order = list(range(start, spread)) + list(range(start)) + list(range(spread, len(clients)))
+            for j in order:
+                try:
+                    return clients[j].post("/api/embed", json=keep_alive({"model": model, "input": batch}))
+                except FAILOVER_ERRORS as e:
+                    logger.warning("Embedding backend %s unreachable: %s", backends[j].url, e)
+                    backend_pool.eject(backends[j], e)
+                    FAILOVERS.inc(backend=backends[j].url)
+                    last = e
+            raise NoBackendAvailable(f"No Ollama backend reachable: {last}") from last
+
+        def one(batch: List[str], i: int = 0) -> List[Vector]:
+            t0 = time.perf_counter()
+            try:
+                r = post(batch, i % spread)
+                r.raise_for_status()
+                out = _parse(r.json(), len(batch))
+            except Exception as e:
+                OLLAMA_ERRORS.inc(endpoint="embed", error=type(e).__name__)
+                raise
+            EMBED_BATCH_SECONDS.observe(time.perf_counter() - t0, caller="blocking")
+            return out
+
+        batches = _batches(todo)
+        if len(batches) == 1:
+            results = [one(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, settings.embed_concurrency)) as pool:
+                results = list(pool.map(one, batches, range(len(batches))))
+    finally:
+        for c in clients:
+            c.close()
+    return _finish(keys, found, todo, [v for part in results for v in part], model)
@@ -1,22 +1,196 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 
 from app.core.config import settings
+from app.core.metrics import LLM_SECONDS, LLM_TTFT_SECONDS, OLLAMA_ERRORS, callback
+from app.rag.backends import BackendPool, backend_urls
 
+logger = logging.getLogger("app.rag.ollama_client")
 
-async def ollama_chat(messages: List[Dict[str, str]], *, model: Optional[str] = None) -> str:
-    """Call Ollama native /api/chat and return assistant text."""
-    url = settings.ollama_base_url.rstrip("/") + "/api/chat"
-    payload = {
+_POOL: Optional[BackendPool] = None
+
+
+def _build_client(base_url: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.ollama_max_connections,
+        max_keepalive_connections=settings.ollama_max_keepalive_connections,
+        keepalive_expiry=settings.ollama_keepalive_expiry,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.ollama_connect_timeout,
+        read=settings.ollama_read_timeout,
+        write=settings.ollama_connect_timeout,
+        pool=settings.ollama_connect_timeout,
+    )
+    # Transport-level retries only cover connection failures (refused/reset
+    # before a request is sent), so they are safe for non-idempotent POSTs.
+    transport = httpx.AsyncHTTPTransport(
+        limits=limits, retries=settings.ollama_connect_retries
+    )
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=timeout,
+        transport=transport,
+    )
+
+
+def get_backend_pool() -> BackendPool:
+    """Return the process-wide Ollama backend pool, creating it on first use.
+
+    The app opens it in its lifespan (which also starts health checks);
+    lazy creation keeps scripts working.
+    """
+    global _POOL
+    if _POOL is None:
+        _POOL = BackendPool(backend_urls(), _build_client)
+    return _POOL
+
+
+async def open_ollama_client() -> BackendPool:
+    pool = get_backend_pool()
+    await pool.check_all()
+    pool.start_health_checks()
+    for b in pool.backends:
+        logger.info(
+            "Ollama backend %s: healthy=%s models=%s",
+            b.url,
+            b.healthy,
+            sorted(b.models) if b.models is not None else "?",
+        )
+    logger.info(
+        "Ollama client ready: backends=%d max_connections=%d keepalive=%d",
+        len(pool.backends),
+        settings.ollama_max_connections,
+        settings.ollama_max_keepalive_connections,
+    )
+    return pool
+
+
+async def close_ollama_client() -> None:
+    global _POOL
+    if _POOL is None:
+        return
+    try:
+        await _POOL.aclose()
+    finally:
+        _POOL = None
+
+
+def _pool_metrics(field: str) -> Dict[Tuple[str, ...], float]:
+    if _POOL is None:
+        return {}
+    return {(b.url,): float(getattr(b, field)) for b in _POOL.backends}
+
+
+callback(
+    "rag_ollama_backend_up",
+    "1 when the Ollama backend passes health checks.",
+    lambda: _pool_metrics("healthy"),
+    ["backend"],
+)
+callback(
+    "rag_ollama_backend_outstanding",
+    "Requests in flight per Ollama backend.",
+    lambda: _pool_metrics("outstanding"),
+    ["backend"],
+)
+
+
+def keep_alive(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the configured `keep_alive` to an Ollama request body."""
+    if settings.ollama_keep_alive:
+        payload["keep_alive"] = settings.ollama_keep_alive
+    return payload
+
+
+def _chat_payload(
+    messages: List[Dict[str, str]],
+    *,
+    model: Optional[str],
+    stream: bool,
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
         "model": model or settings.ollama_chat_model,
         "messages": messages,
-        "stream": False,
+        "stream": stream,
     }
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.post(url, json=payload)
+    # Fixed window: the context packer sizes prompts for exactly this.
+    options: Dict[str, Any] = {"num_ctx": settings.llm_context_tokens}
+    if temperature is not None:
+        options["temperature"] = temperature
+    if max_tokens is not None:
+        options["num_predict"] = max_tokens
+    payload["options"] = options
+    return keep_alive(payload)
+
+
+async def ollama_chat(
+    messages: List[Dict[str, str]],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Call Ollama native /api/chat and return assistant text."""
+    payload = _chat_payload(
+        messages, model=model, stream=False, temperature=temperature, max_tokens=max_tokens
+    )
+    t0 = time.perf_counter()
+    try:
+        r = await get_backend_pool().post("/api/chat", model=payload["model"], json=payload)
         r.raise_for_status()
         data = r.json()
+    except Exception as e:
+        OLLAMA_ERRORS.inc(endpoint="chat", error=type(e).__name__)
+        raise
+    LLM_SECONDS.observe(time.perf_counter() - t0, mode="blocking")
     return (data.get("message") or {}).get("content") or ""
+
+
+async def ollama_chat_stream(
+    messages: List[Dict[str, str]],
+    *,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """Call Ollama native /api/chat with streaming and yield content deltas.
+
+    Ollama answers with NDJSON: one object per line, each carrying a partial
+    `message.content`, the last one with `done: true`.
+    """
+    payload = _chat_payload(
+        messages, model=model, stream=True, temperature=temperature, max_tokens=max_tokens
+    )
+    t0 = time.perf_counter()
+    first = True
+    try:
+        pool = get_backend_pool()
+        async with pool.stream("POST", "/api/chat", model=payload["model"], json=payload) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.strip():
+                    continue
+                data: Dict[str, Any] = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Ollama stream error: {data['error']}")
+                content = (data.get("message") or {}).get("content") or ""
+                if content:
+                    if first:
+                        LLM_TTFT_SECONDS.observe(time.perf_counter() - t0)
+                        first = False
+                    yield content
+                if data.get("done"):
+                    break
+    except Exception as e:
+        OLLAMA_ERRORS.inc(endpoint="chat_stream", error=type(e).__name__)
+        raise
+    LLM_SECONDS.observe(time.perf_counter() - t0, mode="stream")
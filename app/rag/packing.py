@@ -0,0 +1,159 @@
+"""Pack retrieved hits into a prompt context that fits a token budget.
+
+The budget is what is left of the model's context window after the answer
+(`max_tokens`), the system prompt and the question. Packing runs in two
+passes over the hits, best first:
+
+1. every hit gets a snippet of at most `snippet_chars` (whole sentences) so
+   as many sources as possible are cited;
+2. the remaining budget grows the snippets, again in whole sentences, in
+   rank order.
+
+Token counts use `approx_token_count`, like the chunker.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.text import approx_token_count
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+@dataclass
+class PackedContext:
+    text: str
+    citations: List[str]
+    tokens: int
+    budget: int
+    trimmed: int = 0  # sources shortened to fit
+    dropped: int = 0  # sources left out entirely
+
+    def info(self) -> Dict[str, Any]:
+        """Packed size, as reported in the response metadata."""
+        return {
+            "tokens": self.tokens,
+            "chars": len(self.text),
+            "budget_tokens": self.budget,
+            "sources": len(self.citations),
+            "trimmed": self.trimmed,
+            "dropped": self.dropped,
+        }
+
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the non-blank sentences of `text`, whitespace trimmed."""
+    spans = []
+    start = 0
+    bounds = [(m.start(), m.end()) for m in SENTENCE_RE.finditer(text)] + [(len(text), len(text))]
+    for end, next_start in bounds:
+        segment = text[start:end]
+        if segment.strip():
+            lead = len(segment) - len(segment.lstrip())
+            spans.append((start + lead, start + len(segment.rstrip())))
+        start = next_start
+    return spans
+
+
+@dataclass
+class _Source:
+    header: str
+    citation: str
+    text: str
+    spans: List[Tuple[int, int]]  # sentence offsets in `text`
+    tokens: List[int]
+    used: int = 0  # whole sentences included
+    partial: Optional[str] = None  # first sentence cut at a word boundary
+    partial_tokens: int = 0
+
+    @property
+    def sentences(self) -> List[str]:
+        return [self.text[a:b] for a, b in self.spans]
+
+    @property
+    def complete(self) -> bool:
+        return self.partial is None and self.used == len(self.spans)
+
+    def render(self) -> str:
+        if self.partial is not None:
+            body = self.partial
+        elif self.used:
+            # Slice the source so the separators (newlines, lists) survive.
+            body = self.text[self.spans[0][0] : self.spans[self.used - 1][1]]
+        else:
+            body = ""
+        if not self.complete:
+            body += " …"
+        return self.header + body
+
+
+def context_budget(prompt_overhead: str, max_tokens: Optional[int]) -> int:
+    """Tokens available for sources once the answer and fixed prompt parts are reserved."""
+    answer = max_tokens if max_tokens is not None else settings.llm_default_max_tokens
+    reserved = answer + approx_token_count(prompt_overhead) + settings.context_reserve_tokens
+    return max(0, settings.llm_context_tokens - reserved)
+
+
+def _cut_words(sentence: str, max_chars: int) -> str:
+    cut = sentence[:max_chars]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+def pack_context(
+    hits: List[Dict[str, Any]], budget: int, cite: Callable[[Dict[str, Any]], str]
+) -> PackedContext:
+    sources: List[_Source] = []
+    for i, h in enumerate(hits, start=1):
+        text = h.get("text") or h.get("snippet") or ""
+        spans = _sentence_spans(text)
+        c = cite(h)
+        sources.append(
+            _Source(f"[SOURCE {i}] {c}\n", c, text, spans, [approx_token_count(text[a:b]) for a, b in spans])
+        )
+
+    left = budget
+    packed: List[_Source] = []
+    # Pass 1: a snippet per source, in rank order, while the budget lasts.
+    for s in sources:
+        cost = approx_token_count(s.header) + 2  # + block separator
+        start = s.spans[0][0] if s.spans else 0
+        for (_, end), t in zip(s.spans, s.tokens):
+            if end - start > settings.snippet_chars:
+                break
+            s.used += 1
+            cost += t
+        if not s.used and s.spans:
+            s.partial = _cut_words(s.sentences[0], settings.snippet_chars)
+            s.partial_tokens = approx_token_count(s.partial)
+            cost += s.partial_tokens
+        if cost > left:
+            break
+        left -= cost
+        packed.append(s)
+
+    # Pass 2: grow the snippets with the remaining budget.
+    for s in packed:
+        if s.partial is not None:
+            extra = s.tokens[0] - s.partial_tokens
+            if extra > left:
+                continue
+            left -= extra
+            s.partial, s.used = None, 1
+        while not s.complete and s.tokens[s.used] <= left:
+            left -= s.tokens[s.used]
+            s.used += 1
+
+    blocks = [s.render() for s in packed]
+    text = "\n\n".join(blocks)
+    return PackedContext(
+        text=text,
+        citations=[s.citation for s in packed],
+        tokens=budget - left,
+        budget=budget,
+        trimmed=sum(1 for s in packed if not s.complete),
+        dropped=len(sources) - len(packed),
+    )
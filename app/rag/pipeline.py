@@ -1,10 +1,28 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+import re
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
+
+from app.core.admission import INTERACTIVE, acquire_llm_slot, check_llm_admission
 from app.core.config import settings
-from app.core.memvid_client import search
-from app.rag.ollama_client import ollama_chat
+from app.core.metadata_index import ChunkFilter
+from app.core.metrics import COALESCED_REQUESTS, CONTEXT_CHARS, CONTEXT_TOKENS
+from app.rag.answer_cache import answer_cache_key, get_answer_cache
+from app.rag.conversation import retrieve_turn
+from app.rag.ollama_client import ollama_chat, ollama_chat_stream
+from app.rag.packing import PackedContext, context_budget, pack_context
+from app.rag.retrieval import retrieve
+from app.rag.singleflight import Broadcast, SingleFlight
+from app.utils.text import WORD_RE, normalize_query
+
+SYSTEM_PROMPT = (
+    "You are a RAG assistant. Answer using ONLY the sources below. "
+    "If the sources do not contain the answer, say you don't know. "
+    "When you use a fact, cite it like [SOURCE 1]."
+)
 
 
 def format_citation(hit: Dict[str, Any]) -> str:
@@ -17,31 +35,399 @@ def format_citation(hit: Dict[str, Any]) -> str:
     return source_file
 
 
-def build_context(hits: List[Dict[str, Any]]) -> Tuple[str, List[str]]:
-    citations = []
-    blocks = []
-    for i, h in enumerate(hits, start=1):
-        text = h.get("text") or h.get("snippet") or ""
-        c = format_citation(h)
-        citations.append(c)
-        blocks.append(f"[SOURCE {i}] {c}\n{text}")
-    return "\n\n".join(blocks), citations
+def _source_key(hit: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """Chunks sharing this key come from the same page / section of one file."""
+    meta = hit.get("metadata") or {}
+    source_file = meta.get("source_file")
+    if not source_file:
+        return None
+    return (source_file, meta.get("page"), meta.get("section_path"))
 
 
-async def answer(query: str) -> Dict[str, Any]:
-    hits = search(query, k=settings.top_k)
-    context, citations = build_context(hits)
+_WS_RE = re.compile(r"\s+")
+
+
+def _join_windows(first: str, second: str) -> str:
+    """Concatenate consecutive windows, dropping the overlap they share.
+
+    Windows overlap by whole sentences, so the start of `second` appears in
+    `first`; everything from there on is replaced by `second`.
+    """
+    for a, b in ((first, second), (_WS_RE.sub(" ", first), _WS_RE.sub(" ", second))):
+        for probe in (b[:64], b[:24]):
+            cut = a.find(probe) if probe.strip() else -1
+            if cut >= 0:
+                return a[:cut] + b
+    return f"{first}\n\n{second}"
+
+
+def _chunk_index(hit: Dict[str, Any]) -> Optional[int]:
+    value = (hit.get("metadata") or {}).get("chunk_index")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def merge_adjacent(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collapse runs of consecutive chunks of one file/page/section into one hit.
+
+    Only chunks whose `chunk_index` values follow each other are merged;
+    distant chunks of the same section stay separate hits. A merged hit takes
+    the place and rank of its best member; texts are joined in chunk order
+    without the overlapping windows.
+    """
+    groups: Dict[Tuple[Any, ...], List[Tuple[int, int]]] = {}
+    runs: List[List[int]] = []
+    for pos, h in enumerate(hits):
+        key = _source_key(h)
+        index = _chunk_index(h)
+        if key is None or index is None:
+            runs.append([pos])
+        else:
+            groups.setdefault(key, []).append((index, pos))
+    for members in groups.values():
+        members.sort()
+        run = [members[0][1]]
+        for (prev, _), (index, pos) in zip(members, members[1:]):
+            if index - prev > 1:
+                runs.append(run)
+                run = []
+            run.append(pos)
+        runs.append(run)
+    merged = []
+    for run in sorted(runs, key=min):
+        if len(run) == 1:
+            merged.append(hits[run[0]])
+            continue
+        text = ""
+        for pos in run:
+            part = hits[pos].get("text") or hits[pos].get("snippet") or ""
+            text = _join_windows(text, part) if text else part
+        merged.append(
+            {**hits[min(run)], "text": text, "merged_frame_ids": [hits[pos].get("frame_id") for pos in run]}
+        )
+    return merged
+
+
+_HASH_DIM = 1024
+
+
+def _term_vectors(texts: List[str]) -> np.ndarray:
+    """L2-normalized hashed bag-of-words vectors, one row per text."""
+    m = np.zeros((len(texts), _HASH_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        cols = [zlib.crc32(w.encode()) % _HASH_DIM for w in WORD_RE.findall(text.lower())]
+        if cols:
+            np.add.at(m[i], cols, 1.0)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
 
-    system = (
-        "You are a RAG assistant. Answer using ONLY the sources below. "
-        "If the sources do not contain the answer, say you don't know. "
-        "When you use a fact, cite it like [SOURCE 1]."
-    )
 
-    messages = [
-        {"role": "system", "content": system},
-        {"role": "user", "content": f"Question: {query}\n\nSources:\n{context}"},
+def mmr(hits: List[Dict[str, Any]], k: int, lambda_: float) -> List[Dict[str, Any]]:
+    """Maximal marginal relevance over hits already sorted best first.
+
+    Relevance is rank-based (fused rankings have no comparable scores) and
+    redundancy is cosine similarity of term vectors.
+    """
+    n = len(hits)
+    if n <= 1 or k <= 0:
+        return hits[:k]
+    relevance = 1.0 - np.arange(n, dtype=np.float32) / n
+    sim = _term_vectors([h.get("text") or h.get("snippet") or "" for h in hits])
+    sim = sim @ sim.T
+    selected = [0]
+    max_sim = sim[0].copy()
+    available = np.ones(n, dtype=bool)
+    available[0] = False
+    while len(selected) < min(k, n):
+        scores = lambda_ * relevance - (1.0 - lambda_) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, sim[best], out=max_sim)
+    return [hits[i] for i in selected]
+
+
+async def retrieve_distinct(
+    query: str,
+    k: int,
+    knowledge_bases: Optional[List[str]] = None,
+    history: Optional[Sequence[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> List[Dict[str, Any]]:
+    """Over-fetch, merge overlapping windows of the same source, then diversify.
+
+    With `history` (the conversation's earlier user messages) candidates of
+    earlier turns are reused, see `app.rag.conversation`. `filters`
+    restricts retrieval to matching chunks.
+    """
+    fetch_k = k * max(1, settings.retrieval_overfetch)
+    if history is not None:
+        hits = await retrieve_turn(query, history, fetch_k, knowledge_bases, filters)
+    else:
+        hits = await retrieve(query, k=fetch_k, knowledge_bases=knowledge_bases, filters=filters)
+    return mmr(merge_adjacent(hits), k, settings.mmr_lambda)
+
+
+def build_context(hits: List[Dict[str, Any]], budget: int) -> PackedContext:
+    packed = pack_context(hits, budget, format_citation)
+    CONTEXT_CHARS.observe(len(packed.text))
+    CONTEXT_TOKENS.observe(packed.tokens)
+    return packed
+
+
+def _budget(query: str, max_tokens: Optional[int]) -> int:
+    return context_budget(SYSTEM_PROMPT + "\n" + _user_message(query, ""), max_tokens)
+
+
+def _user_message(query: str, context: str) -> str:
+    return f"Question: {query}\n\nSources:\n{context}"
+
+
+def build_messages(query: str, context: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _user_message(query, context)},
     ]
 
-    content = await ollama_chat(messages)
-    return {"answer": content, "hits": hits, "citations": citations}
+
+def _cache_key(
+    query: str, context: str, temperature: Optional[float], max_tokens: Optional[int]
+) -> Optional[str]:
+    """Answer-cache key, or None when the request must not be served from cache."""
+    # Only temperature-0 generations are deterministic enough to replay.
+    if get_answer_cache() is None or temperature != 0:
+        return None
+    return answer_cache_key(
+        model=settings.ollama_chat_model,
+        system=SYSTEM_PROMPT,
+        query=query,
+        context=context,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+
+
+async def _answer(
+    query: str,
+    *,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    priority: str = INTERACTIVE,
+    knowledge_bases: Optional[List[str]] = None,
+    history: Optional[Sequence[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> Dict[str, Any]:
+    hits = await retrieve_distinct(
+        query, k=settings.top_k, knowledge_bases=knowledge_bases, history=history, filters=filters
+    )
+    packed = build_context(hits, _budget(query, max_tokens))
+    context, citations = packed.text, packed.citations
+
+    key = _cache_key(query, context, temperature, max_tokens)
+    cache = get_answer_cache()
+    if key is not None and cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return {
+                "answer": cached,
+                "hits": hits,
+                "citations": citations,
+                "context": packed.info(),
+                "cache": "hit",
+            }
+
+    messages = build_messages(query, context)
+    async with await acquire_llm_slot(priority):
+        content = await ollama_chat(messages, temperature=temperature, max_tokens=max_tokens)
+    if key is not None and cache is not None:
+        cache.set(key, content)
+    return {
+        "answer": content,
+        "hits": hits,
+        "citations": citations,
+        "context": packed.info(),
+        "cache": "miss" if key is not None else "bypass",
+    }
+
+
+async def _replay(content: str) -> AsyncIterator[str]:
+    yield content
+
+
+async def _generate(
+    messages: List[Dict[str, str]], temperature: Optional[float], max_tokens: Optional[int], priority: str
+) -> AsyncIterator[str]:
+    # The slot is taken once streaming starts: a client that disconnects
+    # before then never holds one.
+    async with await acquire_llm_slot(priority):
+        async for token in ollama_chat_stream(messages, temperature=temperature, max_tokens=max_tokens):
+            yield token
+
+
+async def _store_when_complete(stream: AsyncIterator[str], key: str) -> AsyncIterator[str]:
+    """Pass tokens through and cache the full answer once the stream finishes."""
+    parts: List[str] = []
+    async for token in stream:
+        parts.append(token)
+        yield token
+    cache = get_answer_cache()
+    if cache is not None:
+        cache.set(key, "".join(parts))
+
+
+async def _answer_stream(
+    query: str,
+    *,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    priority: str = INTERACTIVE,
+    knowledge_bases: Optional[List[str]] = None,
+    history: Optional[Sequence[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> Dict[str, Any]:
+    hits = await retrieve_distinct(
+        query, k=settings.top_k, knowledge_bases=knowledge_bases, history=history, filters=filters
+    )
+    packed = build_context(hits, _budget(query, max_tokens))
+    context, citations = packed.text, packed.citations
+
+    key = _cache_key(query, context, temperature, max_tokens)
+    cache = get_answer_cache()
+    if key is not None and cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return {
+                "stream": _replay(cached),
+                "hits": hits,
+                "citations": citations,
+                "context": packed.info(),
+                "cache": "hit",
+            }
+
+    messages = build_messages(query, context)
+    # A full queue is still a plain HTTP error; queue timeouts end the stream.
+    check_llm_admission()
+    stream = _generate(messages, temperature, max_tokens, priority)
+    if key is not None:
+        stream = _store_when_complete(stream, key)
+    return {
+        "stream": stream,
+        "hits": hits,
+        "citations": citations,
+        "context": packed.info(),
+        "cache": "miss" if key is not None else "bypass",
+    }
+
+
+# Identical requests in flight at the same time share one retrieval and one
+# generation. Streams stay joinable until their last token, or until
+# `_STREAM_START_TIMEOUT` seconds pass without any client reading them.
+_ANSWERS: SingleFlight[Dict[str, Any]] = SingleFlight()
+_STREAMS: SingleFlight[Dict[str, Any]] = SingleFlight()
+_STREAM_START_TIMEOUT = 10.0
+
+
+def _flight_key(
+    query: str,
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    knowledge_bases: Optional[List[str]],
+    history: Optional[Sequence[str]],
+    filters: Optional[ChunkFilter] = None,
+    priority: str = INTERACTIVE,
+) -> Tuple[Any, ...]:
+    kbs = tuple(sorted(knowledge_bases)) if knowledge_bases else None
+    # Earlier turns change the retrieved sources, so they are part of the key.
+    turns = tuple(normalize_query(m) for m in history) if history is not None else None
+    # A chat must not wait in the queue behind a batch request it joined.
+    return (normalize_query(query), temperature, max_tokens, kbs, turns, filters, priority)
+
+
+async def answer(
+    query: str,
+    *,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    priority: str = INTERACTIVE,
+    knowledge_bases: Optional[List[str]] = None,
+    history: Optional[Sequence[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> Dict[str, Any]:
+    if not settings.coalesce_requests:
+        return await _answer(
+            query,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            priority=priority,
+            knowledge_bases=knowledge_bases,
+            history=history,
+            filters=filters,
+        )
+    rag, shared = await _ANSWERS.run(
+        _flight_key(query, temperature, max_tokens, knowledge_bases, history, filters, priority),
+        lambda: _answer(
+            query,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            priority=priority,
+            knowledge_bases=knowledge_bases,
+            history=history,
+            filters=filters,
+        ),
+    )
+    if shared:
+        COALESCED_REQUESTS.inc(stream="false")
+    return {**rag, "coalesced": shared}
+
+
+async def answer_stream(
+    query: str,
+    *,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    priority: str = INTERACTIVE,
+    knowledge_bases: Optional[List[str]] = None,
+    history: Optional[Sequence[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> Dict[str, Any]:
+    """Run retrieval, then return an async iterator over the answer tokens.
+
+    Retrieval happens before the caller starts streaming so that errors can
+    still surface as a normal HTTP error.
+    """
+    if not settings.coalesce_requests:
+        return await _answer_stream(
+            query,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            priority=priority,
+            knowledge_bases=knowledge_bases,
+            history=history,
+            filters=filters,
+        )
+    key = _flight_key(query, temperature, max_tokens, knowledge_bases, history, filters, priority)
+
+    async def start() -> Dict[str, Any]:
+        rag = await _answer_stream(
+            query,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            priority=priority,
+            knowledge_bases=knowledge_bases,
+            history=history,
+            filters=filters,
+        )
+        rag["broadcast"] = Broadcast(
+            rag.pop("stream"), on_done=lambda: _STREAMS.forget(key), start_timeout=_STREAM_START_TIMEOUT
+        )
+        return rag
+
+    rag, shared = await _STREAMS.run(key, start, keep=True)
+    if shared:
+        COALESCED_REQUESTS.inc(stream="true")
+    out = {k: v for k, v in rag.items() if k != "broadcast"}
+    return {**out, "stream": rag["broadcast"].subscribe(), "coalesced": shared}
@@ -0,0 +1,134 @@
+"""Hybrid retrieval: Memvid lexical hits fused with the dense sidecar index.
+
+Both retrievers return their top `hybrid_candidates`; the lists are merged
+with reciprocal-rank fusion (score = sum of 1 / (rrf_k + rank)), which needs
+no score calibration between BM25-style and cosine scores. Without a dense
+index this is just `search_async()`. Several knowledge bases are searched
+concurrently and fused the same way. A `ChunkFilter` is resolved per store
+by its metadata index before either retriever runs (see
+`app.core.metadata_index`).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.executors import run_retrieval
+from app.core.knowledge_bases import kb_names
+from app.core.memvid_client import search_async
+from app.core.metadata_index import ChunkFilter, FilterPlan, filter_plan, hit_uri
+from app.core.vector_index import dense_search, has_vector_index
+from app.rag.embeddings import embed_query
+
+logger = logging.getLogger("app.rag")
+
+
+def _hit_key(hit: Dict[str, Any]) -> str:
+    # The chunk URI: lexical hits on a part of a split chunk carry its frame
+    # id, dense hits the chunk's own. URIs are only unique within one store;
+    # dense rows written before chunk URIs existed fall back to their text.
+    local = hit_uri(hit) or hit.get("text") or ""
+    return f"{hit.get('kb') or ''}/{local}"
+
+
+def fuse_rrf(rankings: Sequence[List[Dict[str, Any]]], k: int, rrf_k: int = 60) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion of several ranked hit lists; returns the top `k`.
+
+    When the same chunk appears in several lists the fields are merged, later
+    lists filling in what earlier ones lack (e.g. metadata for Memvid hits).
+    """
+    scores: Dict[str, float] = {}
+    merged: Dict[str, Dict[str, Any]] = {}
+    for hits in rankings:
+        for rank, hit in enumerate(hits, start=1):
+            key = _hit_key(hit)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            if key in merged:
+                for field, value in hit.items():
+                    if not merged[key].get(field):
+                        merged[key][field] = value
+            else:
+                merged[key] = dict(hit)
+    ordered = sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+    return [{**merged[key], "rrf_score": scores[key]} for key in ordered]
+
+
+async def _query_vector(query: str) -> Optional[Sequence[float]]:
+    try:
+        return await embed_query(query)
+    except Exception:
+        logger.warning("Query embedding failed, using lexical retrieval only", exc_info=True)
+        return None
+
+
+async def _lexical(query: str, k: int, kb: str, plan: Optional[FilterPlan]) -> List[Dict[str, Any]]:
+    if plan is None:
+        return await search_async(query, k=k, kb=kb)
+    hits = await search_async(query, k=plan.fetch_k(k), kb=kb, scope=plan.scope)
+    return [h for h in hits if hit_uri(h) in plan.uris][:k]
+
+
+async def search_filtered(
+    query: str, k: int, kb: Optional[str] = None, filters: Optional[ChunkFilter] = None
+) -> List[Dict[str, Any]]:
+    """Memvid hits only (no dense index), restricted to chunks matching `filters`."""
+    plan = await run_retrieval(filter_plan, filters, kb) if filters is not None else None
+    if plan is not None and not plan.uris:
+        return []
+    return await _lexical(query, k, kb, plan)
+
+
+async def _retrieve_kb(
+    query: str,
+    k: int,
+    kb: str,
+    vector: Optional["asyncio.Future[Optional[Sequence[float]]]"],
+    filters: Optional[ChunkFilter] = None,
+) -> List[Dict[str, Any]]:
+    """Top-`k` chunks of one store, hybrid when its dense index is enabled."""
+    plan = await run_retrieval(filter_plan, filters, kb) if filters is not None else None
+    if plan is not None and not plan.uris:
+        return []
+    if not has_vector_index(kb):
+        return await _lexical(query, k, kb, plan)
+    candidates = max(k, settings.hybrid_candidates)
+    lexical = await _lexical(query, candidates, kb, plan)
+    qvec = await vector if vector is not None else None
+    if qvec is None:
+        return lexical[:k]
+    allowed = plan.uris if plan is not None else None
+    dense = await run_retrieval(dense_search, qvec, candidates, kb, allowed)
+    if not dense:
+        return lexical[:k]
+    # Dense hits carry the full chunk text and metadata, so list them first
+    # for field merging; the fused order does not depend on list order.
+    return fuse_rrf([dense, lexical], k, settings.rrf_k)
+
+
+async def retrieve(
+    query: str,
+    k: int,
+    knowledge_bases: Optional[List[str]] = None,
+    filters: Optional[ChunkFilter] = None,
+) -> List[Dict[str, Any]]:
+    """Top-`k` chunks for `query` across knowledge bases (all by default).
+
+    Stores are searched in parallel and their rankings merged with the same
+    reciprocal-rank fusion, since scores from different stores (and
+    different corpus statistics) are not comparable. `filters` restricts
+    every store to the chunks matching it.
+    """
+    names = knowledge_bases or kb_names()
+    # One query embedding, shared by every store's dense search.
+    hybrid = any(has_vector_index(n) for n in names)
+    vector = asyncio.ensure_future(_query_vector(query)) if hybrid else None
+    try:
+        rankings = await asyncio.gather(*(_retrieve_kb(query, k, n, vector, filters) for n in names))
+    finally:
+        if vector is not None:
+            vector.cancel()
+    if len(rankings) == 1:
+        return rankings[0]
+    return fuse_rrf(rankings, k, settings.rrf_k)
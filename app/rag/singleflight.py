@@ -0,0 +1,134 @@
+"""Coalescing of identical concurrent requests.
+
+`SingleFlight.run(key, fn)` runs `fn()` once per key at a time: callers that
+arrive while it is in flight await the same task. The task is shielded, so
+a caller that disconnects does not cancel it for the others.
+
+`Broadcast` lets several consumers read one token stream. Each subscriber
+gets every token from the start (late joiners first replay the buffer). The
+source is started by the first subscriber and cancelled once the last one
+has gone away, so nothing is generated for clients that already left. A
+broadcast nobody subscribes to within `start_timeout` (the client went away
+before reading its response) is closed unstarted.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger("app.rag")
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, "asyncio.Task[T]"] = {}
+
+    async def run(
+        self, key: Hashable, fn: Callable[[], Awaitable[T]], *, keep: bool = False
+    ) -> Tuple[T, bool]:
+        """Result of `fn()`, and whether it was shared with an earlier caller.
+
+        With `keep`, a successful result stays shared until `forget(key)`
+        (e.g. while a stream it started is still running).
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._done(key, t, keep))
+        return await asyncio.shield(task), shared
+
+    def forget(self, key: Hashable) -> None:
+        """Stop handing out the in-flight result for `key` to new callers."""
+        self._inflight.pop(key, None)
+
+    def _done(self, key: Hashable, task: "asyncio.Task[T]", keep: bool) -> None:
+        failed = task.cancelled() or task.exception() is not None
+        if failed and not task.cancelled():
+            # Retrieve it so asyncio does not warn when nobody awaited the task.
+            logger.debug("Coalesced request failed: %r", task.exception())
+        if (failed or not keep) and self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+class Broadcast:
+    """Fan one async token stream out to any number of subscribers."""
+
+    def __init__(
+        self,
+        source: AsyncIterator[str],
+        on_done: Optional[Callable[[], None]] = None,
+        *,
+        start_timeout: Optional[float] = None,
+    ) -> None:
+        self._tokens: List[str] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self._subscribers = 0
+        self._on_done = on_done
+        self._source = source
+        self._pump: Optional["asyncio.Future[None]"] = None
+        self._expiry: Optional[asyncio.TimerHandle] = None
+        if start_timeout is not None:
+            self._expiry = asyncio.get_running_loop().call_later(start_timeout, self._expire)
+
+    def _expire(self) -> None:
+        """Nobody subscribed in time: close the source without starting it."""
+        if self._pump is None:
+            self._pump = asyncio.ensure_future(self._run(self._closed()))
+
+    async def _closed(self) -> AsyncIterator[str]:
+        await self._source.aclose()
+        raise ConnectionAbortedError("stream abandoned before anyone read it")
+        yield  # pragma: no cover - makes this an async generator
+
+    async def _run(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for token in source:
+                async with self._changed:
+                    self._tokens.append(token)
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self._error = ConnectionAbortedError("stream cancelled")
+        except Exception as e:
+            self._error = e
+        finally:
+            async with self._changed:
+                self._done = True
+                self._changed.notify_all()
+            if self._on_done is not None:
+                self._on_done()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        self._subscribers += 1
+        if self._pump is None:
+            if self._expiry is not None:
+                self._expiry.cancel()
+            self._pump = asyncio.ensure_future(self._run(self._source))
+        i = 0
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: i < len(self._tokens) or self._done)
+                    pending = self._tokens[i:]
+                    finished = self._done
+                for token in pending:
+                    yield token
+                i += len(pending)
+                if finished and i >= len(self._tokens):
+                    if self._error is not None:
+                        raise self._error
+                    return
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._done:
+                # Nobody is listening any more: stop generating.
+                self._pump.cancel()
@@ -0,0 +1,133 @@
+"""Startup warm-up, so the first chat after a deploy is not the slow one.
+
+The lifespan starts `run_warmup()` in the background: it opens every
+knowledge base's store (and dense index), runs a probe search, and asks
+each Ollama backend to load the chat and embedding models. `/api/ready`
+answers 503 until it has finished, so a load balancer only routes to warm
+instances while `/api/health` keeps reporting liveness.
+
+Failed steps are logged and reported but do not keep the instance
+unready: an unreachable Ollama host is handled by the backend pool's
+health checks, and a store that was never ingested has nothing to warm.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.executors import run_retrieval
+from app.core.knowledge_bases import kb_names
+from app.core.memvid_client import search, store_exists
+from app.core.vector_index import get_vector_index
+from app.rag.ollama_client import get_backend_pool, keep_alive
+
+logger = logging.getLogger("app.rag.warmup")
+
+
+@dataclass
+class WarmupState:
+    status: str = "pending"  # pending | warming | ready
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    steps: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def to_dict(self) -> Dict[str, Any]:
+        took = None
+        if self.started_at is not None and self.finished_at is not None:
+            took = round(self.finished_at - self.started_at, 3)
+        return {"status": self.status, "seconds": took, "steps": self.steps}
+
+
+_STATE = WarmupState()
+
+
+def warmup_state() -> WarmupState:
+    return _STATE
+
+
+async def _step(name: str, fn: Callable[[], Awaitable[Any]]) -> None:
+    t0 = time.perf_counter()
+    try:
+        detail = await fn()
+    except Exception as e:
+        logger.warning("Warm-up step %s failed: %s", name, e)
+        _STATE.steps[name] = {"ok": False, "seconds": round(time.perf_counter() - t0, 3), "error": str(e)}
+    else:
+        logger.info("Warm-up step %s done in %.2fs", name, time.perf_counter() - t0)
+        _STATE.steps[name] = {"ok": True, "seconds": round(time.perf_counter() - t0, 3), "detail": detail}
+
+
+def _warm_store(kb: str) -> str:
+    if not store_exists(kb):
+        return "no store yet"
+    # Opens the shared read handle and pages in the lexical index.
+    hits = search(settings.warmup_query, 1, kb)
+    if get_vector_index(kb) is not None:
+        return f"{len(hits)} probe hit(s), dense index open"
+    return f"{len(hits)} probe hit(s)"
+
+
+async def _preload(path: str, model: str, body: Dict[str, Any]) -> List[str]:
+    """Load a model on every healthy backend that has it."""
+    pool = get_backend_pool()
+    targets = [b for b in pool.backends if b.healthy and b.serves(model)]
+    if not targets:
+        raise RuntimeError(f"no healthy Ollama backend serves {model}")
+
+    async def load(client: Any) -> None:
+        r = await client.post(path, json=keep_alive({"model": model, **body}))
+        r.raise_for_status()
+
+    await asyncio.gather(*(load(b.client) for b in targets))
+    return [b.url for b in targets]
+
+
+async def run_warmup() -> None:
+    _STATE.status = "warming"
+    _STATE.started_at = time.time()
+    steps = [
+        (f"store:{kb}", lambda kb=kb: run_retrieval(_warm_store, kb)) for kb in kb_names()
+    ]
+    # An empty prompt makes Ollama load the model without generating.
+    steps.append(
+        (
+            "ollama:chat",
+            lambda: _preload("/api/generate", settings.ollama_chat_model, {"prompt": ""}),
+        )
+    )
+    # The embedding model is only used with the dense index or ingest-time embeddings.
+    if settings.vector_index_enabled or settings.embed_on_ingest:
+        steps.append(
+            (
+                "ollama:embed",
+                lambda: _preload("/api/embed", settings.ollama_embed_model, {"input": settings.warmup_query}),
+            )
+        )
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(_step(name, fn) for name, fn in steps)),
+            timeout=settings.warmup_timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Warm-up timed out after %.0fs", settings.warmup_timeout_seconds)
+        for name, _ in steps:
+            _STATE.steps.setdefault(name, {"ok": False, "error": "timed out"})
+    _STATE.finished_at = time.time()
+    _STATE.status = "ready"
+    logger.info("Warm-up finished in %.2fs", _STATE.finished_at - _STATE.started_at)
+
+
+def start_warmup() -> Optional["asyncio.Task[None]"]:
+    """Schedule the warm-up; without it the instance is ready immediately."""
+    if not settings.warmup_enabled:
+        _STATE.status = "ready"
+        return None
+    return asyncio.ensure_future(run_warmup())
@@ -1,67 +1,109 @@
 import re
-from typing import List
+from typing import Iterator, List, Tuple
 import logging
 
 logger = logging.getLogger("app.utils.text")
 
+WORD_RE = re.compile(r"\w+")
+# Sentence-ish boundaries: end punctuation followed by a newline or 2+ spaces,
+# or a blank line.
+PART_SPLIT_RE = re.compile(r"(?<=[\.!?])\s+\n|(?<=[\.!?])\s{2,}|\n{2,}")
+
+
+def tokens_from_words(words: int) -> int:
+    return int(words * 1.33) or 1
+
+
 def approx_token_count(text: str) -> int:
     """A cheap token proxy: word count * 1.33.
 
     This keeps the skeleton dependency-light. You can swap to tiktoken later.
     """
-    words = re.findall(r"\w+", text)
-    return int(len(words) * 1.33) or 1
+    return tokens_from_words(len(WORD_RE.findall(text)))
 
 
-def split_by_token_target(text: str, *, target: int, max_tokens: int, overlap: int) -> List[str]:
-    """Split a long text into token-ish windows with overlap.
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as a cache key."""
+    return " ".join(query.lower().split())
 
-    Uses sentence boundaries when possible.
+
+# Words Memvid's query parser reads as boolean operators.
+QUERY_OPERATORS = {"and", "or", "not"}
+
+
+def lexical_query(query: str) -> str:
+    """Plain-word form of a question for Memvid `find()`.
+
+    Memvid parses queries (quotes, parentheses, `*`, AND/OR/NOT), so free
+    text such as "fire (or cold)?" is a syntax error there.
     """
-    # split into sentences-ish
-    parts = re.split(r"(?<=[\.!?])\s+\n|(?<=[\.!?])\s{2,}|\n{2,}", text)
-    parts = [p.strip() for p in parts if p.strip()]
+    return " ".join(w for w in WORD_RE.findall(query) if w.lower() not in QUERY_OPERATORS)
+
 
-    out: List[str] = []
+def iter_token_windows(
+    text: str, *, target: int, max_tokens: int, overlap: int
+) -> Iterator[Tuple[str, int]]:
+    """Split a long text into token-ish windows with overlap.
+
+    Uses sentence boundaries when possible. Yields `(chunk, approx_tokens)`;
+    every part is tokenized exactly once and its count is carried through
+    buffering and overlap, so the chunk count needs no second pass.
+    """
+    # parallel lists for the current window: text, token estimate, word count
     buf: List[str] = []
+    buf_t: List[int] = []
+    buf_w: List[int] = []
     buf_tokens = 0
+    buf_words = 0
 
-    logger.info("Parts count: %d", len(parts))
-    
-
-    def flush_with_overlap():
-        nonlocal buf, buf_tokens
-        if not buf:
-            return
-        chunk = "\n\n".join(buf).strip()
-        out.append(chunk)
-        # build overlap tail
-        if overlap <= 0:
-            buf = []
-            buf_tokens = 0
-            return
-        tail: List[str] = []
-        tail_tokens = 0
-        for p in reversed(buf):
-            t = approx_token_count(p)
-            if tail_tokens + t > overlap and tail:
-                break
-            tail.insert(0, p)
-            tail_tokens += t
-        buf = tail
-        buf_tokens = tail_tokens
-
-    for p in parts:
-        logger.info("Processing part with approx %d tokens", approx_token_count(p))
-        t = approx_token_count(p)
+    for raw in PART_SPLIT_RE.split(text):
+        p = raw.strip()
+        if not p:
+            continue
+        w = len(WORD_RE.findall(p))
+        t = tokens_from_words(w)
         if buf_tokens + t > max_tokens and buf:
-            flush_with_overlap()
+            yield "\n\n".join(buf), tokens_from_words(buf_words)
+            buf, buf_t, buf_w, buf_tokens, buf_words = _overlap_tail(buf, buf_t, buf_w, overlap)
         buf.append(p)
+        buf_t.append(t)
+        buf_w.append(w)
         buf_tokens += t
+        buf_words += w
         if buf_tokens >= target:
-            flush_with_overlap()
+            yield "\n\n".join(buf), tokens_from_words(buf_words)
+            buf, buf_t, buf_w, buf_tokens, buf_words = _overlap_tail(buf, buf_t, buf_w, overlap)
 
     if buf:
-        chunk = "\n\n".join(buf).strip()
-        out.append(chunk)
-    return out
+        yield "\n\n".join(buf), tokens_from_words(buf_words)
+
+
+def _overlap_tail(
+    buf: List[str], buf_t: List[int], buf_w: List[int], overlap: int
+) -> Tuple[List[str], List[int], List[int], int, int]:
+    """Trailing parts of the flushed window that seed the next one."""
+    if overlap <= 0:
+        return [], [], [], 0, 0
+    start = len(buf)
+    tail_tokens = 0
+    while start > 0:
+        t = buf_t[start - 1]
+        if tail_tokens + t > overlap and start < len(buf):
+            break
+        start -= 1
+        tail_tokens += t
+    return buf[start:], buf_t[start:], buf_w[start:], tail_tokens, sum(buf_w[start:])
+
+
+def split_by_token_target(text: str, *, target: int, max_tokens: int, overlap: int) -> List[str]:
+    """Split a long text into token-ish windows with overlap.
+
+    Uses sentence boundaries when possible. See `iter_token_windows` to also
+    get each chunk's token estimate.
+    """
+    return [
+        chunk
+        for chunk, _ in iter_token_windows(
+            text, target=target, max_tokens=max_tokens, overlap=overlap
+        )
+    ]
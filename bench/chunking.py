@@ -0,0 +1,249 @@
+"""Micro-benchmark: chunking engine vs. the previous implementation.
+
+Generates large synthetic markdown and PDF-like page text, runs both the
+legacy chunker (copied verbatim below, minus logging handlers) and the
+current one, asserts byte-identical output and reports timings.
+
+    python -m bench.chunking [--sections 4000] [--pages 600] [--repeat 3] [--out result.json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Callable, List, Tuple
+
+from app.core.config import settings
+from app.ingest.md_ingest import header_chunks
+from app.utils.text import iter_token_windows
+
+WORDS = (
+    "the grapple check uses athletics against acrobatics or athletics of the target "
+    "a creature that is grappled has speed zero spell slot level damage fire cold "
+    "saving throw dexterity constitution wisdom advantage disadvantage bonus action "
+    "reaction opportunity attack dungeon master player character monster stat block"
+).split()
+
+
+# ---- legacy implementation (as of the previous release) ----
+
+def _legacy_approx_token_count(text: str) -> int:
+    words = re.findall(r"\w+", text)
+    return int(len(words) * 1.33) or 1
+
+
+def _legacy_split_by_token_target(text: str, *, target: int, max_tokens: int, overlap: int) -> List[str]:
+    parts = re.split(r"(?<=[\.!?])\s+\n|(?<=[\.!?])\s{2,}|\n{2,}", text)
+    parts = [p.strip() for p in parts if p.strip()]
+
+    out: List[str] = []
+    buf: List[str] = []
+    buf_tokens = 0
+
+    def flush_with_overlap():
+        nonlocal buf, buf_tokens
+        if not buf:
+            return
+        chunk = "\n\n".join(buf).strip()
+        out.append(chunk)
+        if overlap <= 0:
+            buf = []
+            buf_tokens = 0
+            return
+        tail: List[str] = []
+        tail_tokens = 0
+        for p in reversed(buf):
+            t = _legacy_approx_token_count(p)
+            if tail_tokens + t > overlap and tail:
+                break
+            tail.insert(0, p)
+            tail_tokens += t
+        buf = tail
+        buf_tokens = tail_tokens
+
+    for p in parts:
+        _legacy_approx_token_count(p)  # was evaluated for a per-part log line
+        t = _legacy_approx_token_count(p)
+        if buf_tokens + t > max_tokens and buf:
+            flush_with_overlap()
+        buf.append(p)
+        buf_tokens += t
+        if buf_tokens >= target:
+            flush_with_overlap()
+
+    if buf:
+        chunk = "\n\n".join(buf).strip()
+        out.append(chunk)
+    return out
+
+
+def _legacy_header_chunks(body: str) -> List[Tuple[str, str]]:
+    lines = body.splitlines()
+    chunks: List[Tuple[str, List[str]]] = []
+    path: List[str] = []
+    buf: List[str] = []
+
+    def flush():
+        nonlocal buf
+        text = "\n".join(buf).strip()
+        if text:
+            chunks.append((" > ".join(path) if path else "", text.splitlines()))
+        buf = []
+
+    for line in lines:
+        h = re.match(r"^(#{1,6})\s+(.*)$", line.strip())
+        if h:
+            flush()
+            level = len(h.group(1))
+            title = h.group(2).strip()
+            if level <= len(path):
+                path = path[: level - 1]
+            while len(path) < level - 1:
+                path.append("(untitled)")
+            if len(path) == level - 1:
+                path.append(title)
+            else:
+                path[level - 1] = title
+            continue
+        buf.append(line)
+    flush()
+    return [(p, "\n".join(ls).strip()) for p, ls in chunks]
+
+
+def _legacy_md(body: str) -> List[Tuple[str, str, int]]:
+    out = []
+    for section, text in _legacy_header_chunks(body):
+        for chunk in _legacy_split_by_token_target(
+            text,
+            target=settings.md_chunk_target_tokens,
+            max_tokens=settings.md_chunk_max_tokens,
+            overlap=settings.md_chunk_overlap_tokens,
+        ):
+            # the ingest min-size check and log line each recounted tokens
+            _legacy_approx_token_count(chunk)
+            out.append((section, chunk, _legacy_approx_token_count(chunk)))
+    return out
+
+
+def _legacy_pdf(pages: List[str]) -> List[Tuple[str, int]]:
+    out = []
+    for page in pages:
+        for chunk in _legacy_split_by_token_target(
+            page,
+            target=settings.pdf_chunk_target_tokens,
+            max_tokens=settings.pdf_chunk_max_tokens,
+            overlap=settings.pdf_chunk_overlap_tokens,
+        ):
+            out.append((chunk, _legacy_approx_token_count(chunk)))
+    return out
+
+
+# ---- current implementation ----
+
+def _current_md(body: str) -> List[Tuple[str, str, int]]:
+    out = []
+    for section, text in header_chunks(body):
+        for chunk, tokens in iter_token_windows(
+            text,
+            target=settings.md_chunk_target_tokens,
+            max_tokens=settings.md_chunk_max_tokens,
+            overlap=settings.md_chunk_overlap_tokens,
+        ):
+            out.append((section, chunk, tokens))
+    return out
+
+
+def _current_pdf(pages: List[str]) -> List[Tuple[str, int]]:
+    out = []
+    for page in pages:
+        for chunk, tokens in iter_token_windows(
+            page,
+            target=settings.pdf_chunk_target_tokens,
+            max_tokens=settings.pdf_chunk_max_tokens,
+            overlap=settings.pdf_chunk_overlap_tokens,
+        ):
+            out.append((chunk, tokens))
+    return out
+
+
+# ---- synthetic inputs ----
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 24))
+    return " ".join(words).capitalize() + rng.choice([".", ".", "!", "?"])
+
+
+def synthetic_markdown(sections: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    out = []
+    for i in range(sections):
+        out.append("#" * rng.randint(1, 4) + f" Section {i}")
+        for _ in range(rng.randint(1, 6)):
+            sentences = [_sentence(rng) for _ in range(rng.randint(2, 12))]
+            out.append(rng.choice(["  ", " \n", " "]).join(sentences))
+            out.append("")
+    return "\n".join(out)
+
+
+def synthetic_pdf_pages(pages: int, seed: int = 11) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(pages):
+        lines = [_sentence(rng) for _ in range(rng.randint(30, 90))]
+        # pypdf output: single newlines inside paragraphs, blank lines between some
+        out.append(f"[Doc: synthetic | source: pdf | page: {i + 1}]\n\n" + "\n".join(
+            line + ("\n" if rng.random() < 0.15 else "") for line in lines
+        ))
+    return out
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def run(sections: int, pages: int, repeat: int) -> dict:
+    body = synthetic_markdown(sections)
+    pdf = synthetic_pdf_pages(pages)
+    results = {}
+    for name, legacy, current, data in (
+        ("markdown", _legacy_md, _current_md, body),
+        ("pdf", _legacy_pdf, _current_pdf, pdf),
+    ):
+        t_old, out_old = _best_of(lambda: legacy(data), repeat)
+        t_new, out_new = _best_of(lambda: current(data), repeat)
+        assert out_old == out_new, f"{name}: chunker output differs from the legacy implementation"
+        size = len(data) if isinstance(data, str) else sum(len(p) for p in data)
+        results[name] = {
+            "input_bytes": size,
+            "chunks": len(out_new),
+            "legacy_seconds": round(t_old, 4),
+            "current_seconds": round(t_new, 4),
+            "speedup": round(t_old / t_new, 2),
+            "identical": True,
+        }
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sections", type=int, default=4000, help="markdown sections to generate")
+    ap.add_argument("--pages", type=int, default=600, help="PDF pages to generate")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per implementation (best is kept)")
+    ap.add_argument("--out", help="also write the results as JSON to this file")
+    args = ap.parse_args()
+    results = run(args.sections, args.pages, args.repeat)
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
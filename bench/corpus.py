@@ -0,0 +1,135 @@
+"""Synthetic, seeded knowledge-base corpora for benchmarks.
+
+Markdown vaults (front matter, nested headings) and multi-hundred-page
+PDFs. The PDFs are written directly (Helvetica text objects, no extra
+dependency) and are readable by pypdf like real manuals.
+
+    python -m bench.corpus OUT_DIR [--md-files 200] [--pdfs 2] [--pages 300]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import textwrap
+from typing import Dict, List
+
+from bench.chunking import _sentence
+
+TYPES = ("rule", "monster", "spell", "item", "location")
+
+
+def markdown_note(rng: random.Random, index: int) -> str:
+    """One vault note: front matter, then 2-8 sections of 1-4 paragraphs."""
+    title = f"Note {index}"
+    out = [
+        "---",
+        f"title: {title}",
+        f"type: {rng.choice(TYPES)}",
+        f"tags: [{', '.join(rng.sample(['combat', 'magic', 'lore', 'travel', 'npc'], 2))}]",
+        "---",
+        f"# {title}",
+        "",
+    ]
+    for s in range(rng.randint(2, 8)):
+        out.append("#" * rng.randint(2, 3) + f" Section {s}")
+        for _ in range(rng.randint(1, 4)):
+            out.append(" ".join(_sentence(rng) for _ in range(rng.randint(3, 10))))
+            out.append("")
+    return "\n".join(out)
+
+
+def write_markdown_vault(root: str, files: int, seed: int = 3) -> Dict[str, int]:
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    size = 0
+    for i in range(files):
+        # A few subfolders, like a real vault.
+        folder = os.path.join(root, f"folder{i % 5}")
+        os.makedirs(folder, exist_ok=True)
+        text = markdown_note(rng, i)
+        with open(os.path.join(folder, f"note{i:05d}.md"), "w", encoding="utf-8") as f:
+            f.write(text)
+        size += len(text)
+    return {"files": files, "bytes": size}
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(rng: random.Random, page: int) -> List[str]:
+    paragraphs = [" ".join(_sentence(rng) for _ in range(rng.randint(2, 6))) for _ in range(rng.randint(4, 8))]
+    lines = [f"Chapter {page // 20 + 1}"]
+    for p in paragraphs:
+        lines.extend(textwrap.wrap(p, 95))
+        lines.append("")
+    return lines[:62]
+
+
+def write_pdf(path: str, pages: int, seed: int = 5) -> int:
+    """Write a text PDF of `pages` US-letter pages; returns its size in bytes."""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for n in range(pages):
+        text = " T* ".join(f"({_pdf_escape(line)}) Tj" for line in _page_lines(rng, n))
+        stream = f"BT /F1 10 Tf 12 TL 50 760 Td {text} ET".encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+                b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (tree, font, content)
+            )
+        )
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % tree
+    objects[tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+    return len(out)
+
+
+def write_pdf_library(root: str, count: int, pages: int, seed: int = 5) -> Dict[str, int]:
+    os.makedirs(root, exist_ok=True)
+    size = sum(write_pdf(os.path.join(root, f"manual{i:02d}.pdf"), pages, seed + i) for i in range(count))
+    return {"files": count, "pages": count * pages, "bytes": size}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("out", help="directory to create md/ and pdf/ in")
+    ap.add_argument("--md-files", type=int, default=200)
+    ap.add_argument("--pdfs", type=int, default=2)
+    ap.add_argument("--pages", type=int, default=300, help="pages per PDF")
+    args = ap.parse_args()
+    stats = {
+        "md": write_markdown_vault(os.path.join(args.out, "md"), args.md_files),
+        "pdf": write_pdf_library(os.path.join(args.out, "pdf"), args.pdfs, args.pages),
+    }
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
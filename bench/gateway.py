@@ -0,0 +1,322 @@
+"""End-to-end gateway benchmarks against a stub Ollama and a synthetic corpus.
+
+Scenarios:
+  ingest     md and pdf ingest throughput into a fresh store
+  retrieval  `retrieve_distinct()` latency (p50/p90/p99) per concurrency level
+  chat       /v1/chat/completions latency under N concurrent clients, blocking
+             and streaming (time to first token and total), served by a
+             separate uvicorn process
+
+Everything runs in a work directory (kept, so a corpus can be reused with
+`--reuse-corpus`). Results are JSON with the git commit, so runs on
+different commits can be compared.
+
+    python -m bench.gateway [--scenarios ingest,retrieval,chat] [--concurrency 1,8,32] [--out result.json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+import numpy as np
+
+# Nothing from `app` (or bench modules importing it) at module level: the
+# gateway reads its settings from the environment at import time, and
+# main() sets that environment up first.
+
+KB = "bench"
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"n": 0}
+    a = np.asarray(samples) * 1000.0
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(a.mean()), 2),
+        "p50_ms": round(float(np.percentile(a, 50)), 2),
+        "p90_ms": round(float(np.percentile(a, 90)), 2),
+        "p99_ms": round(float(np.percentile(a, 99)), 2),
+        "max_ms": round(float(a.max()), 2),
+    }
+
+
+def queries(n: int, seed: int = 13) -> List[str]:
+    from bench.chunking import WORDS
+
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(WORDS, rng.randint(2, 5))) for _ in range(n)]
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def wait_http(url: str, timeout: float, ok: Callable[[httpx.Response], bool] = lambda r: r.status_code == 200) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if ok(httpx.get(url, timeout=1.0)):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_process(args: List[str], env: Dict[str, str], log: str) -> subprocess.Popen:
+    out = open(log, "w", encoding="utf-8")
+    return subprocess.Popen(args, env=env, stdout=out, stderr=subprocess.STDOUT)
+
+
+def stop_process(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ---- scenarios ----
+
+def run_ingest(workdir: str) -> Dict[str, Any]:
+    from app.core.knowledge_bases import get_kb
+    from app.ingest.jobs import ingest_sources
+
+    shutil.rmtree(os.path.join(workdir, "stores"), ignore_errors=True)
+    out: Dict[str, Any] = {}
+    for source in ("md", "pdf"):
+        t0 = time.perf_counter()
+        stats = ingest_sources([source], knowledge_bases=[KB])[source]
+        seconds = time.perf_counter() - t0
+        out[source] = {
+            "files": stats["files"],
+            "chunks": stats["chunks"],
+            "seconds": round(seconds, 3),
+            "files_per_second": round(stats["files"] / seconds, 2),
+            "chunks_per_second": round(stats["chunks"] / seconds, 2),
+            "write": stats.get("write"),
+        }
+    from app.core.memvid_client import store_path
+
+    out["store_bytes"] = os.path.getsize(store_path(get_kb(KB).name))
+    return out
+
+
+def run_retrieval(levels: List[int], count: int) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.rag.pipeline import retrieve_distinct
+
+    qs = queries(count)
+
+    async def level(concurrency: int) -> Dict[str, Any]:
+        sem = asyncio.Semaphore(concurrency)
+        samples: List[float] = []
+
+        async def one(q: str) -> None:
+            async with sem:
+                t0 = time.perf_counter()
+                await retrieve_distinct(q, settings.top_k)
+                samples.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in qs))
+        wall = time.perf_counter() - t0
+        return {**percentiles(samples), "qps": round(len(qs) / wall, 2)}
+
+    async def all_levels() -> Dict[str, Any]:
+        # Warm the read handle (and dense index) outside the measurement.
+        await retrieve_distinct("warm-up", settings.top_k)
+        return {str(c): await level(c) for c in levels}
+
+    return asyncio.run(all_levels())
+
+
+def _has_content(sse_line: str) -> bool:
+    """True for an SSE chunk carrying generated text (not the role-only first chunk)."""
+    if not sse_line.startswith("data:") or sse_line.endswith("[DONE]"):
+        return False
+    choices = json.loads(sse_line[5:]).get("choices") or [{}]
+    return bool((choices[0].get("delta") or {}).get("content"))
+
+
+async def _chat_level(base: str, concurrency: int, count: int, stream: bool, offset: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    statuses: Dict[str, int] = {}
+    qs = queries(count, seed=offset)
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, timeout=300.0, limits=limits) as client:
+
+        async def one(i: int, q: str) -> None:
+            # Unique questions: measure real work, not request coalescing.
+            body = {
+                "model": "local-rag",
+                "stream": stream,
+                "messages": [{"role": "user", "content": f"{q} (#{offset + i})"}],
+            }
+            async with sem:
+                t0 = time.perf_counter()
+                if stream:
+                    async with client.stream("POST", "/v1/chat/completions", json=body) as r:
+                        first = None
+                        async for line in r.aiter_lines():
+                            if first is None and _has_content(line):
+                                first = time.perf_counter() - t0
+                        status = r.status_code
+                    if first is not None:
+                        ttfts.append(first)
+                else:
+                    r = await client.post("/v1/chat/completions", json=body)
+                    status = r.status_code
+                elapsed = time.perf_counter() - t0
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i, q) for i, q in enumerate(qs)))
+        wall = time.perf_counter() - t0
+
+    out: Dict[str, Any] = {"latency": percentiles(latencies), "rps": round(count / wall, 2), "status": statuses}
+    if stream:
+        out["ttft"] = percentiles(ttfts)
+    return out
+
+
+def run_chat(env: Dict[str, str], workdir: str, port: int, levels: List[int], count: int, workers: int) -> Dict[str, Any]:
+    proc = start_process(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers)],
+        env,
+        os.path.join(workdir, "gateway.log"),
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_http(base + "/api/ready", timeout=120)
+        results: Dict[str, Any] = {}
+        offset = 0
+        for mode in ("blocking", "stream"):
+            results[mode] = {}
+            for c in levels:
+                n = max(count, c)
+                results[mode][str(c)] = asyncio.run(_chat_level(base, c, n, mode == "stream", offset))
+                offset += n
+        return results
+    finally:
+        stop_process(proc)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--scenarios", default="ingest,retrieval,chat")
+    ap.add_argument("--workdir", help="default: a new temporary directory")
+    ap.add_argument("--reuse-corpus", action="store_true", help="keep an existing corpus in --workdir")
+    ap.add_argument("--md-files", type=int, default=500)
+    ap.add_argument("--pdfs", type=int, default=2)
+    ap.add_argument("--pages", type=int, default=300, help="pages per PDF")
+    ap.add_argument("--concurrency", default="1,8,32", help="client concurrency levels")
+    ap.add_argument("--queries", type=int, default=200, help="retrieval queries per level")
+    ap.add_argument("--requests", type=int, default=64, help="chat requests per level and mode")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers for the chat scenario")
+    ap.add_argument("--ttft", type=float, default=0.2, help="stub Ollama: seconds before the first token")
+    ap.add_argument("--tokens-per-second", type=float, default=40.0, help="stub Ollama: generation rate")
+    ap.add_argument("--answer-tokens", type=int, default=64, help="stub Ollama: tokens per answer")
+    ap.add_argument("--stub-port", type=int, default=11500)
+    ap.add_argument("--port", type=int, default=8765, help="gateway port for the chat scenario")
+    ap.add_argument("--out", help="also write the results as JSON to this file")
+    args = ap.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="rag-bench-"))
+    corpus = os.path.join(workdir, "corpus")
+    # Explicit env vars win for tunables (e.g. VECTOR_INDEX_ENABLED,
+    # LLM_MAX_CONCURRENCY); paths always point into the work directory.
+    env = dict(os.environ)
+    env.update(
+        OLLAMA_BASE_URL=f"http://127.0.0.1:{args.stub_port}",
+        OLLAMA_BASE_URLS="",
+        KNOWLEDGE_BASES=KB,
+        MD_DIR=os.path.join(corpus, "md"),
+        PDF_DIR=os.path.join(corpus, "pdf"),
+        MEMVID_PATH=os.path.join(workdir, "stores"),
+    )
+    env.setdefault("RETRIEVAL_CACHE_SIZE", "0")
+    env.setdefault("ANSWER_CACHE_ENABLED", "false")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.update(env)
+
+    from bench.corpus import write_markdown_vault, write_pdf_library
+
+    if not (args.reuse_corpus and os.path.isdir(corpus)):
+        shutil.rmtree(corpus, ignore_errors=True)
+        shutil.rmtree(os.path.join(workdir, "stores"), ignore_errors=True)
+        write_markdown_vault(os.path.join(corpus, "md", KB), args.md_files)
+        write_pdf_library(os.path.join(corpus, "pdf", KB), args.pdfs, args.pages)
+
+    stub = start_process(
+        [
+            sys.executable, "-m", "bench.stub_ollama",
+            "--port", str(args.stub_port),
+            "--ttft", str(args.ttft),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--answer-tokens", str(args.answer_tokens),
+        ],
+        env,
+        os.path.join(workdir, "stub.log"),
+    )
+    results: Dict[str, Any] = {
+        "meta": {
+            **git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+            "workdir": workdir,
+        },
+        "scenarios": {},
+    }
+    try:
+        wait_http(f"http://127.0.0.1:{args.stub_port}/api/tags", timeout=30)
+        from app.core.memvid_client import store_exists
+
+        if "ingest" in scenarios or not store_exists(KB):
+            ingest = run_ingest(workdir)
+            if "ingest" in scenarios:
+                results["scenarios"]["ingest"] = ingest
+        if "retrieval" in scenarios:
+            results["scenarios"]["retrieval"] = run_retrieval(levels, args.queries)
+        if "chat" in scenarios:
+            results["scenarios"]["chat"] = run_chat(env, workdir, args.port, levels, args.requests, args.workers)
+        results["meta"]["stub_requests"] = httpx.get(f"http://127.0.0.1:{args.stub_port}/stub/stats").json()
+    finally:
+        stop_process(stub)
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
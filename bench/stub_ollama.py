@@ -0,0 +1,121 @@
+"""Stand-in Ollama server with configurable latency and token rate.
+
+Implements the endpoints the gateway uses (`/api/tags`, `/api/chat`
+streamed and not, `/api/embed`, `/api/generate`) so benchmarks measure the
+gateway rather than a GPU. Embeddings are deterministic hash vectors;
+`GET /stub/stats` returns request counts.
+
+    python -m bench.stub_ollama [--port 11500] [--ttft 0.2] [--tokens-per-second 40]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+@dataclass
+class StubConfig:
+    chat_model: str = "qwen2.5:7b-instruct"
+    embed_model: str = "nomic-embed-text:latest"
+    # Seconds before the first token (prompt processing)
+    ttft: float = 0.2
+    tokens_per_second: float = 40.0
+    answer_tokens: int = 64
+    embed_dim: int = 768
+    # Per /api/embed request, plus per input text
+    embed_latency: float = 0.01
+    embed_latency_per_text: float = 0.001
+
+
+def _vector(text: str, dim: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="stub-ollama")
+    app.state.requests = {"chat": 0, "embed": 0, "generate": 0}
+
+    def tokens(n: int) -> List[str]:
+        return [f" tok{i}" for i in range(n)]
+
+    @app.get("/stub/stats")
+    async def stats():
+        return app.state.requests
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": config.chat_model}, {"name": config.embed_model}]}
+
+    @app.post("/api/generate")
+    async def generate(_request: Request):
+        app.state.requests["generate"] += 1
+        return {"response": "", "done": True}
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        app.state.requests["embed"] += 1
+        body = await request.json()
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(config.embed_latency + config.embed_latency_per_text * len(inputs))
+        return {"model": body.get("model"), "embeddings": [_vector(t, config.embed_dim) for t in inputs]}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        app.state.requests["chat"] += 1
+        body = await request.json()
+        n = int((body.get("options") or {}).get("num_predict") or config.answer_tokens)
+        n = min(n, config.answer_tokens)
+        delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        words = tokens(n)
+        if not body.get("stream"):
+            await asyncio.sleep(config.ttft + delay * n)
+            return {"message": {"role": "assistant", "content": "".join(words)}, "done": True}
+
+        async def ndjson():
+            await asyncio.sleep(config.ttft)
+            for w in words:
+                yield json.dumps({"message": {"role": "assistant", "content": w}, "done": False}) + "\n"
+                await asyncio.sleep(delay)
+            yield json.dumps({"message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=11500)
+    ap.add_argument("--ttft", type=float, default=StubConfig.ttft, help="seconds before the first token")
+    ap.add_argument("--tokens-per-second", type=float, default=StubConfig.tokens_per_second)
+    ap.add_argument("--answer-tokens", type=int, default=StubConfig.answer_tokens)
+    ap.add_argument("--embed-dim", type=int, default=StubConfig.embed_dim)
+    ap.add_argument("--embed-latency", type=float, default=StubConfig.embed_latency)
+    ap.add_argument("--embed-latency-per-text", type=float, default=StubConfig.embed_latency_per_text)
+    args = ap.parse_args()
+    config = StubConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        embed_dim=args.embed_dim,
+        embed_latency=args.embed_latency,
+        embed_latency_per_text=args.embed_latency_per_text,
+    )
+    uvicorn.run(create_app(config), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
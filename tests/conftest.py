@@ -0,0 +1,110 @@
+"""Shared fixtures: every test gets its own knowledge base under `tmp_path`."""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Iterator, List
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+# Keep a developer's .env (real stores, real Ollama) out of the tests.
+os.environ.setdefault("OLLAMA_BASE_URL", "http://127.0.0.1:9")
+
+from app.core.config import settings  # noqa: E402
+from app.core.knowledge_bases import KnowledgeBase, get_kb  # noqa: E402
+from app.main import app  # noqa: E402
+from app.rag import embeddings, ollama_client  # noqa: E402
+from app.rag.backends import BackendPool  # noqa: E402
+from bench.stub_ollama import StubConfig, create_app  # noqa: E402
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch) -> KnowledgeBase:
+    """A fresh, empty knowledge base with its folders created."""
+    # Stores, readers and caches are keyed by name: never reuse one.
+    name = "t" + uuid.uuid4().hex[:8]
+    monkeypatch.setattr(settings, "knowledge_bases", name)
+    monkeypatch.setattr(settings, "memvid_path", str(tmp_path / "stores"))
+    monkeypatch.setattr(settings, "md_dir", str(tmp_path / "md"))
+    monkeypatch.setattr(settings, "pdf_dir", str(tmp_path / "pdf"))
+    monkeypatch.setattr(settings, "ingest_processes", 1)
+    kb = get_kb(name)
+    for d in (kb.md_dir, kb.pdf_dir, settings.memvid_path):
+        os.makedirs(d, exist_ok=True)
+    return kb
+
+
+def _free_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+@pytest.fixture
+def free_url() -> Callable[[], str]:
+    """Make up the URL of an Ollama that is not running."""
+    return _free_url
+
+
+@pytest.fixture
+def stub() -> Iterator[Callable[..., uvicorn.Server]]:
+    """Start a stub Ollama (on `url`, or a free port); stopped after the test."""
+    servers: List[tuple] = []
+
+    def start(url: str = "", **config) -> uvicorn.Server:
+        url = url or _free_url()
+        stub_app = create_app(StubConfig(embed_latency=0, embed_latency_per_text=0, embed_dim=8, **config))
+        server = uvicorn.Server(
+            uvicorn.Config(stub_app, host="127.0.0.1", port=int(url.rsplit(":", 1)[1]), log_level="warning")
+        )
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 10
+        while not server.started:
+            assert time.monotonic() < deadline, "stub Ollama did not start"
+            time.sleep(0.01)
+        server.url = url
+        servers.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(5)
+
+
+@pytest.fixture
+def pool_for(monkeypatch) -> Callable[[List[str]], BackendPool]:
+    """Make the process-wide pool route over `urls`, with a fresh embedding cache."""
+    monkeypatch.setattr(embeddings, "_CACHE", embeddings.EmbeddingCache(max_entries=1000))
+    monkeypatch.setattr(settings, "ollama_embed_model", StubConfig.embed_model)
+    monkeypatch.setattr(settings, "ollama_chat_model", StubConfig.chat_model)
+
+    def make(urls: List[str]) -> BackendPool:
+        monkeypatch.setattr(settings, "ollama_base_urls", ",".join(urls))
+        monkeypatch.setattr(ollama_client, "_POOL", None)
+        return ollama_client.get_backend_pool()
+
+    return make
+
+
+@pytest.fixture
+def ollama(stub, pool_for) -> uvicorn.Server:
+    """A fast stub Ollama that the app routes to (request before `client`)."""
+    server = stub(ttft=0, tokens_per_second=1000, answer_tokens=3)
+    pool_for([server.url])
+    return server
+
+
+@pytest.fixture
+def client(monkeypatch) -> Iterator[TestClient]:
+    """The API with its lifespan run; warm-up is off, so it is ready at once."""
+    monkeypatch.setattr(settings, "api_key", None)
+    monkeypatch.setattr(settings, "warmup_enabled", False)
+    with TestClient(app) as c:
+        yield c
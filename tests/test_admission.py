@@ -0,0 +1,49 @@
+"""Streamed answers only hold an LLM slot while they are being read."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.core import admission
+from app.core.admission import AdmissionGate, AdmissionRejected
+from app.rag import pipeline
+
+
+@pytest.fixture
+def gate(monkeypatch) -> AdmissionGate:
+    gate = AdmissionGate(limit=1, max_queue=0, max_wait=1.0)
+    monkeypatch.setattr(admission, "_GATE", gate)
+
+    async def tokens(messages, **_):
+        for t in ("a", "b", "c"):
+            yield t
+
+    monkeypatch.setattr(pipeline, "ollama_chat_stream", tokens)
+    return gate
+
+
+def test_abandoned_stream_holds_no_slot(gate):
+    async def main():
+        pipeline._generate([], None, None, admission.INTERACTIVE)
+        assert gate.active == 0
+
+        stream = pipeline._generate([], None, None, admission.INTERACTIVE)
+        assert await stream.__anext__() == "a"
+        assert gate.active == 1
+        await stream.aclose()
+        assert gate.active == 0
+
+    asyncio.run(main())
+
+
+def test_full_queue_is_refused_before_streaming(gate):
+    async def main():
+        slot = await gate.acquire()
+        with pytest.raises(AdmissionRejected) as e:
+            admission.check_llm_admission()
+        assert e.value.status_code == 429
+        slot.release()
+        admission.check_llm_admission()
+
+    asyncio.run(main())
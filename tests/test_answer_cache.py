@@ -0,0 +1,63 @@
+"""Temperature-0 completions are replayed from the answer cache."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.ingest.jobs import ingest_sources
+from app.rag import answer_cache
+from tests.test_chat_stream import _events
+from tests.test_reingest import _note, _write
+
+
+@pytest.fixture
+def cached(kb, monkeypatch):
+    monkeypatch.setattr(settings, "answer_cache_enabled", True)
+    monkeypatch.setattr(settings, "answer_cache_persist", False)
+    monkeypatch.setattr(answer_cache, "_CACHE", None)
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+
+
+def _chat(client, temperature: float, stream: bool = False):
+    return client.post(
+        "/v1/chat/completions",
+        json={
+            "model": "local-rag",
+            "temperature": temperature,
+            "stream": stream,
+            "messages": [{"role": "user", "content": "beta lantern"}],
+        },
+    )
+
+
+def _chats(ollama) -> int:
+    return ollama.config.app.state.requests["chat"]
+
+
+def test_deterministic_answers_are_generated_once(cached, ollama, client):
+    first = _chat(client, 0)
+    second = _chat(client, 0)
+    streamed = _chat(client, 0, stream=True)
+
+    assert [r.headers["X-RAG-Cache"] for r in (first, second, streamed)] == ["miss", "hit", "hit"]
+    assert second.json()["choices"][0]["message"]["content"] == " tok0 tok1 tok2"
+    chunks = [json.loads(c) for c in _events(streamed.text)[:-1]]
+    assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks) == " tok0 tok1 tok2"
+    assert _chats(ollama) == 1
+
+
+def test_sampled_answers_bypass_the_cache(cached, ollama, client):
+    assert [_chat(client, 0.7).headers["X-RAG-Cache"] for _ in range(2)] == ["bypass", "bypass"]
+    assert _chats(ollama) == 2
+
+
+def test_new_context_misses(kb, cached, ollama, client):
+    _chat(client, 0)
+    _write(kb, "beta.md", _note("beta", 6))
+    ingest_sources(["md"])
+
+    assert _chat(client, 0).headers["X-RAG-Cache"] == "miss"
+    assert _chats(ollama) == 2
@@ -0,0 +1,77 @@
+"""Ollama backend pool against stub servers: routing, ejection and failover."""
+from __future__ import annotations
+
+import asyncio
+
+import uvicorn
+
+from app.core.config import settings
+from app.rag import embeddings
+from bench.stub_ollama import StubConfig
+
+EMBED_MODEL = StubConfig.embed_model
+
+
+def _embed_requests(server: uvicorn.Server) -> int:
+    return server.config.app.state.requests["embed"]
+
+
+def test_embedding_batches_rotate_over_backends_serving_the_model(stub, pool_for, monkeypatch):
+    a, other, c = stub(), stub(embed_model="other-embed:latest"), stub()
+    pool = pool_for([a.url, other.url, c.url])
+    asyncio.run(pool.check_all())
+    monkeypatch.setattr(settings, "embed_batch_size", 1)
+
+    vectors = embeddings.embed_texts_blocking([f"text {i}" for i in range(6)])
+
+    assert len(vectors) == 6
+    assert _embed_requests(other) == 0
+    assert _embed_requests(a) == _embed_requests(c) == 3
+
+
+def test_blocking_embeddings_fail_over_and_eject_unreachable_backends(stub, free_url, pool_for, monkeypatch):
+    alive = stub()
+    dead = free_url()
+    pool = pool_for([dead, alive.url])
+    monkeypatch.setattr(settings, "embed_batch_size", 1)
+
+    assert len(embeddings.embed_texts_blocking(["one", "two", "three"])) == 3
+
+    assert _embed_requests(alive) == 3
+    assert [b.healthy for b in pool.backends] == [False, True]
+
+
+def test_unreachable_backend_is_ejected_and_readmitted_by_health_checks(stub, free_url, pool_for):
+    alive = stub()
+    dead = free_url()
+    pool = pool_for([dead, alive.url])
+
+    async def main():
+        r = await pool.post("/api/embed", model=EMBED_MODEL, json={"model": EMBED_MODEL, "input": ["x"]})
+        assert r.status_code == 200
+        down = pool.backends[0]
+        assert not down.healthy and down.failures == 1
+        assert pool.candidates(EMBED_MODEL)[-1] is down
+
+        stub(dead)
+        await pool.check_all()
+        assert down.healthy and down.failures == 0
+        await pool.aclose()
+
+    asyncio.run(main())
+    assert _embed_requests(alive) == 1
+
+
+def test_stream_fails_over_before_the_first_byte(stub, free_url, pool_for):
+    alive = stub(ttft=0, tokens_per_second=1000, answer_tokens=3)
+    pool = pool_for([free_url(), alive.url])
+    body = {"model": "qwen2.5:7b-instruct", "messages": [], "stream": True}
+
+    async def main():
+        async with pool.stream("POST", "/api/chat", json=body) as r:
+            lines = [line async for line in r.aiter_lines() if line]
+        await pool.aclose()
+        return lines
+
+    assert len(asyncio.run(main())) == 4  # three tokens and the final message
+    assert [b.healthy for b in pool.backends] == [False, True]
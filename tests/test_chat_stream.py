@@ -0,0 +1,51 @@
+"""/v1/chat/completions with `stream: true` relays Ollama's tokens as SSE."""
+from __future__ import annotations
+
+import json
+from typing import List
+
+from app.ingest.jobs import ingest_sources
+from tests.test_reingest import _note, _write
+
+
+def _events(body: str) -> List[str]:
+    return [line[len("data: "):] for line in body.split("\n\n") if line.startswith("data: ")]
+
+
+def _chat(client, stream: bool, question: str = "beta lantern"):
+    return client.post(
+        "/v1/chat/completions",
+        json={"model": "local-rag", "stream": stream, "messages": [{"role": "user", "content": question}]},
+    )
+
+
+def test_tokens_are_streamed_as_chunks_then_citations(kb, ollama, client):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+
+    r = _chat(client, stream=True)
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    *chunks, done = _events(r.text)
+    assert done == "[DONE]"
+    chunks = [json.loads(c) for c in chunks]
+    assert {c["object"] for c in chunks} == {"chat.completion.chunk"}
+    assert len({c["id"] for c in chunks}) == 1
+    deltas = [c["choices"][0]["delta"] for c in chunks]
+    assert deltas[0] == {"role": "assistant", "content": ""}
+    assert [d["content"] for d in deltas[1:-1]] == [" tok0", " tok1", " tok2"]
+    final = chunks[-1]
+    assert deltas[-1] == {} and final["choices"][0]["finish_reason"] == "stop"
+    assert final["citations"] and "beta" in final["citations"][0]
+    assert final["context"]["sources"] >= 1
+
+
+def test_blocking_answer_matches_the_stream(kb, ollama, client):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+
+    r = _chat(client, stream=False)
+
+    assert r.status_code == 200
+    assert r.json()["choices"][0]["message"]["content"] == " tok0 tok1 tok2"
@@ -0,0 +1,69 @@
+"""Follow-up turns fuse their retrieval with the turn they follow up on."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.ingest.jobs import ingest_sources
+from app.rag import conversation
+from app.rag.retrieval import _hit_key
+from tests.test_reingest import _note, _write
+
+
+@pytest.fixture
+def retrievals(kb, monkeypatch) -> list:
+    _write(kb, "beta.md", _note("beta", 5))
+    _write(kb, "gamma.md", _note("gamma", 5))
+    ingest_sources(["md"])
+    calls = []
+    retrieve = conversation.retrieve
+
+    async def counted(query, **kwargs):
+        calls.append(query)
+        return await retrieve(query, **kwargs)
+
+    monkeypatch.setattr(conversation, "retrieve", counted)
+    return calls
+
+
+def _turn(kb, query: str, history=()) -> list:
+    return asyncio.run(conversation.retrieve_turn(query, list(history), 4, [kb.name]))
+
+
+def _titles(hits: list) -> set:
+    return {h["title"] for h in hits}
+
+
+def test_followup_keeps_the_sources_of_the_earlier_turn(kb, retrievals):
+    first = _turn(kb, "beta lantern")
+    followup = _turn(kb, "gamma lantern", ["beta lantern"])
+
+    assert _titles(first) == {"beta"}
+    assert _titles(followup) == {"beta", "gamma"}
+    assert all("rrf_score" in h for h in followup)
+    assert retrievals == ["beta lantern", "gamma lantern"]
+
+
+def test_new_conversation_does_not_fuse(kb, retrievals):
+    _turn(kb, "beta lantern")
+
+    assert _titles(_turn(kb, "gamma lantern")) == {"gamma"}
+
+
+def test_regenerated_turn_is_replayed(kb, retrievals):
+    _turn(kb, "beta lantern")
+    followup = _turn(kb, "gamma lantern", ["beta lantern"])
+
+    again = _turn(kb, "Gamma  lantern", ["beta lantern"])
+
+    assert [_hit_key(h) for h in again] == [_hit_key(h) for h in followup]
+    assert retrievals == ["beta lantern", "gamma lantern"]
+
+
+def test_ingest_invalidates_earlier_turns(kb, retrievals):
+    _turn(kb, "beta lantern")
+    _write(kb, "delta.md", _note("delta", 5))
+    ingest_sources(["md"])
+
+    assert _titles(_turn(kb, "gamma lantern", ["beta lantern"])) == {"gamma"}
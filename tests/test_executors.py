@@ -0,0 +1,48 @@
+"""Blocking Memvid work runs in thread pools, never on the event loop."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from app.core import memvid_client
+from app.core.executors import run_ingest
+from app.ingest.jobs import ingest_sources
+from tests.test_reingest import _note, _write
+
+
+def test_event_loop_keeps_running_during_a_slow_search(kb, monkeypatch):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    threads = []
+    real_find = memvid_client._find
+
+    def slow_find(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.3)
+        return real_find(*args, **kwargs)
+
+    monkeypatch.setattr(memvid_client, "_find", slow_find)
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        hits = await memvid_client.search_async("beta lantern", 3, kb.name)
+        ticker.cancel()
+        return hits, ticks
+
+    hits, ticks = asyncio.run(main())
+    assert hits
+    assert ticks >= 10
+    assert threads and threads[0].startswith("retrieval")
+
+
+def test_ingestion_runs_in_its_own_executor():
+    assert asyncio.run(run_ingest(lambda: threading.current_thread().name)).startswith("ingest")
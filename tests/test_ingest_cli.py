@@ -0,0 +1,34 @@
+"""`python -m app.ingest` as documented in the README and .env.example."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.ingest.__main__ import main
+from tests.test_reingest import _note, _write
+
+
+def test_ingests_every_source_by_default(kb, capsys):
+    _write(kb, "beta.md", _note("beta", 5))
+
+    main([])
+
+    result = json.loads(capsys.readouterr().out)
+    assert set(result) == {"md", "pdf"}
+    assert result["md"]["chunks"] > 0
+
+
+def test_kb_option_selects_the_knowledge_base(kb, capsys):
+    _write(kb, "beta.md", _note("beta", 5))
+
+    main(["md", "--kb", kb.name])
+
+    assert json.loads(capsys.readouterr().out)["md"]["chunks"] > 0
+
+
+def test_unknown_source_is_a_usage_error(kb, capsys):
+    with pytest.raises(SystemExit) as exc:
+        main(["txt"])
+    assert exc.value.code == 2
+    assert "invalid source(s): txt" in capsys.readouterr().err
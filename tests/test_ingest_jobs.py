@@ -0,0 +1,120 @@
+"""Ingest jobs: store locks, cancellation, clients that go away, and the job API."""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from app.api import ingest_routes
+from app.core.config import settings
+from app.core.memvid_client import StoreBusy, store_exists, store_write_lock
+from app.ingest import jobs as jobs_module
+from app.ingest.jobs import JobManager
+from tests.test_reingest import _note, _write
+
+
+def test_job_refused_when_another_process_writes_one_of_its_stores(kb, monkeypatch):
+    other = kb.name + "b"
+    monkeypatch.setattr(settings, "knowledge_bases", f"{kb.name},{other}")
+    for name in (kb.name, other):
+        os.makedirs(os.path.join(settings.md_dir, name), exist_ok=True)
+        with open(os.path.join(settings.md_dir, name, "note.md"), "w", encoding="utf-8") as f:
+            f.write("# Note\n\nThe lantern burns quietly all night long in the old hall.\n")
+    manager = JobManager(history=5)
+
+    with store_write_lock(other):
+        with pytest.raises(StoreBusy):
+            manager.submit(["md"])
+    assert not store_exists(kb.name)
+
+    job = manager.submit(["md"])
+    job.future.result(timeout=60)
+    assert job.status == "succeeded", job.error
+    assert store_exists(kb.name) and store_exists(other)
+    # The locks were released with the job.
+    with store_write_lock(kb.name):
+        pass
+
+
+@pytest.fixture
+def queued(monkeypatch) -> JobManager:
+    """A job manager whose jobs stay queued: their executor never picks them up."""
+    monkeypatch.setattr(jobs_module, "submit_ingest", lambda fn, *args: Future())
+    return JobManager(history=5)
+
+
+def test_cancel_request_stops_the_job_before_it_writes(kb, queued):
+    job = queued.submit(["md"])
+    assert queued.cancel(job.id).progress.cancelled
+
+    queued._run(job)
+
+    assert job.status == "cancelled"
+    assert not store_exists(kb.name)
+    with store_write_lock(kb.name):
+        pass
+
+
+def test_job_dropped_from_the_executor_releases_its_locks(kb, queued):
+    job = queued.submit(["md"])
+
+    job.future.cancel()
+
+    assert job.status == "cancelled" and job.finished_at is not None
+    with store_write_lock(kb.name):
+        pass
+    assert queued.submit(["md"]).status == "queued"
+
+
+def test_disconnected_client_does_not_cancel_its_queued_job(kb, queued, monkeypatch):
+    monkeypatch.setattr(ingest_routes, "jobs", queued)
+
+    async def main():
+        request = asyncio.ensure_future(ingest_routes._run(["md"]))
+        await asyncio.sleep(0.01)
+        request.cancel()
+        await asyncio.gather(request, return_exceptions=True)
+
+    asyncio.run(main())
+    (job,) = queued.list()
+    assert job.status == "queued" and not job.future.cancelled()
+    job.future.cancel()
+
+
+def _poll(client, job_id: str) -> dict:
+    for _ in range(600):
+        job = client.get(f"/api/ingest/jobs/{job_id}").json()
+        if job["finished_at"] is not None:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"ingest job {job_id} did not finish")
+
+
+def test_job_api_runs_a_job_to_completion(kb, client, monkeypatch):
+    monkeypatch.setattr(ingest_routes, "jobs", JobManager(history=5))
+    _write(kb, "beta.md", _note("beta", 5))
+
+    r = client.post("/api/ingest/jobs", json={"sources": ["md"]})
+
+    assert r.status_code == 202 and r.json()["status"] in {"queued", "running", "succeeded"}
+    job = _poll(client, r.json()["id"])
+    assert job["status"] == "succeeded", job["error"]
+    assert job["result"]["md"]["files"] == 1
+    assert [j["id"] for j in client.get("/api/ingest/jobs").json()["jobs"]] == [job["id"]]
+
+
+def test_job_api_cancel_and_unknown_jobs(kb, client, queued, monkeypatch):
+    monkeypatch.setattr(ingest_routes, "jobs", queued)
+    job_id = client.post("/api/ingest/jobs", json={"sources": ["md"]}).json()["id"]
+
+    r = client.post(f"/api/ingest/jobs/{job_id}/cancel")
+
+    assert r.status_code == 202 and r.json()["cancel_requested"]
+    assert client.post("/api/ingest/jobs", json={"sources": ["md"]}).status_code == 409
+    assert client.get("/api/ingest/jobs/nope").status_code == 404
+    assert client.post("/api/ingest/jobs/nope/cancel").status_code == 404
+    assert client.post("/api/ingest/jobs", json={"knowledge_bases": ["nope"]}).status_code == 404
+    queued.get(job_id).future.cancel()
@@ -0,0 +1,58 @@
+"""Several knowledge bases: model routing and fan-out search."""
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.core.knowledge_bases import UnknownKnowledgeBase, kbs_for_model, knowledge_bases, model_ids
+from app.ingest.jobs import ingest_sources
+from app.rag.retrieval import retrieve
+from tests.test_reingest import _note
+
+
+@pytest.fixture
+def two_kbs(kb, monkeypatch) -> list:
+    names = [kb.name + "a", kb.name + "b"]
+    monkeypatch.setattr(settings, "knowledge_bases", ",".join(names))
+    for name, word in zip(names, ("dragon", "goblin")):
+        os.makedirs(os.path.join(settings.md_dir, name))
+        with open(os.path.join(settings.md_dir, name, "note.md"), "w", encoding="utf-8") as f:
+            f.write(_note(word, 5))
+    return names
+
+
+def test_models_route_to_their_knowledge_bases(two_kbs):
+    a, b = two_kbs
+    assert model_ids() == ["local-rag", f"local-rag:{a}", f"local-rag:{b}"]
+    assert kbs_for_model("local-rag") == [a, b]
+    assert kbs_for_model(f"local-rag:{b}") == [b]
+    with pytest.raises(UnknownKnowledgeBase):
+        kbs_for_model("local-rag:nope")
+
+
+def test_configuration_is_parsed_once_per_setting(two_kbs, monkeypatch):
+    assert knowledge_bases() is knowledge_bases()
+    monkeypatch.setattr(settings, "knowledge_bases", two_kbs[0])
+    assert list(knowledge_bases()) == [two_kbs[0]]
+
+
+def test_combined_model_searches_every_store(two_kbs):
+    a, b = two_kbs
+    ingest_sources(["md"])
+
+    hits = asyncio.run(retrieve("lantern", 5))
+    assert {h["kb"] for h in hits} == {a, b}
+    only_b = asyncio.run(retrieve("lantern", 5, [b]))
+    assert only_b and all("goblin" in h["text"] for h in only_b)
+
+
+def test_unknown_model_is_404(two_kbs, client):
+    r = client.post(
+        "/v1/chat/completions",
+        json={"model": "local-rag:nope", "messages": [{"role": "user", "content": "hi"}]},
+    )
+    assert r.status_code == 404
+    assert f"local-rag:{two_kbs[0]}" in r.json()["detail"]
@@ -0,0 +1,22 @@
+"""User questions reach Memvid as plain words, never as query syntax."""
+from __future__ import annotations
+
+from app.core.memvid_client import search
+from app.ingest.jobs import ingest_sources
+from app.utils.text import lexical_query
+from tests.test_reingest import _note, _write
+
+
+def test_operators_and_punctuation_are_dropped():
+    assert lexical_query("fire (or cold)?") == "fire cold"
+    assert lexical_query('NOT this "quoted" thing*') == "this quoted thing"
+    assert lexical_query("AND OR") == ""
+
+
+def test_questions_with_query_syntax_are_searchable(kb):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+
+    assert search("lantern (or beta)?", k=3, kb=kb.name)
+    assert search("NOT this", k=3, kb=kb.name) == []
+    assert search("(AND)", k=3, kb=kb.name) == []
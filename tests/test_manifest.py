@@ -0,0 +1,38 @@
+"""The manifest skips unchanged files and removes the chunks of deleted ones."""
+from __future__ import annotations
+
+import os
+
+from app.ingest.jobs import ingest_sources
+from app.ingest.manifest import load_manifest
+from tests.test_reingest import _hits, _live_frames, _note, _write
+
+
+def test_unchanged_files_are_skipped(kb):
+    _write(kb, "beta.md", _note("beta", 5))
+    _write(kb, "gamma.md", _note("gamma", 5))
+    first = ingest_sources(["md"])["md"]
+    frames = {str(e["frame_id"]) for e in _live_frames(kb)}
+
+    second = ingest_sources(["md"])["md"]
+
+    assert first["skipped"] == 0 and first["chunks"] == len(frames)
+    assert second["skipped"] == 2 and second["chunks"] == 0 and second["removed"] == 0
+    assert {str(e["frame_id"]) for e in _live_frames(kb)} == frames
+
+
+def test_deleted_files_lose_their_chunks(kb):
+    beta = _write(kb, "beta.md", _note("beta", 5))
+    gamma = _write(kb, "gamma.md", _note("gamma", 5))
+    ingest_sources(["md"])
+    removed = load_manifest(kb.name).get(beta).chunk_ids
+
+    os.remove(beta)
+    stats = ingest_sources(["md"])["md"]
+
+    assert stats["removed"] == len(removed) and stats["skipped"] == 1
+    assert _hits(kb, "beta") == []
+    assert _hits(kb, "gamma")
+    manifest = load_manifest(kb.name)
+    assert manifest.get(beta) is None and manifest.get(gamma) is not None
+    assert {str(e["frame_id"]) for e in _live_frames(kb)} == set(manifest.get(gamma).chunk_ids)
@@ -0,0 +1,35 @@
+"""Adjacent windows of one section are merged; distant ones are not."""
+from __future__ import annotations
+
+from app.rag.pipeline import merge_adjacent
+
+SEVEN = "Seven lamps burn in the hall."
+
+
+def _hit(frame_id: int, chunk_index: int, text: str, section: str = "Intro") -> dict:
+    return {
+        "frame_id": frame_id,
+        "text": text,
+        "metadata": {"source_file": "a.md", "section_path": section, "chunk_index": chunk_index},
+    }
+
+
+def test_only_consecutive_chunks_are_merged():
+    hits = [
+        _hit(12, 7, f"{SEVEN} Eight lamps light the stairs."),
+        _hit(2, 1, "One."),
+        _hit(11, 6, f"Six lamps hang by the door. {SEVEN}"),
+        _hit(3, 2, "Two."),
+        _hit(30, 1, "Other one.", section="Usage"),
+    ]
+    merged = merge_adjacent(hits)
+
+    assert [h.get("merged_frame_ids") for h in merged] == [[11, 12], [2, 3], None]
+    assert merged[0]["text"] == f"Six lamps hang by the door. {SEVEN} Eight lamps light the stairs."
+    assert merged[1]["text"] == "One.\n\nTwo."
+
+
+def test_chunks_far_apart_stay_separate_hits():
+    hits = [_hit(1, 0, "Start."), _hit(9, 8, "Later.")]
+
+    assert merge_adjacent(hits) == hits
@@ -0,0 +1,56 @@
+"""Filtered searches only see the live chunks of the active generation."""
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.core.memvid_client import chunk_scope
+from app.core.metadata_index import ChunkFilter, MetadataIndex, get_metadata_index
+from app.ingest.jobs import ingest_sources
+from app.rag.retrieval import search_filtered
+from tests.test_reingest import _note, _write
+
+
+def test_changed_file_leaves_no_stale_frames_behind_its_filter(kb):
+    _write(kb, "alpha.md", _note("alpha"))
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    _write(kb, "alpha.md", _note("omega"))
+    ingest_sources(["md"])
+
+    only_alpha = ChunkFilter.create(source_file="alpha.md")
+    hits = asyncio.run(search_filtered("lantern burns quietly", 50, kb.name, only_alpha))
+
+    assert hits
+    assert all("omega" in (h.get("text") or h.get("snippet") or "") for h in hits)
+    assert asyncio.run(search_filtered("alpha", 50, kb.name, only_alpha)) == []
+
+
+def test_query_handles_are_read_only(kb):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+
+    index = get_metadata_index(kb.name)
+    assert index.complete
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        index.mark_complete()
+
+
+def test_file_names_differing_in_case_do_not_share_a_scope(tmp_path):
+    index = MetadataIndex(str(tmp_path / "kb.meta.sqlite"))
+    index.mark_complete()
+    index.begin(1, None)
+    requests = []
+    for name in ("PHB.pdf", "phb.pdf"):
+        meta = {"source_type": "pdf", "source_file": name, "path": f"/data/{name}", "page": 3}
+        requests.append({"uri": f"mv2://pdf/{name}/p3/0", "metadata": meta})
+    index.add(requests)
+    index.generation = 1
+
+    plan = index.plan(ChunkFilter.create(source_file="phb.pdf"))
+
+    assert plan.uris == {"mv2://pdf/PHB.pdf/p3/0", "mv2://pdf/phb.pdf/p3/0"}
+    assert plan.scope == chunk_scope("pdf")
+    index.close()
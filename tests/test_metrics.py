@@ -0,0 +1,18 @@
+"""The Prometheus endpoint reports caches without creating them."""
+from __future__ import annotations
+
+import os
+
+from app.core.memvid_client import sidecar_path
+from app.core.metrics import REGISTRY
+from app.rag import embeddings
+
+
+def test_scrape_does_not_create_the_embedding_cache(kb, monkeypatch):
+    monkeypatch.setattr(embeddings, "_CACHE", None)
+
+    text = REGISTRY.render()
+
+    assert "rag_embedding_cache_entries 0" in text
+    assert embeddings._CACHE is None
+    assert not os.path.exists(sidecar_path(".embeddings.sqlite", kb.name))
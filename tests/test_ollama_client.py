@@ -0,0 +1,35 @@
+"""One pooled HTTP client per Ollama backend, opened and closed with the app."""
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.ingest.jobs import ingest_sources
+from app.main import app
+from app.rag import ollama_client
+from tests.test_reingest import _note, _write
+
+
+def test_requests_share_the_clients_opened_at_startup(kb, ollama, monkeypatch):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    monkeypatch.setattr(settings, "warmup_enabled", False)
+    built = []
+    real_build = ollama_client._build_client
+
+    def build(base_url):
+        built.append(real_build(base_url))
+        return built[-1]
+
+    monkeypatch.setattr(ollama_client, "_build_client", build)
+    monkeypatch.setattr(ollama_client, "_POOL", None)
+    body = {"model": "local-rag", "messages": [{"role": "user", "content": "beta lantern"}]}
+
+    with TestClient(app) as client:
+        for stream in (False, True, False):
+            assert client.post("/v1/chat/completions", json={**body, "stream": stream}).status_code == 200
+        assert len(built) == 1 and not built[0].is_closed
+
+    assert built[0].is_closed
+    assert ollama_client._POOL is None
+    assert ollama.config.app.state.requests["chat"] == 3
@@ -0,0 +1,26 @@
+"""Packed sources keep the layout of the retrieved text."""
+from __future__ import annotations
+
+from app.core.config import settings
+from app.rag.packing import pack_context
+
+
+def _cite(hit: dict) -> str:
+    return hit["source"]
+
+
+def test_separators_between_sentences_are_kept():
+    text = "Steps:\n\n- Open the valve.\n- Wait a minute.\nThen close it.  Done!"
+    packed = pack_context([{"text": text, "source": "a.md"}], budget=1000, cite=_cite)
+
+    assert packed.text == f"[SOURCE 1] a.md\n{text}"
+    assert packed.trimmed == 0
+
+
+def test_trimmed_source_ends_on_a_whole_sentence(monkeypatch):
+    monkeypatch.setattr(settings, "snippet_chars", 30)
+    text = "First line.\nSecond line. " + "Filler words here. " * 50
+    packed = pack_context([{"text": text, "source": "a.md"}], budget=12, cite=_cite)
+
+    assert packed.text == "[SOURCE 1] a.md\nFirst line.\nSecond line. …"
+    assert packed.trimmed == 1
@@ -0,0 +1,42 @@
+"""Files are chunked in worker processes and written by one thread."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.ingest.jobs import ingest_sources
+from app.ingest.manifest import load_manifest
+from app.ingest.parallel import iter_chunked
+from tests.test_reingest import _live_frames, _note, _write
+
+
+def test_worker_processes_chunk_every_file_once(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.md"
+        path.write_text("x" * (i + 1))
+        paths.append(str(path))
+
+    results = dict(iter_chunked(paths, os.path.getsize, workers=2, max_pending=2))
+
+    assert results == {p: i + 1 for i, p in enumerate(paths)}
+
+
+def test_chunking_errors_reach_the_writer(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(iter_chunked([str(tmp_path / "a"), str(tmp_path / "b")], os.path.getsize, workers=2))
+
+
+def test_parallel_ingest_records_every_file(kb, monkeypatch):
+    monkeypatch.setattr(settings, "ingest_processes", 2)
+    for word in ("alpha", "beta", "gamma", "delta"):
+        _write(kb, f"{word}.md", _note(word, 5))
+
+    stats = ingest_sources(["md"])["md"]
+
+    manifest = load_manifest(kb.name)
+    assert stats["files"] == len(manifest.files) == 4
+    live = sorted(str(e["frame_id"]) for e in _live_frames(kb))
+    assert live == sorted(c for e in manifest.files.values() for c in e.chunk_ids)
@@ -0,0 +1,139 @@
+"""Incremental ingest must replace a changed file's chunks, not add to them."""
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from app.core import memvid_client
+from app.core.config import settings
+from app.core.memvid_client import ChunkWriteError, active_store, read_store, search
+from app.ingest.jobs import ingest_sources
+from app.ingest.manifest import load_manifest
+
+
+def _note(word: str, sentences: int = 250) -> str:
+    # Long enough for Memvid to split the chunk into several frames.
+    body = " ".join(f"The {word} lantern number {i} burns quietly." for i in range(sentences))
+    return f"---\ntitle: {word}\ntype: item\n---\n# {word.title()}\n\n{body}\n"
+
+
+def _write(kb, name: str, text: str) -> str:
+    path = os.path.join(kb.md_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def _live_frames(kb) -> list:
+    with read_store(kb.name) as mem:
+        return mem.timeline(limit=int(mem.stats()["frame_count"]) or 1)
+
+
+def _hits(kb, word: str) -> list:
+    return search(word, k=20, kb=kb.name)
+
+
+def test_reingest_replaces_every_frame_of_a_changed_file(kb):
+    alpha = _write(kb, "alpha.md", _note("alpha"))
+    beta = _write(kb, "beta.md", _note("beta", 5))
+    gamma = _write(kb, "gamma.md", _note("gamma", 5))
+    first = ingest_sources(["md"])["md"]
+    assert first["chunks"] == len(_live_frames(kb))
+    entry = load_manifest(kb.name).get(alpha)
+    first_ids = {p: e.chunk_ids for p, e in load_manifest(kb.name).files.items()}
+    assert entry.part_ids, "alpha should have been split into several frames"
+
+    _write(kb, "alpha.md", _note("omega"))
+    second = ingest_sources(["md"])["md"]
+
+    assert second["removed"] == len(entry.chunk_ids)
+    assert _hits(kb, "alpha") == []
+    assert _hits(kb, "omega")
+    # The other files kept their chunks. Checked on the timeline: Memvid's
+    # lexical index can drop older frames when split chunks are appended.
+    manifest = load_manifest(kb.name)
+    live = {str(e["frame_id"]) for e in _live_frames(kb)}
+    assert live == {c for e in manifest.files.values() for c in e.chunk_ids}
+    assert set(first_ids[beta] + first_ids[gamma]) <= live
+
+
+def _downgrade_manifest(kb) -> None:
+    """Rewrite the manifest as version 1 wrote it: sequence numbers, no part ids."""
+    path = load_manifest(kb.name).path
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    raw["version"] = 1
+    for i, e in enumerate(raw["files"].values()):
+        e["chunk_ids"] = [str(i + n) for n in range(len(e["chunk_ids"]))]
+        del e["part_ids"]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(raw, f)
+
+
+def test_version_1_manifest_is_matched_to_store_frames(kb):
+    alpha = _write(kb, "alpha.md", _note("alpha"))
+    beta = _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    _downgrade_manifest(kb)
+
+    unchanged = ingest_sources(["md"])["md"]
+    assert unchanged["removed"] == 0 and unchanged["chunks"] == 0
+    assert load_manifest(kb.name).get(alpha).part_ids
+
+    _write(kb, "alpha.md", _note("omega"))
+    ingest_sources(["md"])
+    assert _hits(kb, "alpha") == []
+    assert _hits(kb, "omega")
+    assert set(load_manifest(kb.name).get(beta).chunk_ids) <= {str(e["frame_id"]) for e in _live_frames(kb)}
+
+
+def test_version_1_stale_copies_are_removed(kb):
+    _write(kb, "alpha.md", _note("alpha"))
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    # Without a manifest every file is written again: two copies of each,
+    # like the superseded chunks version 1 left behind.
+    os.remove(load_manifest(kb.name).path)
+    ingest_sources(["md"])
+    _downgrade_manifest(kb)
+
+    ingest_sources(["md"])
+
+    manifest = load_manifest(kb.name)
+    assert len(_live_frames(kb)) == sum(len(e.chunk_ids) for e in manifest.files.values())
+    assert sum("/beta.md/" in e["uri"] for e in _live_frames(kb)) == 1
+
+
+def test_failed_write_leaves_the_active_generation_and_manifest_alone(kb, monkeypatch):
+    _write(kb, "alpha.md", _note("alpha", 5))
+    ingest_sources(["md"])
+    before = (active_store(kb.name)[0], _live_frames(kb), set(load_manifest(kb.name).files))
+    # Several chunks per file, one per batch: the write fails halfway through gamma.
+    for name, tokens in (("target", 30), ("max", 40), ("min", 5), ("overlap", 0)):
+        monkeypatch.setattr(settings, f"md_chunk_{name}_tokens", tokens)
+    monkeypatch.setattr(settings, "ingest_batch_size", 1)
+    paragraphs = "\n\n".join(f"The gamma lantern number {i} burns quietly." for i in range(20))
+    gamma = os.path.abspath(_write(kb, "gamma.md", f"# Gamma\n\n{paragraphs}\n"))
+    real_put_batch = memvid_client._put_batch
+    calls = []
+
+    def put_batch(mv, requests):
+        calls.append(len(requests))
+        if len(calls) > 2:
+            raise ChunkWriteError("disk full")
+        return real_put_batch(mv, requests)
+
+    monkeypatch.setattr(memvid_client, "_put_batch", put_batch)
+    with pytest.raises(ChunkWriteError):
+        ingest_sources(["md"])
+
+    assert (active_store(kb.name)[0], _live_frames(kb), set(load_manifest(kb.name).files)) == before
+    # The next run writes gamma exactly once.
+    monkeypatch.setattr(memvid_client, "_put_batch", real_put_batch)
+    ingest_sources(["md"])
+    manifest = load_manifest(kb.name)
+    live = sorted(str(e["frame_id"]) for e in _live_frames(kb))
+    assert live == sorted(c for e in manifest.files.values() for c in e.chunk_ids)
+    assert sum("/gamma.md/" in e["uri"] for e in _live_frames(kb)) == len(manifest.get(gamma).chunk_ids) > 2
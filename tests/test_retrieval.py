@@ -0,0 +1,66 @@
+"""Hybrid retrieval: lexical and dense hits fused, dense readers opened off the loop."""
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import numpy as np
+
+from app.core import vector_index
+from app.core.config import settings
+from app.core.memvid_client import active_store, sidecar_path
+from app.core.vector_index import VectorIndex
+from app.ingest.jobs import ingest_sources
+from app.rag import retrieval
+from tests.test_reingest import _note, _write
+
+
+def _dense_index(kb, uri: str) -> np.ndarray:
+    """A dense index of one chunk for the store's active generation."""
+    vector = np.random.default_rng(0).standard_normal(8).astype(np.float32)
+    writer = VectorIndex(sidecar_path("", kb.name))
+    writer.begin(active_store(kb.name)[0])
+    payload = {"uri": uri, "title": "Dense", "text": "Only the dense index knows this.", "metadata": {}}
+    writer.append(["dense-1"], [vector], [payload])
+    writer.close()
+    return vector
+
+
+def test_dense_reader_is_opened_in_the_retrieval_pool(kb, monkeypatch):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    vector = _dense_index(kb, "mv2://md/dense.md/0")
+    monkeypatch.setattr(settings, "vector_index_enabled", True)
+
+    async def embed_query(query):
+        return vector.tolist()
+
+    monkeypatch.setattr(retrieval, "embed_query", embed_query)
+    opened_on = []
+    real_init = VectorIndex.__init__
+
+    def init(self, *args, **kwargs):
+        opened_on.append(threading.current_thread())
+        real_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(VectorIndex, "__init__", init)
+
+    hits = asyncio.run(retrieval.retrieve("beta lantern", 5, [kb.name]))
+
+    assert any(h.get("uri") == "mv2://md/dense.md/0" for h in hits)
+    assert any("beta" in (h.get("text") or "") for h in hits)
+    assert opened_on and threading.main_thread() not in opened_on
+    vector_index._INDEXES.pop(kb.name)[1].close()
+
+
+def test_without_a_dense_index_retrieval_is_lexical(kb, monkeypatch):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    monkeypatch.setattr(settings, "vector_index_enabled", True)
+
+    async def embed_query(query):
+        raise AssertionError("no dense index: the query must not be embedded")
+
+    monkeypatch.setattr(retrieval, "embed_query", embed_query)
+
+    assert asyncio.run(retrieval.retrieve("beta lantern", 5, [kb.name]))
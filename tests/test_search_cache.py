@@ -0,0 +1,32 @@
+"""Cached Memvid results are reused until an ingest activates a new generation."""
+from __future__ import annotations
+
+from app.core import memvid_client
+from app.core.memvid_client import search
+from app.ingest.jobs import ingest_sources
+from tests.test_reingest import _note, _write
+
+
+def test_results_are_cached_per_generation(kb, monkeypatch):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    finds = []
+    real_find = memvid_client._find
+
+    def find(*args, **kwargs):
+        finds.append(args[1])
+        return real_find(*args, **kwargs)
+
+    monkeypatch.setattr(memvid_client, "_find", find)
+
+    first = search("beta lantern", 3, kb.name)
+    first[0]["text"] = "changed by the caller"
+    again = search("  Beta LANTERN ", 3, kb.name)
+    assert len(finds) == 1
+    assert again[0]["text"] != "changed by the caller"
+
+    _write(kb, "beta.md", _note("beta", 6))
+    ingest_sources(["md"])
+    fresh = search("beta lantern", 3, kb.name)
+    assert len(finds) == 2
+    assert "number 5" in fresh[0]["text"]
@@ -0,0 +1,92 @@
+"""Shared streams only generate while someone is listening."""
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from app.rag import pipeline
+from app.rag.singleflight import Broadcast
+
+
+def test_source_starts_with_the_first_subscriber():
+    started: List[bool] = []
+
+    async def source():
+        started.append(True)
+        yield "a"
+
+    async def main():
+        broadcast = Broadcast(source())
+        await asyncio.sleep(0)
+        assert not started
+        assert [t async for t in broadcast.subscribe()] == ["a"]
+
+    asyncio.run(main())
+
+
+def test_source_is_cancelled_when_every_subscriber_leaves_before_the_first_token():
+    async def main():
+        stopped = asyncio.Event()
+        release = asyncio.Event()
+
+        async def source():
+            try:
+                await release.wait()
+                yield "late"
+            finally:
+                stopped.set()
+
+        broadcast = Broadcast(source())
+        streams = [broadcast.subscribe() for _ in range(2)]
+        readers = [asyncio.ensure_future(s.__anext__()) for s in streams]
+        await asyncio.sleep(0.01)
+        for reader in readers:
+            reader.cancel()
+        await asyncio.wait_for(stopped.wait(), 1)
+
+    asyncio.run(main())
+
+
+def test_broadcast_nobody_reads_is_closed_and_forgotten():
+    async def main():
+        forgotten = asyncio.Event()
+
+        async def source():
+            yield "never"
+
+        broadcast = Broadcast(source(), on_done=forgotten.set, start_timeout=0.01)
+        await asyncio.wait_for(forgotten.wait(), 1)
+        with pytest.raises(ConnectionAbortedError):
+            [t async for t in broadcast.subscribe()]
+
+    asyncio.run(main())
+
+
+def test_abandoned_stream_is_not_joined_by_later_requests(monkeypatch):
+    generated: List[str] = []
+
+    async def fake_answer_stream(query, **kwargs):
+        async def tokens():
+            generated.append(query)
+            yield "token"
+
+        return {"answer_query": query, "stream": tokens()}
+
+    monkeypatch.setattr(pipeline, "_answer_stream", fake_answer_stream)
+    monkeypatch.setattr(pipeline, "_STREAM_START_TIMEOUT", 0.01)
+
+    async def main():
+        first = await pipeline.answer_stream("where is the lantern?")
+        assert not first["coalesced"]
+        # The client went away without reading its response.
+        await asyncio.sleep(0.05)
+        assert len(pipeline._STREAMS) == 0
+
+        second = await pipeline.answer_stream("where is the lantern?")
+        assert not second["coalesced"]
+        assert [t async for t in second["stream"]] == ["token"]
+
+    asyncio.run(main())
+    assert generated == ["where is the lantern?"]
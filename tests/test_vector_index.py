@@ -0,0 +1,113 @@
+"""The dense index serves each reader the rows of its store generation."""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+from app.core.vector_index import VectorIndex
+
+
+def _vectors(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, 8)).astype(np.float32)
+
+
+def _append(index: VectorIndex, path: str, n: int, seed: int) -> np.ndarray:
+    vectors = _vectors(n, seed)
+    payloads = [{"uri": f"mv2://md/{path}/{seed}/{i}", "metadata": {"path": path}} for i in range(n)]
+    index.append([f"{seed}{i}" for i in range(n)], vectors, payloads)
+    return vectors
+
+
+def _live_uris(base: str, generation: int) -> set:
+    reader = VectorIndex(base, read_only=True, generation=generation)
+    try:
+        rows = [r for r in range(reader.rows) if not reader._deleted[r]]
+        return {p["uri"] for p in reader.payloads(rows).values()}
+    finally:
+        reader.close()
+
+
+def test_readers_see_only_their_generation(tmp_path):
+    base = str(tmp_path / "kb")
+    writer = VectorIndex(base)
+    writer.begin(1)
+    _append(writer, "a.md", 2, seed=1)
+    _append(writer, "b.md", 1, seed=2)
+    writer.begin(2)
+    writer.remove_file("a.md")
+    _append(writer, "a.md", 1, seed=3)
+
+    assert _live_uris(base, 0) == set()
+    assert _live_uris(base, 1) == {"mv2://md/a.md/1/0", "mv2://md/a.md/1/1", "mv2://md/b.md/2/0"}
+    assert _live_uris(base, 2) == {"mv2://md/b.md/2/0", "mv2://md/a.md/3/0"}
+    writer.close()
+
+
+def test_begin_drops_rows_of_a_generation_never_activated(tmp_path):
+    base = str(tmp_path / "kb")
+    writer = VectorIndex(base)
+    writer.begin(1)
+    _append(writer, "a.md", 2, seed=1)
+    writer.begin(2)
+    writer.remove_file("a.md")
+    _append(writer, "a.md", 3, seed=2)
+    writer.close()
+
+    # The ingest writing generation 2 failed; the next one writes it again.
+    writer = VectorIndex(base)
+    writer.begin(2)
+    assert writer.rows == 2
+    assert os.path.getsize(base + ".vec.f32") == 2 * 8 * 4
+    assert _live_uris(base, 1) == {"mv2://md/a.md/1/0", "mv2://md/a.md/1/1"}
+    query = _append(writer, "b.md", 1, seed=4)[0]
+    writer.close()
+
+    reader = VectorIndex(base, read_only=True, generation=2)
+    (row, score), *_ = reader.search(query, 3)
+    assert reader.payloads([row])[row]["uri"] == "mv2://md/b.md/4/0" and score > 0.99
+    reader.close()
+
+
+def test_int8_copy_built_for_a_new_generation_serves_older_readers(tmp_path):
+    base = str(tmp_path / "kb")
+    writer = VectorIndex(base)
+    writer.begin(1)
+    _append(writer, "a.md", 2, seed=1)
+    writer.begin(2)
+    _append(writer, "b.md", 2, seed=2)
+    writer.quantize()
+    writer.close()
+
+    for generation, rows in ((1, 2), (2, 4)):
+        reader = VectorIndex(base, read_only=True, generation=generation)
+        assert reader.rows == rows and reader._i8 is not None
+        reader.close()
+
+
+def test_indexes_from_before_generations_are_migrated(tmp_path):
+    base = str(tmp_path / "kb")
+    db = sqlite3.connect(base + ".vec.sqlite")
+    db.executescript(
+        "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        "CREATE TABLE chunks (row INTEGER PRIMARY KEY, frame_id TEXT NOT NULL, title TEXT, label TEXT,"
+        " text TEXT, metadata TEXT, deleted INTEGER NOT NULL DEFAULT 0, uri TEXT);"
+    )
+    db.executemany(
+        "INSERT INTO chunks (row, frame_id, metadata, deleted, uri) VALUES (?, ?, ?, ?, ?)",
+        [(0, "0", json.dumps({"path": "a.md"}), 1, "old"), (1, "1", json.dumps({"path": "a.md"}), 0, "new")],
+    )
+    db.execute("INSERT INTO meta VALUES ('dim', '8')")
+    db.commit()
+    db.close()
+    _vectors(2, seed=1).tofile(base + ".vec.f32")
+
+    writer = VectorIndex(base)
+    writer.begin(1)
+    assert _live_uris(base, 0) == {"new"}
+    writer.remove_file("a.md")
+    writer.close()
+    assert _live_uris(base, 0) == {"new"}
+    assert _live_uris(base, 1) == set()
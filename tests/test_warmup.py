@@ -0,0 +1,79 @@
+"""/api/ready answers 503 while the startup warm-up runs and 200 once it is done."""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.ingest.jobs import ingest_sources
+from app.main import app
+from app.rag import warmup
+from tests.test_reingest import _note, _write
+
+
+@pytest.fixture
+def fresh_state(monkeypatch) -> None:
+    monkeypatch.setattr(warmup, "_STATE", warmup.WarmupState())
+    monkeypatch.setattr(settings, "api_key", None)
+
+
+def _wait_ready(c: TestClient) -> dict:
+    r = c.get("/api/ready")
+    for _ in range(200):
+        if r.status_code == 200:
+            break
+        time.sleep(0.05)
+        r = c.get("/api/ready")
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_ready_waits_for_the_warmup(kb, ollama, fresh_state, monkeypatch):
+    _write(kb, "beta.md", _note("beta", 5))
+    ingest_sources(["md"])
+    monkeypatch.setattr(settings, "warmup_enabled", True)
+    release = threading.Event()
+    warm_store = warmup._warm_store
+
+    def gated(name: str) -> str:
+        release.wait(30)
+        return warm_store(name)
+
+    monkeypatch.setattr(warmup, "_warm_store", gated)
+
+    with TestClient(app) as c:
+        warming = c.get("/api/ready")
+        assert c.get("/api/health").status_code == 200
+        release.set()
+        state = _wait_ready(c)
+
+    assert warming.status_code == 503 and warming.json()["status"] == "warming"
+    assert state["status"] == "ready" and state["seconds"] is not None
+    assert state["steps"][f"store:{kb.name}"]["ok"]
+    assert state["steps"]["ollama:chat"]["ok"]
+
+
+def test_failed_steps_do_not_keep_the_instance_unready(kb, fresh_state, monkeypatch):
+    monkeypatch.setattr(settings, "warmup_enabled", True)
+
+    def broken(name: str) -> str:
+        raise OSError("store unreadable")
+
+    monkeypatch.setattr(warmup, "_warm_store", broken)
+
+    with TestClient(app) as c:
+        state = _wait_ready(c)
+
+    assert state["steps"][f"store:{kb.name}"] == {"ok": False, "seconds": pytest.approx(0, abs=1), "error": "store unreadable"}
+
+
+def test_ready_at_once_without_warmup(kb, fresh_state, monkeypatch):
+    monkeypatch.setattr(settings, "warmup_enabled", False)
+
+    with TestClient(app) as c:
+        r = c.get("/api/ready")
+
+    assert r.status_code == 200 and r.json()["steps"] == {}